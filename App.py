@@ -17,6 +17,22 @@ from datetime import datetime
 import re
 import os
 
+from execution_plan import SpilledFrame, default_budget, execute_plan, iter_frames, plan_execution
+from facet_pages import FacetPager
+from figure_transport import compact_figure
+from hump_kernels import PIXEL_PITCH
+from hump_pipeline import analyze_lot, extract_position_from_file, position_to_side
+from hump_polars import AVAILABLE as POLARS_AVAILABLE
+from lot_manifest import SIDES, LotManifest, manifest_sources
+from panel_map import panel_heatmap
+from profile_archive import write_archive
+from profile_clusters import ProfileShapeClusters, assign_shape_clusters
+from profile_index import ProfileIndex
+from profile_stats import EdgeProfileAccumulator, ProfileQuantileSketch, build_profile_stats
+from profile_validation import IngestReport
+from result_export import result_sheets, write_parquet, write_xlsx
+from session_store import SessionStore
+
 # Streamlit 환경 변수 설정 (파일 워처 비활성화)
 os.environ['STREAMLIT_SERVER_FILE_WATCHER_TYPE'] = 'none'
 os.environ['STREAMLIT_SERVER_RUN_ON_SAVE'] = 'false'
@@ -43,50 +59,43 @@ page = st.sidebar.selectbox(
     ["🔄 파일 업로드", "📈 데이터 분석", "💾 결과 다운로드"]
 )
 
+@st.cache_resource
+def get_session_store():
+    """모든 세션이 함께 쓰는 데이터 저장소 (메모리 예산을 넘으면 오래 쓰지 않은 값부터 디스크로)"""
+    return SessionStore()
+
 # 세션 상태 초기화
-if 'df_combined' not in st.session_state:
-    st.session_state.df_combined = None
-if 'result_df' not in st.session_state:
-    st.session_state.result_df = None
+# 큰 값(원본 / 처리된 데이터 / 결과 / 그래프)은 st.session_state 대신 session_data에 보관
+if 'session_data' not in st.session_state:
+    st.session_state.session_data = get_session_store().session()
+session_data = st.session_state.session_data
 if 'analysis_complete' not in st.session_state:
     st.session_state.analysis_complete = False
-if 'plots' not in st.session_state:
-    st.session_state.plots = {}
-
-def extract_cell_from_id(cell_id):
-    """CELL ID에서 cell 정보 추출"""
-    return str(cell_id)[-3:]
-
-def extract_position_from_file(filename):
-    """파일명에서 position 정보 추출"""
-    # 파일명에서 마지막 13글자 중 첫 번째 글자 추출
-    if len(filename) >= 13:
-        return filename[-13]
-    return "1"  # 기본값
-
-def assign_split_category(cell):
-    """cell에 따른 split 카테고리 할당"""
-    if cell in ["A01", "B02", "C04", "D05", "A06", "B07", "C09", "D10"]:
-        return "Sp1"
-    elif cell in ["A03", "C03", "A08", "C08"]:
-        return "Sp2"
-    elif cell in ["B03", "D03", "B08", "D08"]:
-        return "Sp3"
-    else:
-        return "Unknown"
-
-def position_to_side(position):
-    """position을 side로 변환"""
-    position_map = {
-        "1": "Left",
-        "2": "Right", 
-        "3": "Top",
-        "4": "Down"
-    }
-    return position_map.get(str(position), "Unknown")
-
-def analyze_data(df_combined):
-    """데이터 분석 수행"""
+if 'profile_stats' not in st.session_state:
+    st.session_state.profile_stats = None
+if 'quantile_sketch' not in st.session_state:
+    st.session_state.quantile_sketch = None
+if 'profile_index' not in st.session_state:
+    st.session_state.profile_index = None
+if 'shape_clusters' not in st.session_state:
+    st.session_state.shape_clusters = None
+if 'ingest_report' not in st.session_state:
+    st.session_state.ingest_report = None
+if 'lot_plan' not in st.session_state:
+    st.session_state.lot_plan = None
+    st.session_state.lot_manifest = None
+if 'memory_budget' not in st.session_state:
+    st.session_state.memory_budget = max(int(default_budget() // 2 ** 20), 64)
+
+def analyze_data(df_combined, smoothing=None, baseline='fixed', resample_pitch=None, golden=None, backend='pandas'):
+    """데이터 분석 수행
+
+    smoothing: side별 평활화 설정 (예: {'Left': {'method': 'savgol', 'window': 7}})
+    baseline: Position 1-3 기준점 방식 ('fixed': 456번째 행, 'auto': 자동 평탄 구간)
+    resample_pitch: 지정하면 모든 프로파일을 이 간격 [um]의 공통 x 그리드로 리샘플링
+    golden: side, x, y 컬럼의 golden 프로파일 (없으면 lot의 side별 중앙값 프로파일과 비교)
+    backend: 'pandas' 또는 'polars' (설치된 경우, 전처리 + 행렬 변환을 lazy 쿼리로 멀티스레드 실행)
+    """
     try:
         # 데이터 구조 확인
         st.info("📋 데이터 구조 확인 중...")
@@ -95,213 +104,16 @@ def analyze_data(df_combined):
         st.write("첫 5행 미리보기:")
         st.dataframe(df_combined.head())
         
-        # 기본 데이터 전처리
-        df = df_combined.copy()
-        
-        # 'no' 컬럼 확인 및 생성
-        if 'no' not in df.columns:
-            if 'No' in df.columns:
-                df['no'] = df['No']
-            elif 'NO' in df.columns:
-                df['no'] = df['NO']
-            elif 'index' in df.columns:
-                df['no'] = df['index']
-            elif 'Index' in df.columns:
-                df['no'] = df['Index']
-            else:
-                # 인덱스를 'no' 컬럼으로 사용
-                df['no'] = df.index + 1
-                st.warning("⚠️ 'no' 컬럼을 찾을 수 없어서 인덱스를 사용합니다.")
-        
-        # 필수 컬럼 확인
-        required_cols = ['CELL ID', 'Avg Offset', 'Glass ID']
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        
-        if missing_cols:
-            # 대안 컬럼명 확인
-            col_mapping = {}
-            for col in missing_cols:
-                if col == 'CELL ID':
-                    alternatives = ['Cell ID', 'cell_id', 'cellid', 'Cell_ID', 'CellID']
-                elif col == 'Avg Offset':
-                    alternatives = ['avg_offset', 'AvgOffset', 'Average Offset', 'Offset']
-                elif col == 'Glass ID':
-                    alternatives = ['Glass_ID', 'glass_id', 'glassid', 'GlassID', 'glass']
-                
-                for alt in alternatives:
-                    if alt in df.columns:
-                        col_mapping[col] = alt
-                        break
-            
-            # 컬럼명 변경
-            for original, alternative in col_mapping.items():
-                df[original] = df[alternative]
-                st.info(f"✅ '{alternative}' 컬럼을 '{original}'로 매핑했습니다.")
-            
-            # 여전히 없는 컬럼 확인
-            still_missing = [col for col in required_cols if col not in df.columns]
-            if still_missing:
-                st.error(f"❌ 다음 필수 컬럼을 찾을 수 없습니다: {still_missing}")
-                st.error("사용 가능한 컬럼:", df.columns.tolist())
-                return pd.DataFrame(), pd.DataFrame()
-        
-        # 데이터 전처리 계속
-        df['cell'] = df['CELL ID'].apply(extract_cell_from_id)
-        df['position'] = df['file'].apply(extract_position_from_file)
-        df['x'] = df['no'] * 10.96
-        df['side'] = df['position'].apply(position_to_side)
-        
-        # position이 "4"가 아닌 데이터 분석 (result1)
-        df_not_4 = df[df['position'] != "4"].copy()
-        
-        if len(df_not_4) > 0:
-            st.info("📊 Position 1-3 데이터 분석 중...")
-            
-            # pivot_wider 구현
-            try:
-                df_pivot = df_not_4.pivot_table(
-                    index='no',
-                    columns=['Glass ID', 'cell', 'position'],
-                    values='Avg Offset',
-                    aggfunc='first'
-                )
-                
-                st.success(f"✅ Pivot 테이블 생성 완료: {df_pivot.shape}")
-                
-                # 기준점 차감 (456번째 행이 있는 경우)
-                reference_row = min(455, len(df_pivot) - 1)  # 안전한 인덱스 사용
-                if reference_row >= 0:
-                    df_pivot = df_pivot.sub(df_pivot.iloc[reference_row], axis=1)
-                    st.info(f"✅ 기준점({reference_row + 1}번째 행) 차감 완료")
-                
-                # pivot_longer 구현 - 더 안전한 방법 사용
-                df_pivot_reset = df_pivot.reset_index()
-                
-                # 컬럼을 수동으로 melt
-                value_columns = [col for col in df_pivot_reset.columns if col != 'no']
-                
-                df_long_list = []
-                for col in value_columns:
-                    if isinstance(col, tuple) and len(col) == 3:  # (glass, cell, position)
-                        glass, cell, position = col
-                        temp_df = pd.DataFrame({
-                            'no': df_pivot_reset['no'],
-                            'glass': glass,
-                            'cell': cell,
-                            'position': position,
-                            'y': df_pivot_reset[col]
-                        })
-                        df_long_list.append(temp_df)
-                
-                if df_long_list:
-                    df_long = pd.concat(df_long_list, ignore_index=True)
-                    df_long = df_long.dropna()  # NaN 값 제거
-                else:
-                    st.error("❌ 데이터 변환 실패")
-                    df_long = pd.DataFrame()
-                
-            except Exception as e:
-                st.error(f"❌ Pivot 처리 중 오류: {str(e)}")
-                df_long = pd.DataFrame()
-            if len(df_long) > 0:
-                df_long['side'] = df_long['position'].apply(position_to_side)
-                
-                # hump 분석 - 더 안전한 방법
-                try:
-                    result1_list = []
-                    
-                    for (glass, cell, side), group in df_long.groupby(['glass', 'cell', 'side']):
-                        if len(group) > 0 and not group['y'].isna().all():
-                            max_y = group['y'].max()
-                            max_idx = group['y'].idxmax()
-                            max_x_position = group.loc[max_idx, 'no'] if max_idx in group.index else 0
-                            
-                            result1_list.append({
-                                'glass': glass,
-                                'cell': cell,
-                                'side': side,
-                                'hump_dy': round(max_y, 1),
-                                'hump_dx': round(10.96 * max_x_position, 0)
-                            })
-                    
-                    if result1_list:
-                        result1 = pd.DataFrame(result1_list)
-                        result1['split'] = result1['cell'].apply(assign_split_category)
-                        st.success(f"✅ Position 1-3 분석 완료: {len(result1)}개 결과")
-                    else:
-                        result1 = pd.DataFrame()
-                        st.warning("⚠️ Position 1-3 분석 결과가 없습니다.")
-                        
-                except Exception as e:
-                    st.error(f"❌ Hump 분석 중 오류: {str(e)}")
-                    result1 = pd.DataFrame()
-            else:
-                result1 = pd.DataFrame()
-                st.warning("⚠️ Position 1-3 데이터 변환 결과가 없습니다.")
-        else:
-            result1 = pd.DataFrame()
-            st.info("ℹ️ Position 1-3 데이터가 없습니다.")
-        
-        # position이 "4"인 데이터 분석 (result2)
-        df_4 = df[df['position'] == "4"].copy()
-        
-        if len(df_4) > 0:
-            st.info("📊 Position 4 데이터 분석 중...")
-            
-            try:
-                df_4 = df_4.rename(columns={'Glass ID': 'glass', 'Avg Offset': 'y'})
-                
-                result2_list = []
-                
-                for (glass, cell, side), group in df_4.groupby(['glass', 'cell', 'side']):
-                    if len(group) > 0 and not group['y'].isna().all():
-                        max_y = group['y'].max()
-                        min_y = group['y'].min()
-                        max_idx = group['y'].idxmax()
-                        max_x_position = group.loc[max_idx, 'x'] if max_idx in group.index else 0
-                        
-                        result2_list.append({
-                            'glass': glass,
-                            'cell': cell,
-                            'side': side,
-                            'hump_dy': round(max_y - min_y, 1),
-                            'hump_dx': round(max_x_position, 0)
-                        })
-                
-                if result2_list:
-                    result2 = pd.DataFrame(result2_list)
-                    result2['split'] = result2['cell'].apply(assign_split_category)
-                    st.success(f"✅ Position 4 분석 완료: {len(result2)}개 결과")
-                else:
-                    result2 = pd.DataFrame()
-                    st.warning("⚠️ Position 4 분석 결과가 없습니다.")
-                    
-            except Exception as e:
-                st.error(f"❌ Position 4 분석 중 오류: {str(e)}")
-                result2 = pd.DataFrame()
-        else:
-            result2 = pd.DataFrame()
-            st.info("ℹ️ Position 4 데이터가 없습니다.")
-        
-        # 결과 합치기
-        if len(result1) > 0 and len(result2) > 0:
-            result = pd.concat([result1, result2], ignore_index=True)
-            st.success("✅ 모든 분석 결과 합치기 완료")
-        elif len(result1) > 0:
-            result = result1
-            st.info("ℹ️ Position 1-3 결과만 사용")
-        elif len(result2) > 0:
-            result = result2
-            st.info("ℹ️ Position 4 결과만 사용")
-        else:
-            result = pd.DataFrame()
-            st.error("❌ 분석 결과가 없습니다.")
-        
-        if len(result) > 0:
-            result = result.sort_values(['glass', 'cell', 'side']).reset_index(drop=True)
-            st.success(f"🎉 최종 분석 완료! 총 {len(result)}개의 결과가 생성되었습니다.")
-        
-        return result, df
+        log = {'info': st.info, 'success': st.success, 'warning': st.warning, 'error': st.error}
+        return analyze_lot(
+            df_combined,
+            smoothing=smoothing,
+            baseline=baseline,
+            resample_pitch=resample_pitch,
+            golden=golden,
+            log=lambda level, message: log[level](message),
+            backend=backend
+        )
         
     except Exception as e:
         st.error(f"❌ 데이터 분석 중 전체 오류가 발생했습니다: {str(e)}")
@@ -310,9 +122,35 @@ def analyze_data(df_combined):
         st.write("DataFrame 크기:", df_combined.shape if df_combined is not None else "None")
         return pd.DataFrame(), pd.DataFrame()
 
-def create_plots(df, result_df):
-    """그래프 생성"""
+def analyze_plan(lot_plan, smoothing=None, baseline='fixed', resample_pitch=None, golden=None):
+    """실행 계획(chunked / spill)대로 분석 - 원본을 glass 묶음별로 다시 읽어 전처리하고 행렬만 합쳐 한 번에 분석
+
+    반환값: (결과 DataFrame, 처리된 데이터 - DataFrame 또는 디스크의 SpilledFrame, 평균 프로파일 집계)
+    """
+    try:
+        log = {'info': st.info, 'success': st.success, 'warning': st.warning, 'error': st.error}
+        return execute_plan(
+            lot_plan,
+            smoothing=smoothing,
+            baseline=baseline,
+            resample_pitch=resample_pitch,
+            golden=golden,
+            log=lambda level, message: log[level](message),
+            profile_stats=True
+        )
+    except Exception as e:
+        st.error(f"❌ 데이터 분석 중 전체 오류가 발생했습니다: {str(e)}")
+        return pd.DataFrame(), pd.DataFrame(), None
+
+def create_plots(df, result_df, resample_pitch=None, profile_stats=None, page_size=5):
+    """그래프 생성
+
+    resample_pitch: 지정하면 평균 프로파일을 공통 x 그리드로 리샘플링해서 계산
+    profile_stats: 로드 시 누적한 EdgeProfileAccumulator (없으면 df에서 집계)
+    page_size: glass × cell facet 그래프의 페이지당 glass 수 (페이지는 분석 화면에서 넘겨 봄)
+    """
     plots = {}
+    facet_pagers = {}
     
     try:
         # 필수 컬럼 확인
@@ -340,32 +178,20 @@ def create_plots(df, result_df):
             
         # 1. 전체 데이터 시각화
         try:
-            fig1 = px.scatter(
-                df, 
-                x='x', 
+            pager1 = FacetPager(
+                df,
+                x='x',
                 y='Avg Offset',
+                row='Glass ID',
+                col='cell',
                 color='side',
-                facet_col='cell',
-                facet_row='Glass ID',
+                page_size=page_size,
                 title="전체 데이터 시각화",
                 labels={'x': 'X [um]', 'Avg Offset': 'Avg Offset [um]'},
-                color_discrete_sequence=color_palette
-            )
-            fig1.update_layout(
-                height=600,
-                template='plotly',
-                font=dict(size=12),
-                showlegend=True,
-                legend=dict(
-                    orientation="h",
-                    yanchor="bottom",
-                    y=1.02,
-                    xanchor="right",
-                    x=1
-                )
+                color_palette=color_palette
             )
-            # 마커 크기 및 투명도 설정
-            fig1.update_traces(marker=dict(size=4, opacity=0.7))
+            fig1 = pager1.figure(0)
+            facet_pagers['main_plot'] = pager1
             plots['main_plot'] = fig1
             st.success("✅ 전체 데이터 그래프 생성 완료")
         except Exception as e:
@@ -373,10 +199,11 @@ def create_plots(df, result_df):
         
         # 2. 위치별 평균 프로파일
         try:
-            df_avg = df.groupby(['side', 'x'])['Avg Offset'].mean().reset_index()
+            # 로드 시 누적한 집계가 있으면 그대로 사용, 없으면 처리된 데이터에서 한 번에 집계
+            if profile_stats is None or resample_pitch:
+                profile_stats = build_profile_stats(df, resample_pitch=resample_pitch)
+            df_avg = profile_stats.to_frame()
             if len(df_avg) > 0:
-                df_avg['y_normalized'] = df_avg.groupby('side')['Avg Offset'].transform(lambda x: x - x.min())
-                
                 fig2 = px.line(
                     df_avg,
                     x='x',
@@ -400,6 +227,21 @@ def create_plots(df, result_df):
                 )
                 # 라인 스타일 설정
                 fig2.update_traces(line=dict(width=3), marker=dict(size=6))
+                
+                # ±σ 밴드 (각 side 라인 색상과 동일)
+                for trace in list(fig2.data):
+                    band = df_avg[df_avg['side'] == trace.name]
+                    fig2.add_trace(go.Scatter(
+                        x=np.concatenate([band['x'], band['x'][::-1]]),
+                        y=np.concatenate([band['y_normalized'] + band['std'], (band['y_normalized'] - band['std'])[::-1]]),
+                        fill='toself',
+                        fillcolor=trace.line.color,
+                        opacity=0.2,
+                        line=dict(width=0),
+                        hoverinfo='skip',
+                        showlegend=False,
+                        name=f"{trace.name} ±σ"
+                    ))
                 plots['profile_plot'] = fig2
                 st.success("✅ 프로파일 그래프 생성 완료")
             else:
@@ -413,32 +255,21 @@ def create_plots(df, result_df):
                 result_filtered = result_df[result_df['side'] != 'Down']
                 
                 if len(result_filtered) > 0:
-                    fig3 = px.bar(
+                    pager3 = FacetPager(
                         result_filtered,
                         x='side',
                         y='hump_dy',
+                        row='glass',
+                        col='cell',
                         color='side',
-                        facet_col='cell',
-                        facet_row='glass',
+                        kind='bar',
+                        page_size=page_size,
                         title="Hump Height vs Position of Panel",
                         labels={'hump_dy': 'Hump DY [um]', 'side': 'Side'},
-                        color_discrete_sequence=color_palette
+                        color_palette=color_palette
                     )
-                    fig3.update_layout(
-                        height=600,
-                        template='plotly',
-                        font=dict(size=12),
-                        showlegend=True,
-                        legend=dict(
-                            orientation="h",
-                            yanchor="bottom",
-                            y=1.02,
-                            xanchor="right",
-                            x=1
-                        )
-                    )
-                    # 바 차트 스타일 설정
-                    fig3.update_traces(marker=dict(opacity=0.8, line=dict(width=1, color='white')))
+                    fig3 = pager3.figure(0)
+                    facet_pagers['hump_plot'] = pager3
                     plots['hump_plot'] = fig3
                     st.success("✅ Hump 분석 그래프 생성 완료")
                 else:
@@ -448,11 +279,152 @@ def create_plots(df, result_df):
         except Exception as e:
             st.error(f"❌ Hump 그래프 생성 실패: {str(e)}")
         
+        # 4. 패널 맵 - side별 (행 × 열) heatmap, glass 전체 중앙값
+        try:
+            if len(result_df) > 0 and 'hump_dy' in result_df.columns:
+                plots['panel_map'] = panel_heatmap(result_df, value='hump_dy')
+                st.success("✅ 패널 맵 생성 완료")
+        except Exception as e:
+            st.error(f"❌ 패널 맵 생성 실패: {str(e)}")
+        
         return plots
         
     except Exception as e:
         st.error(f"❌ 그래프 생성 중 전체 오류가 발생했습니다: {str(e)}")
         return {}
+    
+    finally:
+        session_data.put('facet_pagers', facet_pagers)
+        session_data.put('compact_plots', {})
+
+def compact_plot(key, build):
+    """전송용 Figure를 세션 데이터에 캐시 (SessionStore가 크기를 세고 원본 그래프와 같이 디스크로 내림)
+
+    build: 캐시에 없을 때만 부르는 원본 Figure 생성 함수 - 캐시가 있으면 원본을 다시 읽지 않음
+    """
+    compact = session_data.get('compact_plots', {})
+    if key not in compact:
+        compact[key] = compact_figure(build())
+        session_data.put('compact_plots', compact)
+    return compact[key]
+
+def show_facet_plot(name):
+    """facet 그래프 표시 - 여러 페이지면 페이지 선택 후 해당 페이지만 그림"""
+    pager = session_data.get('facet_pagers', {}).get(name)
+    if pager is None or pager.n_pages == 1:
+        st.plotly_chart(compact_plot(name, lambda: session_data.get('plots', {})[name]), use_container_width=True)
+        return
+    
+    page = st.number_input(
+        f"페이지 (1~{pager.n_pages}, 페이지당 glass {pager.page_size}개)",
+        min_value=1,
+        max_value=pager.n_pages,
+        value=1,
+        key=f"facet_page_{name}"
+    )
+    st.caption("Glass: " + ", ".join(map(str, pager.page_rows(page - 1))))
+    st.plotly_chart(compact_plot((name, page), lambda: pager.figure(page - 1)), use_container_width=True)
+
+def create_quantile_plot(sketch, color_palette=None):
+    """분위수 스케치로 side별 P50 라인과 P5~P95 밴드 그래프 생성"""
+    color_palette = color_palette or px.colors.qualitative.Plotly
+    df_q = sketch.quantiles((0.05, 0.5, 0.95))
+    
+    fig = go.Figure()
+    for i, (side, band) in enumerate(df_q.groupby('side')):
+        color = color_palette[i % len(color_palette)]
+        # Edge Profile 그래프와 같은 기준 (side별 P50 최소값 = 0)
+        base = band['p50'].min()
+        fig.add_trace(go.Scatter(
+            x=np.concatenate([band['x'], band['x'][::-1]]),
+            y=np.concatenate([band['p95'] - base, (band['p5'] - base)[::-1]]),
+            fill='toself',
+            fillcolor=color,
+            opacity=0.2,
+            line=dict(width=0),
+            hoverinfo='skip',
+            showlegend=False,
+            name=f"{side} P5~P95"
+        ))
+        fig.add_trace(go.Scatter(
+            x=band['x'],
+            y=band['p50'] - base,
+            mode='lines',
+            line=dict(color=color, width=3),
+            name=f"{side} P50"
+        ))
+    
+    fig.update_layout(
+        title="위치별 SIP 높이 분위수 밴드 (P5 / P50 / P95)",
+        xaxis_title='x[um]',
+        yaxis_title='SIP_height [um]',
+        template='plotly',
+        font=dict(size=12),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        )
+    )
+    return fig
+
+def create_cluster_plot(shape_clusters, color_palette=None):
+    """클러스터 중심 형상 그래프 생성"""
+    color_palette = color_palette or px.colors.qualitative.Plotly
+    centroids = shape_clusters.centroids_frame()
+    
+    fig = go.Figure()
+    for cluster, center in centroids.groupby('cluster'):
+        fig.add_trace(go.Scatter(
+            x=center['position'],
+            y=center['y'],
+            mode='lines',
+            line=dict(color=color_palette[cluster % len(color_palette)], width=3),
+            name=f"Cluster {cluster} (n={center['count'].iloc[0]:,})"
+        ))
+    
+    fig.update_layout(
+        title="형상 클러스터 중심 프로파일 (정규화 형상)",
+        xaxis_title='프로파일 상대 위치',
+        yaxis_title='정규화 높이',
+        template='plotly',
+        font=dict(size=12)
+    )
+    return fig
+
+def create_similar_plot(index, neighbors, query_key):
+    """검색 대상과 유사 프로파일의 정규화 형상 비교 그래프 생성"""
+    positions = np.linspace(0.0, 1.0, index.n_points)
+    query_shape = index.reconstruct(index.vector_of(*query_key))
+    
+    fig = go.Figure()
+    for _, row in neighbors.iterrows():
+        fig.add_trace(go.Scatter(
+            x=positions,
+            y=index.reconstruct(index.vectors[row['index']]),
+            mode='lines',
+            line=dict(width=1.5),
+            opacity=0.6,
+            name=f"{row['glass']} / {row['cell']} ({row['similarity']:.3f})"
+        ))
+    fig.add_trace(go.Scatter(
+        x=positions,
+        y=query_shape,
+        mode='lines',
+        line=dict(color='black', width=3),
+        name=f"{query_key[0]} / {query_key[1]} (검색 대상)"
+    ))
+    
+    fig.update_layout(
+        title=f"{query_key[2]} 유사 프로파일 (정규화 형상)",
+        xaxis_title='프로파일 상대 위치',
+        yaxis_title='정규화 높이',
+        template='plotly',
+        font=dict(size=12)
+    )
+    return fig
 
 # 페이지별 내용
 if page == "🔄 파일 업로드":
@@ -461,8 +433,8 @@ if page == "🔄 파일 업로드":
     
     # 파일 업로드
     uploaded_files = st.file_uploader(
-        "CSV 파일을 선택하세요 (여러 파일 선택 가능)",
-        type=['csv'],
+        "CSV 파일을 선택하세요 (여러 파일 선택 가능, 압축 아카이브 .hparc 포함)",
+        type=['csv', 'hparc'],
         accept_multiple_files=True,
         help="Ctrl+클릭으로 여러 파일을 동시에 선택할 수 있습니다."
     )
@@ -482,26 +454,123 @@ if page == "🔄 파일 업로드":
         st.subheader("📋 업로드된 파일 목록")
         st.dataframe(pd.DataFrame(file_info), use_container_width=True)
         
+        # lot 구성 사전 조회 - 파일명 / 크기 / 첫 데이터 행(.hparc는 헤더)만 읽어 전체 파싱 전에 구조 확인
+        manifest = LotManifest.scan(uploaded_files)
+        manifest_df = manifest.to_frame()
+        manifest_summary = manifest.summary()
+        
+        st.subheader("🧭 lot 구성 (사전 조회)")
+        col_g, col_c, col_p, col_r = st.columns(4)
+        col_g.metric("Glass", f"{manifest_summary['glasses']:,}")
+        col_c.metric("Cell", f"{manifest_summary['cells']:,}")
+        col_p.metric("프로파일", f"{manifest_summary['profiles']:,}")
+        col_r.metric("예상 행 수", f"{manifest_summary['rows']:,}")
+        if manifest_summary['incomplete_cells'] > 0:
+            st.warning(f"⚠️ side가 빠진 glass/cell: {manifest_summary['incomplete_cells']}개")
+        if manifest_summary['duplicate_files'] > 0:
+            st.warning(f"⚠️ 같은 glass/cell/position이 중복된 파일: {manifest_summary['duplicate_files']}개")
+        with st.expander("🧭 glass × cell side 구성 / 파일별 사전 조회", expanded=manifest_summary['incomplete_cells'] > 0):
+            st.dataframe(manifest.coverage(), use_container_width=True)
+            st.dataframe(manifest_df.drop(columns=['source']), use_container_width=True)
+        
+        # 읽을 파일 선택 (선택하지 않은 파일은 파싱하지 않음)
+        col_glass, col_side = st.columns(2)
+        with col_glass:
+            glass_options = sorted(manifest_df['glass'].dropna().unique())
+            load_glasses = st.multiselect("로드할 Glass", glass_options, default=glass_options)
+        with col_side:
+            side_options = [side for side in SIDES if side in set(manifest_df['side'])]
+            load_sides = st.multiselect("로드할 Side", side_options, default=side_options)
+        skip_duplicates = st.checkbox("중복 프로파일은 첫 파일만 로드", value=True)
+        selected_files = manifest.select(
+            glass=load_glasses if len(load_glasses) < len(glass_options) else None,
+            side=load_sides if len(load_sides) < len(side_options) else None,
+            skip_duplicates=skip_duplicates
+        )
+        if len(selected_files) < len(manifest_df):
+            st.info(f"📂 {len(manifest_df)}개 중 {len(selected_files)}개 파일만 로드합니다.")
+
+        # 메모리 예산 실행 계획 - 예산을 넘는 lot은 glass 묶음별로 읽고(chunked) 처리된 데이터는 디스크에 둠(spill)
+        st.number_input(
+            "🧮 메모리 예산 [MB]",
+            min_value=64,
+            step=256,
+            key="memory_budget",
+            help="lot 크기로 추정한 최대 메모리가 예산을 넘으면 lot을 합치지 않고 glass 묶음별로 분석합니다. "
+                 "(기본값: 환경 변수 HUMP_MEMORY_BUDGET 또는 사용 가능 메모리의 절반)"
+        )
+        lot_plan = plan_execution(manifest, frame=selected_files, budget=st.session_state.memory_budget * 2 ** 20)
+        with st.expander(f"🧮 실행 계획: {lot_plan.mode}", expanded=lot_plan.mode != 'memory'):
+            st.dataframe(lot_plan.describe(), use_container_width=True)
+        
         # 데이터 읽기 및 합치기
         if st.button("🔄 데이터 로드", type="primary"):
             with st.spinner("데이터를 로딩 중입니다..."):
                 try:
                     dataframes = []
-                    for file in uploaded_files:
-                        df = pd.read_csv(file)
-                        df['file'] = file.name
-                        dataframes.append(df)
+                    preview = None
+                    n_rows = 0
+                    profile_stats = EdgeProfileAccumulator()
+                    quantile_sketch = ProfileQuantileSketch()
+                    ingest_report = IngestReport()
+                    # 선택한 파일만 파싱 (압축 아카이브 .hparc는 선택한 원본 CSV만 풀어서 처리)
+                    for filename, df in manifest_sources(selected_files):
+                        # 읽은 DataFrame 그대로 품질 검사 (원본을 다시 읽지 않음)
+                        ingest_report.add(filename, df)
+                        df['file'] = filename
+                        n_rows += len(df)
+                        # 예산을 넘는 lot은 합치지 않고 품질 검사 / 집계만 한 뒤 버림 (분석 때 묶음별로 다시 읽음)
+                        if lot_plan.mode == 'memory':
+                            dataframes.append(df)
+                        elif preview is None:
+                            preview = df.head(10)
+                        
+                        # 평균 프로파일 집계 - 로드하면서 바로 누적 (컬럼명이 다르면 분석 시 집계)
+                        if profile_stats is not None and 'no' in df.columns and 'Avg Offset' in df.columns:
+                            side = position_to_side(extract_position_from_file(filename))
+                            pitch = df['pitch'].fillna(PIXEL_PITCH) if 'pitch' in df.columns else PIXEL_PITCH
+                            profile_stats.add(side, df['no'] * pitch, df['Avg Offset'])
+                            quantile_sketch.add(side, df['no'] * pitch, df['Avg Offset'])
+                        else:
+                            profile_stats = None
+                            quantile_sketch = None
                     
-                    combined_df = pd.concat(dataframes, ignore_index=True)
-                    st.session_state.df_combined = combined_df
+                    combined_df = pd.concat(dataframes, ignore_index=True) if lot_plan.mode == 'memory' else None
+                    session_data.put('df_combined', combined_df)
+                    st.session_state.lot_plan = lot_plan
+                    st.session_state.lot_manifest = manifest
+                    st.session_state.profile_stats = profile_stats
+                    st.session_state.quantile_sketch = quantile_sketch
+                    st.session_state.ingest_report = ingest_report.to_frame()
                     st.session_state.analysis_complete = False
                     
                     st.success("✅ 데이터가 성공적으로 로드되었습니다!")
-                    st.info(f"총 {len(combined_df):,}개의 데이터 포인트가 로드되었습니다.")
+                    st.info(f"총 {n_rows:,}개의 데이터 포인트가 로드되었습니다.")
+                    if combined_df is None:
+                        st.info(f"🧮 메모리 예산을 넘어 lot을 합치지 않았습니다. 분석 시 {len(lot_plan.batches)}개 묶음으로 나눠 읽습니다.")
+                    
+                    # 파일별 품질 리포트
+                    report = st.session_state.ingest_report
+                    n_error = int((report['status'] == 'ERROR').sum())
+                    n_warn = int((report['status'] == 'WARN').sum())
+                    if n_error > 0:
+                        st.error(f"❌ 품질 검사: 오류 {n_error}개, 경고 {n_warn}개 파일 (분석 결과가 왜곡될 수 있습니다)")
+                    elif n_warn > 0:
+                        st.warning(f"⚠️ 품질 검사: 경고 {n_warn}개 파일")
+                    else:
+                        st.success(f"✅ 품질 검사: {len(report)}개 파일 모두 정상")
+                    with st.expander("🩺 파일별 품질 리포트", expanded=n_error > 0):
+                        st.dataframe(report, use_container_width=True)
+                        st.download_button(
+                            label="📥 품질 리포트 CSV 다운로드",
+                            data=report.to_csv(index=False, encoding='utf-8-sig'),
+                            file_name=f"ingest_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                            mime="text/csv"
+                        )
                     
                     # 데이터 미리보기
                     st.subheader("📊 데이터 미리보기")
-                    st.dataframe(combined_df.head(10), use_container_width=True)
+                    st.dataframe(combined_df.head(10) if combined_df is not None else preview, use_container_width=True)
                     
                 except Exception as e:
                     st.error(f"❌ 데이터 로딩 중 오류가 발생했습니다: {str(e)}")
@@ -513,30 +582,145 @@ elif page == "📈 데이터 분석":
     st.title("📈 데이터 분석 및 시각화")
     st.markdown("---")
     
-    if st.session_state.df_combined is None:
+    if session_data.get('df_combined') is None and st.session_state.lot_plan is None:
         st.warning("⚠️ 먼저 CSV 파일을 업로드해주세요.")
         st.info("👈 사이드바에서 '파일 업로드' 페이지로 이동하여 파일을 업로드하세요.")
     else:
         col1, col2 = st.columns([1, 3])
         
         with col1:
+            # side별 평활화 설정
+            smoothing = {}
+            with st.expander("⚙️ 프로파일 평활화 설정"):
+                smoothing_methods = {"없음": None, "Savitzky-Golay": "savgol", "Median": "median"}
+                for side in ["Left", "Right", "Top", "Down"]:
+                    method = st.selectbox(f"{side} 평활화", list(smoothing_methods), key=f"smooth_method_{side}")
+                    if smoothing_methods[method]:
+                        window = st.slider(f"{side} 창 크기", 3, 31, 7, step=2, key=f"smooth_window_{side}")
+                        smoothing[side] = {'method': smoothing_methods[method], 'window': window}
+            
+            baseline_modes = {"고정 (456번째 행)": "fixed", "자동 (평탄 구간)": "auto"}
+            baseline_label = st.radio("📏 기준점 방식", list(baseline_modes), help="Position 1-3 프로파일에서 차감할 기준 높이")
+            
+            resample_pitch = None
+            if st.checkbox("📐 공통 x 그리드로 리샘플링", help="장비/레시피별 샘플 위치나 간격이 다른 프로파일을 같은 x 위치로 보간"):
+                resample_pitch = st.number_input("그리드 간격 [um]", min_value=0.1, value=PIXEL_PITCH, step=0.01)
+            
+            backend = st.selectbox(
+                "⚙️ 분석 엔진",
+                ["pandas", "polars"] if POLARS_AVAILABLE else ["pandas"],
+                help="polars: 전처리와 프로파일 행렬 변환을 lazy 쿼리로 멀티스레드 실행 (결과는 pandas와 동일)"
+            )
+            
+            golden = None
+            golden_file = st.file_uploader(
+                "🎯 Golden 프로파일 CSV (선택)",
+                type=['csv'],
+                help="side, x, y 컬럼 (Left/Right/Top: 기준점 차감 후 높이, Down: 최소값 기준 높이). 없으면 lot의 side별 중앙값 프로파일과 비교합니다."
+            )
+            if golden_file is not None:
+                golden = pd.read_csv(golden_file)
+            
+            facet_page_size = st.slider(
+                "🗂️ 그래프 페이지당 glass 수", 1, 20, 5,
+                help="glass × cell 그래프를 페이지로 나눠 필요한 페이지만 그립니다."
+            )
+            
+            with st.expander("🧩 형상 클러스터링 설정"):
+                n_clusters = st.slider("클러스터 수", 2, 20, 6)
+                cluster_file = st.file_uploader(
+                    "이전 lot 클러스터 모델 (.npz, 선택)",
+                    type=['npz'],
+                    help="'결과 다운로드' 페이지에서 받은 모델을 이어서 학습하면 lot이 달라도 같은 클러스터 번호를 유지합니다."
+                )
+
+            # 분석 설정(엔진 / 리샘플링)까지 반영해 실행 계획 다시 계산
+            lot_plan = None
+            if st.session_state.lot_plan is not None:
+                lot_plan = plan_execution(
+                    st.session_state.lot_manifest,
+                    frame=st.session_state.lot_plan.files,
+                    budget=st.session_state.lot_plan.budget,
+                    backend=backend,
+                    resample_pitch=resample_pitch,
+                    page_size=facet_page_size
+                )
+                with st.expander(f"🧮 실행 계획: {lot_plan.mode}"):
+                    if session_data.get('df_combined') is not None and lot_plan.mode != 'memory':
+                        st.caption("ℹ️ 데이터가 이미 메모리에 로드되어 있어 분석은 한 번에 실행합니다.")
+                    st.dataframe(lot_plan.describe(), use_container_width=True)
+            
             if st.button("🚀 분석 시작", type="primary", use_container_width=True):
                 with st.spinner("데이터를 분석 중입니다..."):
                     
-                    # 데이터 상태 표시
-                    st.info(f"📊 분석 대상: {len(st.session_state.df_combined):,}개 데이터 포인트")
-                    
-                    result_df, processed_df = analyze_data(st.session_state.df_combined)
+                    plan_stats = None
+                    if session_data.get('df_combined') is not None:
+                        # 데이터 상태 표시
+                        st.info(f"📊 분석 대상: {len(session_data.get('df_combined')):,}개 데이터 포인트")
+                        
+                        result_df, processed_df = analyze_data(
+                            session_data.get('df_combined'),
+                            smoothing=smoothing,
+                            baseline=baseline_modes[baseline_label],
+                            resample_pitch=resample_pitch,
+                            golden=golden,
+                            backend=backend
+                        )
+                    else:
+                        st.info(f"📊 분석 대상: {len(lot_plan.files)}개 파일 ({lot_plan.mode}, {len(lot_plan.batches)}개 묶음)")
+                        
+                        result_df, processed_df, plan_stats = analyze_plan(
+                            lot_plan,
+                            smoothing=smoothing,
+                            baseline=baseline_modes[baseline_label],
+                            resample_pitch=resample_pitch,
+                            golden=golden
+                        )
                     
                     if len(result_df) > 0:
-                        st.session_state.result_df = result_df
-                        st.session_state.processed_df = processed_df
+                        session_data.put('result_df', result_df)
+                        session_data.put('processed_df', processed_df)
+                        session_data.put('lot_index', None)
                         st.session_state.analysis_complete = True
                         
-                        # 그래프 생성
+                        # 로드 시 분위수 스케치를 만들지 못했으면 처리된 데이터에서 생성
+                        if st.session_state.quantile_sketch is None:
+                            quantile_sketch = ProfileQuantileSketch()
+                            for part in iter_frames(processed_df):
+                                quantile_sketch.add_frame(part)
+                            st.session_state.quantile_sketch = quantile_sketch
+                        
+                        # 형상 클러스터 - 이전 모델이 있으면 현재 lot으로 이어서 학습
+                        try:
+                            shape_clusters = (ProfileShapeClusters.load(cluster_file) if cluster_file is not None
+                                              else ProfileShapeClusters(n_clusters=n_clusters))
+                            shape_clusters.partial_fit_frame(processed_df)
+                            result_df = assign_shape_clusters(result_df, processed_df, shape_clusters)
+                            session_data.put('result_df', result_df)
+                            st.session_state.shape_clusters = shape_clusters
+                        except Exception as e:
+                            st.session_state.shape_clusters = None
+                            st.warning(f"⚠️ 형상 클러스터링 실패: {str(e)}")
+                        
+                        # 그래프 생성 - 예산을 넘으면 일부 glass만 (디스크에 둔 데이터는 해당 glass만 다시 읽음)
+                        plot_glasses = lot_plan.plot_glasses if lot_plan is not None and lot_plan.plots == 'limited' else None
+                        if plot_glasses is not None:
+                            st.info(f"🧮 메모리 예산에 맞춰 {len(plot_glasses)}개 glass만 전체 데이터 그래프로 그립니다.")
+                        if isinstance(processed_df, SpilledFrame):
+                            plot_df = processed_df.read(glass=plot_glasses)
+                        elif plot_glasses is not None:
+                            plot_df = processed_df[processed_df['Glass ID'].astype(str).isin(plot_glasses)]
+                        else:
+                            plot_df = processed_df
                         with st.spinner("그래프를 생성 중입니다..."):
-                            plots = create_plots(processed_df, result_df)
-                            st.session_state.plots = plots
+                            plots = create_plots(
+                                plot_df,
+                                result_df,
+                                resample_pitch=None if plan_stats is not None else resample_pitch,
+                                profile_stats=plan_stats if plan_stats is not None else st.session_state.profile_stats,
+                                page_size=facet_page_size
+                            )
+                            session_data.put('plots', plots)
                         
                         st.success("✅ 분석이 완료되었습니다!")
                         st.balloons()  # 성공 애니메이션
@@ -551,42 +735,178 @@ elif page == "📈 데이터 분석":
         with col2:
             if st.session_state.analysis_complete:
                 st.success("✅ 분석 완료")
-                st.metric("📊 결과 데이터", f"{len(st.session_state.result_df)}개 행")
-                st.metric("📈 생성된 그래프", f"{len(st.session_state.plots)}개")
+                st.metric("📊 결과 데이터", f"{len(session_data.get('result_df'))}개 행")
+                st.metric("📈 생성된 그래프", f"{len(session_data.get('plots', {}))}개")
             else:
                 st.info("⏳ 분석 대기 중")
-                if st.session_state.df_combined is not None:
-                    st.metric("📂 로드된 데이터", f"{len(st.session_state.df_combined):,}개 행")
+                if session_data.get('df_combined') is not None:
+                    st.metric("📂 로드된 데이터", f"{len(session_data.get('df_combined')):,}개 행")
+                elif st.session_state.lot_plan is not None:
+                    st.metric("📂 분석할 파일", f"{len(st.session_state.lot_plan.files):,}개 ({st.session_state.lot_plan.mode})")
         
         # 분석 결과 표시
-        if st.session_state.analysis_complete and st.session_state.result_df is not None:
+        if st.session_state.analysis_complete and session_data.get('result_df') is not None:
             st.markdown("---")
             
             # 결과 데이터 테이블
             st.subheader("📋 분석 결과 데이터")
-            st.dataframe(st.session_state.result_df, use_container_width=True)
+            st.dataframe(session_data.get('result_df'), use_container_width=True)
             
             st.markdown("---")
             
             # 그래프들
-            if st.session_state.plots:
+            if session_data.get('plots', {}):
                 # 전체 데이터 시각화
-                if 'main_plot' in st.session_state.plots:
+                if 'main_plot' in session_data.get('plots', {}):
                     st.subheader("📊 전체 데이터 시각화")
-                    st.plotly_chart(st.session_state.plots['main_plot'], use_container_width=True)
+                    show_facet_plot('main_plot')
                 
                 # 프로파일과 Hump 그래프를 나란히 배치
                 col1, col2 = st.columns(2)
                 
                 with col1:
-                    if 'profile_plot' in st.session_state.plots:
+                    if 'profile_plot' in session_data.get('plots', {}):
                         st.subheader("📈 위치별 SIP Profile")
-                        st.plotly_chart(st.session_state.plots['profile_plot'], use_container_width=True)
+                        st.plotly_chart(
+                            compact_plot('profile_plot', lambda: session_data.get('plots', {})['profile_plot']),
+                            use_container_width=True
+                        )
                 
                 with col2:
-                    if 'hump_plot' in st.session_state.plots:
+                    if 'hump_plot' in session_data.get('plots', {}):
                         st.subheader("📊 Hump Height vs Position")
-                        st.plotly_chart(st.session_state.plots['hump_plot'], use_container_width=True)
+                        show_facet_plot('hump_plot')
+                
+                # 패널 맵 (마더 글라스 위 cell 배치)
+                if 'panel_map' in session_data.get('plots', {}):
+                    st.subheader("🗺️ 패널 맵")
+                    result_df = session_data.get('result_df')
+                    value_options = [col for col in [
+                        'hump_dy', 'hump_dx', 'hump_dy_fit', 'hump_fwhm', 'hump_area', 'golden_rms', 'golden_z'
+                    ] if col in result_df.columns]
+                    col_v, col_g, col_a = st.columns(3)
+                    with col_v:
+                        map_value = st.selectbox("값", value_options, key="panel_map_value")
+                    with col_g:
+                        map_glass = st.selectbox(
+                            "Glass", ["전체"] + sorted(result_df['glass'].astype(str).unique()), key="panel_map_glass"
+                        )
+                    with col_a:
+                        map_agg = st.selectbox("집계 (전체 glass)", ["median", "mean", "max", "min"], key="panel_map_agg")
+                    
+                    if map_value == 'hump_dy' and map_glass == "전체" and map_agg == "median":
+                        panel_fig = compact_plot('panel_map', lambda: session_data.get('plots', {})['panel_map'])
+                    else:
+                        # 선택에 따라 매번 새로 그리는 heatmap은 캐시하지 않음
+                        panel_fig = compact_figure(panel_heatmap(
+                            result_df,
+                            value=map_value,
+                            glass=None if map_glass == "전체" else map_glass,
+                            agg=map_agg
+                        ))
+                    st.plotly_chart(panel_fig, use_container_width=True)
+            
+            # 장기 분위수 밴드 - 이전 lot 스케치와 병합
+            if st.session_state.quantile_sketch is not None:
+                with st.expander("📈 SIP 높이 분위수 밴드 (P5 / P50 / P95)"):
+                    history_files = st.file_uploader(
+                        "이전 lot 분위수 스케치 (.npz, 여러 개 선택 가능)",
+                        type=['npz'],
+                        accept_multiple_files=True,
+                        help="'결과 다운로드' 페이지에서 받은 lot별 스케치를 합쳐 장기간 분위수를 계산합니다."
+                    )
+                    sketch = ProfileQuantileSketch(
+                        pitch=st.session_state.quantile_sketch.pitch,
+                        resolution=st.session_state.quantile_sketch.resolution
+                    ).merge(st.session_state.quantile_sketch)
+                    for history_file in history_files or []:
+                        try:
+                            sketch.merge(ProfileQuantileSketch.load(history_file))
+                        except Exception as e:
+                            st.error(f"❌ {history_file.name} 병합 실패: {str(e)}")
+                    
+                    st.caption(f"🔢 누적 샘플 수: {len(sketch):,}개 (현재 lot + 이전 스케치 {len(history_files or [])}개)")
+                    st.plotly_chart(create_quantile_plot(sketch), use_container_width=True)
+            
+            # 형상 클러스터 중심 프로파일
+            if st.session_state.shape_clusters is not None:
+                with st.expander("🧩 형상 클러스터 중심"):
+                    cluster_counts = (
+                        session_data.get('result_df').groupby(['side', 'shape_cluster']).size().unstack(fill_value=0)
+                    )
+                    st.caption(f"🔢 누적 학습 프로파일 수: {st.session_state.shape_clusters.n_seen:,}개")
+                    st.dataframe(cluster_counts, use_container_width=True)
+                    st.plotly_chart(create_cluster_plot(st.session_state.shape_clusters), use_container_width=True)
+            
+            # 유사 프로파일 검색 - 디스크에 누적한 과거 프로파일 인덱스
+            if session_data.get('processed_df') is not None:
+                with st.expander("🔍 유사 프로파일 검색"):
+                    index_dir = st.text_input(
+                        "인덱스 디렉터리",
+                        value="profile_index",
+                        help="과거 lot 프로파일 벡터를 누적 저장하는 디렉터리입니다."
+                    )
+                    
+                    col_load, col_add = st.columns(2)
+                    with col_load:
+                        if st.button("📂 인덱스 불러오기", use_container_width=True):
+                            try:
+                                st.session_state.profile_index = ProfileIndex.load(index_dir)
+                                st.success(f"✅ {len(st.session_state.profile_index):,}개 프로파일 인덱스를 불러왔습니다.")
+                            except Exception as e:
+                                st.error(f"❌ 인덱스 불러오기 실패: {str(e)}")
+                    with col_add:
+                        if st.button("➕ 현재 lot 추가 후 저장", use_container_width=True):
+                            try:
+                                # 기존 벡터는 그대로 두고 현재 lot 벡터만 파일 끝에 덧붙임
+                                st.session_state.profile_index = ProfileIndex.append_frame(
+                                    index_dir, session_data.get('processed_df')
+                                )
+                                st.success(f"✅ 인덱스 저장 완료: {len(st.session_state.profile_index):,}개 프로파일")
+                            except Exception as e:
+                                st.error(f"❌ 인덱스 저장 실패: {str(e)}")
+                    
+                    index = st.session_state.profile_index
+                    if index is None:
+                        # 인덱스가 없으면 현재 lot 안에서만 검색 (분석마다 한 번만 만들어 세션에 보관)
+                        index = session_data.get('lot_index')
+                        if index is None:
+                            try:
+                                index = ProfileIndex.from_frame(session_data.get('processed_df'))
+                            except ValueError:
+                                index = ProfileIndex(n_components=None).add_frame(session_data.get('processed_df'))
+                            session_data.put('lot_index', index)
+                        st.caption("ℹ️ 인덱스를 불러오지 않아 현재 lot 안에서만 검색합니다.")
+                    else:
+                        st.caption(f"🔢 인덱스 프로파일 수: {len(index):,}개")
+                    
+                    result_keys = session_data.get('result_df')[['glass', 'cell', 'side']].astype(str)
+                    col_g, col_c, col_s, col_k = st.columns(4)
+                    with col_g:
+                        query_glass = st.selectbox("Glass", sorted(result_keys['glass'].unique()))
+                    with col_c:
+                        query_cell = st.selectbox(
+                            "Cell", sorted(result_keys.loc[result_keys['glass'] == query_glass, 'cell'].unique())
+                        )
+                    with col_s:
+                        query_side = st.selectbox(
+                            "Side",
+                            sorted(result_keys.loc[
+                                (result_keys['glass'] == query_glass) & (result_keys['cell'] == query_cell), 'side'
+                            ].unique())
+                        )
+                    with col_k:
+                        n_neighbors = st.number_input("검색 개수", min_value=1, max_value=100, value=10)
+                    
+                    try:
+                        neighbors = index.query(query_glass, query_cell, query_side, k=int(n_neighbors))
+                        st.dataframe(neighbors.drop(columns='index'), use_container_width=True)
+                        st.plotly_chart(
+                            create_similar_plot(index, neighbors, (query_glass, query_cell, query_side)),
+                            use_container_width=True
+                        )
+                    except KeyError as e:
+                        st.info(f"ℹ️ {e.args[0]} - 먼저 현재 lot을 인덱스에 추가해주세요.")
 
 elif page == "💾 결과 다운로드":
     st.title("💾 결과 다운로드")
@@ -603,9 +923,9 @@ elif page == "💾 결과 다운로드":
         with col1:
             st.subheader("📊 CSV 결과 다운로드")
             
-            if st.session_state.result_df is not None:
+            if session_data.get('result_df') is not None:
                 csv_buffer = io.StringIO()
-                st.session_state.result_df.to_csv(csv_buffer, index=False, encoding='utf-8-sig')
+                session_data.get('result_df').to_csv(csv_buffer, index=False, encoding='utf-8-sig')
                 csv_data = csv_buffer.getvalue()
                 
                 st.download_button(
@@ -616,12 +936,12 @@ elif page == "💾 결과 다운로드":
                     use_container_width=True
                 )
                 
-                st.info(f"📋 데이터: {len(st.session_state.result_df)}개 행")
+                st.info(f"📋 데이터: {len(session_data.get('result_df'))}개 행")
         
         with col2:
             st.subheader("🖼️ 그래프 다운로드")
             
-            if st.session_state.plots:
+            if session_data.get('plots', {}):
                 # HTML로 그래프 저장 - 색상 보존
                 def create_html_with_plots():
                     """색상이 보존된 HTML 생성"""
@@ -679,10 +999,11 @@ elif page == "💾 결과 다운로드":
                     plot_titles = {
                         'main_plot': '📈 전체 데이터 시각화',
                         'profile_plot': '📉 위치별 SIP 잉크젯 Edge Profile', 
-                        'hump_plot': '📊 Hump Height vs Position 분석'
+                        'hump_plot': '📊 Hump Height vs Position 분석',
+                        'panel_map': '🗺️ 패널 맵 (hump_dy, glass 중앙값)'
                     }
                     
-                    for plot_name, plot in st.session_state.plots.items():
+                    for plot_name, plot in session_data.get('plots', {}).items():
                         title = plot_titles.get(plot_name, plot_name)
                         html_content += f'<h2>{title}</h2>\n'
                         html_content += '<div class="plot-container">\n'
@@ -739,7 +1060,7 @@ elif page == "💾 결과 다운로드":
                         use_container_width=True
                     )
                     
-                    st.info(f"📊 그래프: {len(st.session_state.plots)}개")
+                    st.info(f"📊 그래프: {len(session_data.get('plots', {}))}개")
                     st.success("✅ 색상이 보존된 HTML 파일로 다운로드됩니다!")
                     
                 except Exception as e:
@@ -748,7 +1069,7 @@ elif page == "💾 결과 다운로드":
                     html_buffer = io.StringIO()
                     html_buffer.write("<html><head><title>분석 결과</title></head><body>")
                     
-                    for plot_name, plot in st.session_state.plots.items():
+                    for plot_name, plot in session_data.get('plots', {}).items():
                         html_buffer.write(f"<h2>{plot_name}</h2>\n")
                         html_buffer.write(plot.to_html(include_plotlyjs='cdn'))
                         html_buffer.write("<br><br>\n")
@@ -765,6 +1086,126 @@ elif page == "💾 결과 다운로드":
                     )
             else:
                 st.warning("⚠️ 다운로드할 그래프가 없습니다.")
+
+        # Excel / Parquet 다운로드 (행 묶음 단위로 흘려 쓰므로 프로파일 전체도 메모리 사용량 일정)
+        if session_data.get('result_df') is not None:
+            st.markdown("---")
+            st.subheader("📗 Excel / Parquet 다운로드")
+
+            col_split, col_raw = st.columns(2)
+            with col_split:
+                sheet_split = st.selectbox(
+                    "Excel 시트 나누기",
+                    ["없음", "split", "side"],
+                    help="선택한 컬럼 값마다 결과 시트를 따로 추가합니다."
+                )
+            with col_raw:
+                include_profiles = st.checkbox(
+                    "처리된 프로파일 포함",
+                    value=False,
+                    disabled=session_data.get('processed_df') is None,
+                    help="전처리된 long 형식 프로파일을 'profiles' 시트 / 별도 Parquet 파일로 함께 저장합니다."
+                )
+            processed = session_data.get('processed_df') if include_profiles else None
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+            col_xlsx, col_parquet = st.columns(2)
+            with col_xlsx:
+                if st.button("📗 Excel 파일 만들기", use_container_width=True):
+                    xlsx_buffer = io.BytesIO()
+                    write_xlsx(xlsx_buffer, result_sheets(
+                        session_data.get('result_df'),
+                        split_by=None if sheet_split == "없음" else sheet_split,
+                        processed_df=processed
+                    ))
+                    st.download_button(
+                        label="📥 Excel (.xlsx) 다운로드",
+                        data=xlsx_buffer.getvalue(),
+                        file_name=f"analysis_result_{timestamp}.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        use_container_width=True
+                    )
+            with col_parquet:
+                if st.button("🧱 Parquet 파일 만들기", use_container_width=True):
+                    try:
+                        parquet_buffer = io.BytesIO()
+                        write_parquet(parquet_buffer, session_data.get('result_df'))
+                        st.download_button(
+                            label="📥 결과 Parquet 다운로드",
+                            data=parquet_buffer.getvalue(),
+                            file_name=f"analysis_result_{timestamp}.parquet",
+                            mime="application/octet-stream",
+                            use_container_width=True
+                        )
+                        if processed is not None:
+                            profiles_buffer = io.BytesIO()
+                            write_parquet(profiles_buffer, processed)
+                            st.download_button(
+                                label="📥 프로파일 Parquet 다운로드",
+                                data=profiles_buffer.getvalue(),
+                                file_name=f"processed_profiles_{timestamp}.parquet",
+                                mime="application/octet-stream",
+                                use_container_width=True
+                            )
+                    except ImportError as e:
+                        st.error(f"❌ {e}")
+
+        # lot별 분위수 스케치 다운로드 (장기 분위수 밴드용)
+        if st.session_state.get('quantile_sketch') is not None:
+            st.markdown("---")
+            st.subheader("📈 분위수 스케치 다운로드")
+            
+            sketch_buffer = io.BytesIO()
+            st.session_state.quantile_sketch.save(sketch_buffer)
+            
+            st.download_button(
+                label="📥 분위수 스케치 (.npz) 다운로드",
+                data=sketch_buffer.getvalue(),
+                file_name=f"profile_sketch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.npz",
+                mime="application/octet-stream",
+                use_container_width=True
+            )
+            st.info("💡 lot별 스케치를 모아 '데이터 분석' 페이지에서 합치면 원본 CSV 없이 장기간 P5/P50/P95 밴드를 볼 수 있습니다.")
+        
+        # 원본 lot 압축 아카이브 다운로드 (장기 보관용)
+        lot_loaded = session_data.get('df_combined') is not None and 'file' in session_data.get('df_combined').columns
+        if lot_loaded or st.session_state.lot_plan is not None:
+            st.markdown("---")
+            st.subheader("🗄️ 원본 데이터 아카이브 다운로드")
+            
+            if st.button("🗄️ 원본 CSV를 아카이브(.hparc)로 묶기", use_container_width=True):
+                archive_buffer = io.BytesIO()
+                # lot을 합치지 않은 경우(chunked / spill)는 원본 파일을 하나씩 읽어 바로 기록
+                write_archive(
+                    archive_buffer,
+                    session_data.get('df_combined').groupby('file', sort=False, dropna=False) if lot_loaded
+                    else manifest_sources(st.session_state.lot_plan.files)
+                )
+                st.download_button(
+                    label="📥 원본 아카이브 (.hparc) 다운로드",
+                    data=archive_buffer.getvalue(),
+                    file_name=f"raw_lot_{datetime.now().strftime('%Y%m%d_%H%M%S')}.hparc",
+                    mime="application/octet-stream",
+                    use_container_width=True
+                )
+                st.info("💡 아카이브는 '파일 업로드' 페이지에서 CSV 대신 바로 불러올 수 있습니다.")
+        
+        # 형상 클러스터 모델 다운로드 (다음 lot 학습에 이어서 사용)
+        if st.session_state.get('shape_clusters') is not None:
+            st.markdown("---")
+            st.subheader("🧩 형상 클러스터 모델 다운로드")
+            
+            model_buffer = io.BytesIO()
+            st.session_state.shape_clusters.save(model_buffer)
+            
+            st.download_button(
+                label="📥 클러스터 모델 (.npz) 다운로드",
+                data=model_buffer.getvalue(),
+                file_name=f"shape_clusters_{datetime.now().strftime('%Y%m%d_%H%M%S')}.npz",
+                mime="application/octet-stream",
+                use_container_width=True
+            )
+            st.info("💡 다음 lot 분석 시 '형상 클러스터링 설정'에 이 모델을 넣으면 같은 클러스터 번호로 이어서 학습합니다.")
         
         # 전체 결과 ZIP 다운로드
         st.markdown("---")
@@ -775,15 +1216,17 @@ elif page == "💾 결과 다운로드":
             
             with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
                 # CSV 결과 추가
-                if st.session_state.result_df is not None:
+                if session_data.get('result_df') is not None:
                     csv_buffer = io.StringIO()
-                    st.session_state.result_df.to_csv(csv_buffer, index=False, encoding='utf-8-sig')
+                    session_data.get('result_df').to_csv(csv_buffer, index=False, encoding='utf-8-sig')
                     zip_file.writestr("analysis_result.csv", csv_buffer.getvalue())
+                    with zip_file.open("analysis_result.xlsx", 'w') as xlsx_file:
+                        write_xlsx(xlsx_file, result_sheets(session_data.get('result_df'), split_by='side'))
                 
                 # HTML 그래프 추가
-                if st.session_state.plots:
+                if session_data.get('plots', {}):
                     html_buffer = io.StringIO()
-                    for plot_name, plot in st.session_state.plots.items():
+                    for plot_name, plot in session_data.get('plots', {}).items():
                         html_buffer.write(f"<h2>{plot_name}</h2>\n")
                         html_buffer.write(plot.to_html(include_plotlyjs='cdn'))
                         html_buffer.write("<br><br>\n")
@@ -816,6 +1259,9 @@ st.sidebar.info("""
 3. 결과 확인 및 다운로드
 """)
 
+# 세션 데이터 사용량 - 서버 메모리 예산을 넘으면 오래 쓰지 않은 값부터 디스크로 내려감
+st.sidebar.caption(f"🧠 세션 데이터: {session_data.describe()}")
+
 # 하단 정보
 st.markdown("---")
 st.markdown(
@@ -18,15 +18,57 @@ from datetime import datetime
 import re
 from pathlib import Path
 
+from execution_plan import SpilledFrame, execute_plan, plan_execution
+from facet_pages import FacetPager
+from figure_transport import compact_figure
+from hump_kernels import PIXEL_PITCH
+from hump_pipeline import analyze_lot, resolve_paths
+from lot_manifest import LotManifest, manifest_sources
+from panel_map import panel_heatmap
+from profile_archive import is_archive, iter_archive, write_archive
+from profile_clusters import ProfileShapeClusters, assign_shape_clusters
+from profile_index import ProfileIndex
+from profile_sql import ProfileCatalog
+from profile_stats import EdgeProfileAccumulator, ProfileQuantileSketch, build_profile_stats
+from profile_validation import IngestReport
+from result_export import pq, result_sheets, write_parquet, write_xlsx
+
 # 한글 폰트 설정
 plt.rcParams['font.family'] = ['DejaVu Sans', 'Malgun Gothic', 'NanumGothic']
 plt.rcParams['axes.unicode_minus'] = False
 
 class CSVAnalyzer:
-    def __init__(self):
+    def __init__(self, smoothing=None, baseline='fixed', resample_pitch=None, golden=None, shape_clusters=6,
+                 page_size=5, backend='pandas', memory_budget=None):
+        # side별 평활화 설정 (예: {'Left': {'method': 'savgol', 'window': 7}})
+        self.smoothing = smoothing
+        # Position 1-3 기준점 방식 ('fixed': 456번째 행, 'auto': 자동 평탄 구간)
+        self.baseline = baseline
+        # 공통 x 그리드 간격 [um] (None이면 리샘플링하지 않음)
+        self.resample_pitch = resample_pitch
+        # golden 프로파일 (side, x, y 컬럼 DataFrame 또는 CSV 경로, None이면 lot 중앙값 프로파일)
+        self.golden = pd.read_csv(golden) if isinstance(golden, str) else golden
+        # 형상 클러스터 (클러스터 수 또는 이전 lot 모델 .npz 경로 - 경로면 이어서 학습)
+        self.shape_clusters = (ProfileShapeClusters.load(shape_clusters) if isinstance(shape_clusters, str)
+                               else ProfileShapeClusters(n_clusters=shape_clusters))
         self.df_combined = None
         self.result_df = None
         self.processed_df = None
+        self.profile_stats = None
+        self.quantile_sketch = None
+        self.ingest_report = None
+        # 전체 파싱 전 lot 구성 사전 조회 (scan_paths / load_paths)
+        self.manifest = None
+        # glass × cell facet 그래프의 페이지당 glass 수
+        self.page_size = page_size
+        self.facet_pagers = {}
+        # 분석 백엔드 ('pandas' 또는 'polars' - 전처리 + 행렬 변환을 lazy 쿼리로 멀티스레드 실행)
+        self.backend = backend
+        # 메모리 예산 (byte 수 또는 '2GB', None이면 HUMP_MEMORY_BUDGET / 사용 가능 메모리의 절반)
+        # load_paths는 예산을 넘는 lot을 합치지 않고 glass 묶음별로 분석 (execution_plan)
+        self.memory_budget = memory_budget
+        self.plan = None
+        self.plan_stats = None
         self.plots = {}
         
         # 위젯 생성
@@ -37,11 +79,18 @@ class CSVAnalyzer:
         """위젯 생성"""
         # 파일 업로드 위젯
         self.file_upload = widgets.FileUpload(
-            accept='.csv',
+            accept='.csv,.hparc',
             multiple=True,
             description='CSV 파일 선택'
         )
         
+        # 서버 경로 입력 (업로드 없이 디스크에서 직접 로드)
+        self.path_input = widgets.Text(
+            placeholder='/data/lot01, /data/**/G001_*.csv',
+            description='경로',
+            layout=widgets.Layout(width='500px')
+        )
+        
         # 버튼들
         self.load_button = widgets.Button(
             description='📂 데이터 로드',
@@ -49,6 +98,12 @@ class CSVAnalyzer:
             layout=widgets.Layout(width='150px')
         )
         
+        self.path_load_button = widgets.Button(
+            description='📁 경로에서 로드',
+            button_style='primary',
+            layout=widgets.Layout(width='150px')
+        )
+        
         self.analyze_button = widgets.Button(
             description='🚀 분석 시작',
             button_style='success',
@@ -68,6 +123,7 @@ class CSVAnalyzer:
         
         # 이벤트 핸들러 연결
         self.load_button.on_click(self.load_data)
+        self.path_load_button.on_click(self.load_from_path)
         self.analyze_button.on_click(self.analyze_data)
         self.download_button.on_click(self.save_results)
     
@@ -80,7 +136,8 @@ class CSVAnalyzer:
         upload_box = widgets.VBox([
             widgets.HTML("<h3>📁 파일 업로드</h3>"),
             self.file_upload,
-            self.load_button
+            self.load_button,
+            widgets.HBox([self.path_input, self.path_load_button])
         ])
         
         # 컨트롤 섹션
@@ -105,7 +162,8 @@ class CSVAnalyzer:
         return str(cell_id)[-3:]
     
     def extract_position_from_file(self, filename):
-        """파일명에서 position 정보 추출"""
+        """파일명에서 position 정보 추출 (하위 폴더 경로가 붙은 이름이면 파일명 부분만 사용)"""
+        filename = str(filename).replace('\\', '/').rsplit('/', 1)[-1]
         if len(filename) >= 13:
             return filename[-13]
         return "1"
@@ -132,7 +190,7 @@ class CSVAnalyzer:
         return position_map.get(str(position), "Unknown")
     
     def load_data(self, button):
-        """데이터 로드"""
+        """업로드한 파일로 데이터 로드"""
         with self.output_status:
             self.output_status.clear_output()
             
@@ -140,250 +198,209 @@ class CSVAnalyzer:
                 print("⚠️ CSV 파일을 선택해주세요.")
                 return
             
-            print("📂 데이터를 로딩 중입니다...")
-            
+            self._load_sources(self._upload_sources())
+    
+    def load_from_path(self, button):
+        """경로 입력란(쉼표로 여러 개)의 파일 / glob 패턴 / 디렉터리에서 데이터 로드"""
+        with self.output_status:
+            self.output_status.clear_output()
+            paths = [path.strip() for path in self.path_input.value.split(',') if path.strip()]
+            if not paths:
+                print("⚠️ 파일, glob 패턴 또는 디렉터리 경로를 입력해주세요.")
+                return
+            self.load_paths(*paths)
+    
+    def scan_paths(self, *paths, recursive=True, exact=False):
+        """전체 파싱 없이 lot 구성만 사전 조회 (파일명 / 크기 / 첫 데이터 행, .hparc는 헤더만)
+        
+        사용 예: manifest = analyzer.scan_paths('/data/lot01'); manifest.coverage()
+        """
+        with self.output_status:
+            files = resolve_paths(*paths, recursive=recursive)
+            if not files:
+                print(f"⚠️ 경로에서 CSV/.hparc 파일을 찾을 수 없습니다: {', '.join(map(str, paths))}")
+                return None
+            self.manifest = LotManifest.scan(files, exact=exact)
+            summary = self.manifest.summary()
+            print(f"🧭 파일 {summary['files']}개: glass {summary['glasses']}개, cell {summary['cells']}개, "
+                  f"프로파일 {summary['profiles']}개, 예상 {summary['rows']:,}행")
+            if summary['incomplete_cells'] > 0:
+                print(f"⚠️ side가 빠진 glass/cell {summary['incomplete_cells']}개")
+                display(self.manifest.missing_sides())
+            if summary['duplicate_files'] > 0:
+                print(f"⚠️ 같은 glass/cell/position이 중복된 파일 {summary['duplicate_files']}개")
+        return self.manifest
+    
+    def load_paths(self, *paths, recursive=True, glass=None, cell=None, side=None, skip_duplicates=False):
+        """서버 디스크의 파일 / glob 패턴 / 디렉터리에서 직접 로드 (업로드 크기 제한 없음)
+        
+        glass / cell / side / skip_duplicates: 사전 조회(manifest)로 골라 조건에 맞는 파일만 파싱
+        사용 예: analyzer.load_paths('/data/lot01', side=['Top', 'Down']) 또는 analyzer.load_paths('/data/**/G001_*.csv')
+        """
+        if self.scan_paths(*paths, recursive=recursive) is None:
+            return None
+        with self.output_status:
+            selected = self.manifest.select(glass=glass, cell=cell, side=side, skip_duplicates=skip_duplicates)
+            print(f"📁 {len(self.manifest)}개 중 {len(selected)}개 파일 로드")
+            plan = plan_execution(
+                self.manifest, frame=selected, budget=self.memory_budget, backend=self.backend,
+                resample_pitch=self.resample_pitch, page_size=self.page_size
+            )
+            print(f"🧮 실행 계획: {plan.mode} (그래프: {plan.plots})")
+            if plan.mode != 'memory' or plan.plots != 'full':
+                display(plan.describe())
+            self._load_sources(manifest_sources(selected), plan=plan)
+        return self.df_combined
+    
+    def load_query(self, root, where=None, **filters):
+        """원본 CSV 트리에서 SQL 조건에 맞는 파일만 골라 로드 (DuckDB 필요)
+        
+        사용 예: analyzer.load_query('/data/wsi', side='Top', cell='C08', where="path LIKE '%/2024-06/%'")
+        """
+        with self.output_status:
             try:
-                dataframes = []
-                for filename, file_info in self.file_upload.value.items():
-                    # 파일 내용을 pandas로 읽기
-                    content = file_info['content']
-                    df = pd.read_csv(io.BytesIO(content))
-                    df['file'] = filename
+                catalog = ProfileCatalog(root)
+                sources = list(catalog.sources(where, **filters))
+                catalog.close()
+            except Exception as e:
+                print(f"❌ 조회 오류: {str(e)}")
+                return None
+            if not sources:
+                print("⚠️ 조건에 맞는 프로파일이 없습니다.")
+                return None
+            print(f"🔎 조건에 맞는 파일 {len(sources)}개")
+            self._load_sources(sources)
+        return self.df_combined
+    
+    def _upload_sources(self):
+        """업로드 위젯의 (파일명, DataFrame) - 압축 아카이브 .hparc는 원본 CSV별로 풀어서 반환"""
+        for upload_name, file_info in self.file_upload.value.items():
+            content = io.BytesIO(file_info['content'])
+            if is_archive(upload_name):
+                yield from iter_archive(content)
+            else:
+                yield upload_name, pd.read_csv(content)
+    
+    def _load_sources(self, sources, plan=None):
+        """(파일명, DataFrame)을 읽으면서 품질 검사 / 프로파일 집계를 함께 수행
+        
+        plan: 실행 계획 (chunked / spill이면 합치지 않고 검사 / 집계만, 분석 때 묶음별로 다시 읽음)
+        """
+        print("📂 데이터를 로딩 중입니다...")
+        
+        try:
+            keep = plan is None or plan.mode == 'memory'
+            dataframes = []
+            preview = None
+            n_rows = 0
+            profile_stats = EdgeProfileAccumulator()
+            quantile_sketch = ProfileQuantileSketch()
+            ingest_report = IngestReport()
+            for filename, df in sources:
+                # 읽은 DataFrame 그대로 품질 검사 (원본을 다시 읽지 않음)
+                ingest_report.add(filename, df)
+                df['file'] = filename
+                n_rows += len(df)
+                if keep:
                     dataframes.append(df)
-                    print(f"✅ {filename} 로드 완료")
+                elif preview is None:
+                    preview = df.head(10)
                 
-                self.df_combined = pd.concat(dataframes, ignore_index=True)
-                print(f"🎉 총 {len(self.df_combined):,}개의 데이터 포인트가 로드되었습니다!")
-                
-                # 데이터 미리보기
-                with self.output_data:
-                    self.output_data.clear_output()
-                    print("📋 데이터 미리보기:")
-                    display(self.df_combined.head(10))
-                
-            except Exception as e:
-                print(f"❌ 오류 발생: {str(e)}")
+                # 평균 프로파일 집계 - 로드하면서 바로 누적 (컬럼명이 다르면 분석 시 집계)
+                if profile_stats is not None and 'no' in df.columns and 'Avg Offset' in df.columns:
+                    side = self.position_to_side(self.extract_position_from_file(filename))
+                    pitch = df['pitch'].fillna(PIXEL_PITCH) if 'pitch' in df.columns else PIXEL_PITCH
+                    profile_stats.add(side, df['no'] * pitch, df['Avg Offset'])
+                    quantile_sketch.add(side, df['no'] * pitch, df['Avg Offset'])
+                else:
+                    profile_stats = None
+                    quantile_sketch = None
+                print(f"✅ {filename} 로드 완료")
+            
+            self.df_combined = pd.concat(dataframes, ignore_index=True) if keep else None
+            self.plan = plan
+            self.profile_stats = profile_stats
+            self.quantile_sketch = quantile_sketch
+            self.ingest_report = ingest_report.to_frame()
+            print(f"🎉 총 {n_rows:,}개의 데이터 포인트가 로드되었습니다!")
+            if not keep:
+                print(f"🧮 메모리 예산을 넘어 lot을 합치지 않았습니다. 분석 시 {len(plan.batches)}개 묶음으로 나눠 읽습니다.")
+            
+            # 파일별 품질 리포트 (문제가 있는 파일만 표시)
+            problems = self.ingest_report[self.ingest_report['status'] != 'OK']
+            if len(problems) > 0:
+                n_error = int((problems['status'] == 'ERROR').sum())
+                print(f"⚠️ 품질 검사: 오류 {n_error}개, 경고 {len(problems) - n_error}개 파일")
+                display(problems)
+            else:
+                print(f"✅ 품질 검사: {len(self.ingest_report)}개 파일 모두 정상")
+            
+            # 데이터 미리보기
+            with self.output_data:
+                self.output_data.clear_output()
+                print("📋 데이터 미리보기:")
+                display(self.df_combined.head(10) if keep else preview)
+            
+        except Exception as e:
+            print(f"❌ 오류 발생: {str(e)}")
     
     def analyze_data(self, button):
         """데이터 분석"""
         with self.output_status:
-            if self.df_combined is None:
+            if self.df_combined is None and self.plan is None:
                 print("⚠️ 먼저 데이터를 로드해주세요.")
                 return
             
             print("🔍 데이터를 분석 중입니다...")
             
             try:
-                # 데이터 구조 확인
-                print("📋 데이터 구조 확인:")
-                print(f"컬럼명: {list(self.df_combined.columns)}")
-                print(f"데이터 형태: {self.df_combined.shape}")
-                
-                # 기본 데이터 전처리
-                df = self.df_combined.copy()
-                
-                # 'no' 컬럼 확인 및 생성
-                if 'no' not in df.columns:
-                    if 'No' in df.columns:
-                        df['no'] = df['No']
-                    elif 'NO' in df.columns:
-                        df['no'] = df['NO']
-                    elif 'index' in df.columns:
-                        df['no'] = df['index']
-                    elif 'Index' in df.columns:
-                        df['no'] = df['Index']
-                    else:
-                        # 인덱스를 'no' 컬럼으로 사용
-                        df['no'] = df.index + 1
-                        print("⚠️ 'no' 컬럼을 찾을 수 없어서 인덱스를 사용합니다.")
-                
-                # 필수 컬럼 확인
-                required_cols = ['CELL ID', 'Avg Offset', 'Glass ID']
-                missing_cols = [col for col in required_cols if col not in df.columns]
-                
-                if missing_cols:
-                    # 대안 컬럼명 확인
-                    col_mapping = {}
-                    for col in missing_cols:
-                        if col == 'CELL ID':
-                            alternatives = ['Cell ID', 'cell_id', 'cellid', 'Cell_ID', 'CellID']
-                        elif col == 'Avg Offset':
-                            alternatives = ['avg_offset', 'AvgOffset', 'Average Offset', 'Offset']
-                        elif col == 'Glass ID':
-                            alternatives = ['Glass_ID', 'glass_id', 'glassid', 'GlassID', 'glass']
-                        
-                        for alt in alternatives:
-                            if alt in df.columns:
-                                col_mapping[col] = alt
-                                break
-                    
-                    # 컬럼명 변경
-                    for original, alternative in col_mapping.items():
-                        df[original] = df[alternative]
-                        print(f"✅ '{alternative}' 컬럼을 '{original}'로 매핑했습니다.")
-                    
-                    # 여전히 없는 컬럼 확인
-                    still_missing = [col for col in required_cols if col not in df.columns]
-                    if still_missing:
-                        print(f"❌ 다음 필수 컬럼을 찾을 수 없습니다: {still_missing}")
-                        print(f"사용 가능한 컬럼: {list(df.columns)}")
-                        return
-                
-                # 데이터 전처리 계속
-                df['cell'] = df['CELL ID'].apply(self.extract_cell_from_id)
-                df['position'] = df['file'].apply(self.extract_position_from_file)
-                df['x'] = df['no'] * 10.96
-                df['side'] = df['position'].apply(self.position_to_side)
-                
-                # position이 "4"가 아닌 데이터 분석 (result1)
-                df_not_4 = df[df['position'] != "4"].copy()
-                
-                if len(df_not_4) > 0:
-                    print("📊 Position 1-3 데이터 분석 중...")
+                self.plan_stats = None
+                if self.df_combined is not None:
+                    # 데이터 구조 확인
+                    print("📋 데이터 구조 확인:")
+                    print(f"컬럼명: {list(self.df_combined.columns)}")
+                    print(f"데이터 형태: {self.df_combined.shape}")
                     
-                    try:
-                        df_pivot = df_not_4.pivot_table(
-                            index='no',
-                            columns=['Glass ID', 'cell', 'position'],
-                            values='Avg Offset',
-                            aggfunc='first'
-                        )
-                        
-                        print(f"✅ Pivot 테이블 생성 완료: {df_pivot.shape}")
-                        
-                        # 기준점 차감
-                        reference_row = min(455, len(df_pivot) - 1)
-                        if reference_row >= 0:
-                            df_pivot = df_pivot.sub(df_pivot.iloc[reference_row], axis=1)
-                            print(f"✅ 기준점({reference_row + 1}번째 행) 차감 완료")
-                        
-                        # pivot_longer 구현 - 안전한 방법
-                        df_pivot_reset = df_pivot.reset_index()
-                        value_columns = [col for col in df_pivot_reset.columns if col != 'no']
-                        
-                        df_long_list = []
-                        for col in value_columns:
-                            if isinstance(col, tuple) and len(col) == 3:
-                                glass, cell, position = col
-                                temp_df = pd.DataFrame({
-                                    'no': df_pivot_reset['no'],
-                                    'glass': glass,
-                                    'cell': cell,
-                                    'position': position,
-                                    'y': df_pivot_reset[col]
-                                })
-                                df_long_list.append(temp_df)
-                        
-                        if df_long_list:
-                            df_long = pd.concat(df_long_list, ignore_index=True)
-                            df_long = df_long.dropna()
-                        else:
-                            print("❌ 데이터 변환 실패")
-                            df_long = pd.DataFrame()
-                            
-                    except Exception as e:
-                        print(f"❌ Pivot 처리 중 오류: {str(e)}")
-                        df_long = pd.DataFrame()
-                    
-                    if len(df_long) > 0:
-                        df_long['side'] = df_long['position'].apply(self.position_to_side)
-                        
-                        # hump 분석
-                        try:
-                            result1_list = []
-                            
-                            for (glass, cell, side), group in df_long.groupby(['glass', 'cell', 'side']):
-                                if len(group) > 0 and not group['y'].isna().all():
-                                    max_y = group['y'].max()
-                                    max_idx = group['y'].idxmax()
-                                    max_x_position = group.loc[max_idx, 'no'] if max_idx in group.index else 0
-                                    
-                                    result1_list.append({
-                                        'glass': glass,
-                                        'cell': cell,
-                                        'side': side,
-                                        'hump_dy': round(max_y, 1),
-                                        'hump_dx': round(10.96 * max_x_position, 0)
-                                    })
-                            
-                            if result1_list:
-                                result1 = pd.DataFrame(result1_list)
-                                result1['split'] = result1['cell'].apply(self.assign_split_category)
-                                print(f"✅ Position 1-3 분석 완료: {len(result1)}개 결과")
-                            else:
-                                result1 = pd.DataFrame()
-                                print("⚠️ Position 1-3 분석 결과가 없습니다.")
-                                
-                        except Exception as e:
-                            print(f"❌ Hump 분석 중 오류: {str(e)}")
-                            result1 = pd.DataFrame()
-                    else:
-                        result1 = pd.DataFrame()
-                        print("⚠️ Position 1-3 데이터 변환 결과가 없습니다.")
+                    self.result_df, df = analyze_lot(
+                        self.df_combined,
+                        smoothing=self.smoothing,
+                        baseline=self.baseline,
+                        resample_pitch=self.resample_pitch,
+                        golden=self.golden,
+                        log=lambda level, message: print(message),
+                        backend=self.backend
+                    )
                 else:
-                    result1 = pd.DataFrame()
-                    print("ℹ️ Position 1-3 데이터가 없습니다.")
-                
-                # position이 "4"인 데이터 분석 (result2)
-                df_4 = df[df['position'] == "4"].copy()
+                    # 실행 계획대로 glass 묶음별 전처리 후 행렬만 합쳐 한 번에 분석 (spill이면 처리된 데이터는 디스크)
+                    print(f"📋 실행 계획: {self.plan.mode}, {len(self.plan.files)}개 파일 / {len(self.plan.batches)}개 묶음")
+                    self.result_df, df, self.plan_stats = execute_plan(
+                        self.plan,
+                        smoothing=self.smoothing,
+                        baseline=self.baseline,
+                        resample_pitch=self.resample_pitch,
+                        golden=self.golden,
+                        log=lambda level, message: print(message),
+                        profile_stats=True
+                    )
+                if len(df) == 0:
+                    return
                 
-                if len(df_4) > 0:
-                    print("📊 Position 4 데이터 분석 중...")
-                    
-                    try:
-                        df_4 = df_4.rename(columns={'Glass ID': 'glass', 'Avg Offset': 'y'})
-                        
-                        result2_list = []
-                        
-                        for (glass, cell, side), group in df_4.groupby(['glass', 'cell', 'side']):
-                            if len(group) > 0 and not group['y'].isna().all():
-                                max_y = group['y'].max()
-                                min_y = group['y'].min()
-                                max_idx = group['y'].idxmax()
-                                max_x_position = group.loc[max_idx, 'x'] if max_idx in group.index else 0
-                                
-                                result2_list.append({
-                                    'glass': glass,
-                                    'cell': cell,
-                                    'side': side,
-                                    'hump_dy': round(max_y - min_y, 1),
-                                    'hump_dx': round(max_x_position, 0)
-                                })
-                        
-                        if result2_list:
-                            result2 = pd.DataFrame(result2_list)
-                            result2['split'] = result2['cell'].apply(self.assign_split_category)
-                            print(f"✅ Position 4 분석 완료: {len(result2)}개 결과")
-                        else:
-                            result2 = pd.DataFrame()
-                            print("⚠️ Position 4 분석 결과가 없습니다.")
-                            
-                    except Exception as e:
-                        print(f"❌ Position 4 분석 중 오류: {str(e)}")
-                        result2 = pd.DataFrame()
-                else:
-                    result2 = pd.DataFrame()
-                    print("ℹ️ Position 4 데이터가 없습니다.")
+                self.processed_df = df
                 
-                # 결과 합치기
-                if len(result1) > 0 and len(result2) > 0:
-                    self.result_df = pd.concat([result1, result2], ignore_index=True)
-                    print("✅ 모든 분석 결과 합치기 완료")
-                elif len(result1) > 0:
-                    self.result_df = result1
-                    print("ℹ️ Position 1-3 결과만 사용")
-                elif len(result2) > 0:
-                    self.result_df = result2
-                    print("ℹ️ Position 4 결과만 사용")
-                else:
-                    self.result_df = pd.DataFrame()
-                    print("❌ 분석 결과가 없습니다.")
+                # 로드 시 분위수 스케치를 만들지 못했으면 처리된 데이터에서 생성
+                if self.quantile_sketch is None:
+                    self.quantile_sketch = ProfileQuantileSketch()
+                    for part in ([df] if isinstance(df, pd.DataFrame) else df):
+                        self.quantile_sketch.add_frame(part)
                 
+                # 형상 클러스터 학습 (lot마다 이어서 갱신) 및 라벨 부여
                 if len(self.result_df) > 0:
-                    self.result_df = self.result_df.sort_values(['glass', 'cell', 'side']).reset_index(drop=True)
-                    print(f"🎉 최종 분석 완료! 총 {len(self.result_df)}개의 결과가 생성되었습니다.")
-                
-                self.processed_df = df
+                    try:
+                        self.shape_clusters.partial_fit_frame(df)
+                        self.result_df = assign_shape_clusters(self.result_df, df, self.shape_clusters)
+                        print(f"🧩 형상 클러스터 {self.shape_clusters.n_clusters}개 (누적 {self.shape_clusters.n_seen:,}개 프로파일)")
+                    except Exception as e:
+                        print(f"⚠️ 형상 클러스터링 실패: {str(e)}")
                 
                 # 결과 표시
                 with self.output_data:
@@ -428,37 +445,31 @@ class CSVAnalyzer:
                     '#bcbd22', '#17becf'
                 ]
                 
-                # 1. 전체 데이터 시각화
-                fig1 = px.scatter(
-                    self.processed_df, 
-                    x='x', 
+                # 1. 전체 데이터 시각화 (실행 계획이 일부 glass만 그리기로 했으면 해당 glass만)
+                self.facet_pagers['fig1'] = FacetPager(
+                    self._plot_frame(),
+                    x='x',
                     y='Avg Offset',
+                    row='Glass ID',
+                    col='cell',
                     color='side',
-                    facet_col='cell',
-                    facet_row='Glass ID',
+                    page_size=self.page_size,
                     title="전체 데이터 시각화",
                     labels={'x': 'X [um]', 'Avg Offset': 'Avg Offset [um]'},
-                    color_discrete_sequence=color_palette
+                    color_palette=color_palette
                 )
-                fig1.update_layout(
-                    height=600,
-                    template='plotly',
-                    font=dict(size=12),
-                    showlegend=True,
-                    legend=dict(
-                        orientation="h",
-                        yanchor="bottom",
-                        y=1.02,
-                        xanchor="right",
-                        x=1
-                    )
-                )
-                fig1.update_traces(marker=dict(size=4, opacity=0.7))
-                fig1.show()
+                fig1 = self.facet_pagers['fig1'].figure(0)
+                compact_figure(fig1).show()
                 
                 # 2. 위치별 평균 프로파일
-                df_avg = self.processed_df.groupby(['side', 'x'])['Avg Offset'].mean().reset_index()
-                df_avg['y_normalized'] = df_avg.groupby('side')['Avg Offset'].transform(lambda x: x - x.min())
+                # 로드 시 누적한 집계가 있으면 그대로 사용, 없으면 처리된 데이터에서 한 번에 집계
+                # (묶음별 분석은 묶음마다 만든 집계를 합친 값)
+                profile_stats = self.profile_stats
+                if self.plan_stats is not None:
+                    profile_stats = self.plan_stats
+                elif profile_stats is None or self.resample_pitch:
+                    profile_stats = build_profile_stats(self.processed_df, resample_pitch=self.resample_pitch)
+                df_avg = profile_stats.to_frame()
                 
                 fig2 = px.line(
                     df_avg,
@@ -482,45 +493,235 @@ class CSVAnalyzer:
                     )
                 )
                 fig2.update_traces(line=dict(width=3), marker=dict(size=6))
+                
+                # ±σ 밴드 (각 side 라인 색상과 동일)
+                for trace in list(fig2.data):
+                    band = df_avg[df_avg['side'] == trace.name]
+                    fig2.add_trace(go.Scatter(
+                        x=np.concatenate([band['x'], band['x'][::-1]]),
+                        y=np.concatenate([band['y_normalized'] + band['std'], (band['y_normalized'] - band['std'])[::-1]]),
+                        fill='toself',
+                        fillcolor=trace.line.color,
+                        opacity=0.2,
+                        line=dict(width=0),
+                        hoverinfo='skip',
+                        showlegend=False,
+                        name=f"{trace.name} ±σ"
+                    ))
                 fig2.show()
                 
                 # 3. Hump Height vs Position
                 if len(self.result_df) > 0:
                     result_filtered = self.result_df[self.result_df['side'] != 'Down']
                     
-                    fig3 = px.bar(
+                    self.facet_pagers['fig3'] = FacetPager(
                         result_filtered,
                         x='side',
                         y='hump_dy',
+                        row='glass',
+                        col='cell',
                         color='side',
-                        facet_col='cell',
-                        facet_row='glass',
+                        kind='bar',
+                        page_size=self.page_size,
                         title="Hump Height vs Position of Panel",
                         labels={'hump_dy': 'Hump DY [um]', 'side': 'Side'},
-                        color_discrete_sequence=color_palette
+                        color_palette=color_palette
                     )
-                    fig3.update_layout(
-                        height=600,
-                        template='plotly',
-                        font=dict(size=12),
-                        showlegend=True,
-                        legend=dict(
-                            orientation="h",
-                            yanchor="bottom",
-                            y=1.02,
-                            xanchor="right",
-                            x=1
-                        )
-                    )
-                    fig3.update_traces(marker=dict(opacity=0.8, line=dict(width=1, color='white')))
-                    fig3.show()
+                    fig3 = self.facet_pagers['fig3'].figure(0)
+                    compact_figure(fig3).show()
+                
+                # 4. 패널 맵 - side별 (행 × 열) heatmap, glass 전체 중앙값
+                fig4 = panel_heatmap(self.result_df, value='hump_dy')
+                fig4.show()
                 
-                self.plots = {'fig1': fig1, 'fig2': fig2, 'fig3': fig3}
+                self.plots = {'fig1': fig1, 'fig2': fig2, 'fig3': fig3, 'fig4': fig4}
+                
+                pages = max(pager.n_pages for pager in self.facet_pagers.values())
+                if pages > 1:
+                    print(f"🗂️ glass × cell 그래프는 {pages}페이지 중 1페이지만 표시했습니다. "
+                          f"다른 페이지: analyzer.show_facet_page('fig1', page=2)")
                 print("✅ 그래프 생성 완료!")
                 
             except Exception as e:
                 print(f"❌ 그래프 생성 중 오류: {str(e)}")
     
+    def _plot_frame(self):
+        """그래프용 처리된 데이터 - 예산을 넘으면 실행 계획의 plot_glasses만 (디스크에 둔 데이터는 해당 glass만 다시 읽음)"""
+        glasses = self.plan.plot_glasses if self.plan is not None and self.plan.plots == 'limited' else None
+        if glasses is not None:
+            print(f"🧮 메모리 예산에 맞춰 {len(glasses)}개 glass만 전체 데이터 그래프로 그립니다.")
+        if isinstance(self.processed_df, SpilledFrame):
+            return self.processed_df.read(glass=glasses)
+        if glasses is not None:
+            return self.processed_df[self.processed_df['Glass ID'].astype(str).isin(glasses)]
+        return self.processed_df
+    
+    def show_facet_page(self, name='fig1', page=1):
+        """glass × cell facet 그래프의 page번째 페이지 표시 ('fig1': 전체 데이터, 'fig3': Hump Height)"""
+        pager = self.facet_pagers.get(name)
+        if pager is None:
+            print("⚠️ 먼저 분석을 완료해주세요.")
+            return None
+        
+        print(f"🗂️ {page}/{pager.n_pages} 페이지 - Glass: {', '.join(map(str, pager.page_rows(page - 1)))}")
+        fig = pager.figure(page - 1)
+        compact_figure(fig).show()
+        return fig
+    
+    def show_panel_map(self, value='hump_dy', glass=None, agg='median'):
+        """패널 맵 표시 (glass 지정 시 해당 glass만, 아니면 glass 전체를 agg로 집계)
+        
+        사용 예: analyzer.show_panel_map('golden_rms', glass='G001')
+        """
+        if self.result_df is None or len(self.result_df) == 0:
+            print("⚠️ 먼저 분석을 완료해주세요.")
+            return None
+        
+        fig = panel_heatmap(self.result_df, value=value, glass=glass, agg=agg)
+        fig.show()
+        return fig
+    
+    def show_quantile_bands(self, *sketch_paths):
+        """현재 lot과 이전 lot 분위수 스케치(.npz)를 합쳐 P5/P50/P95 밴드 표시
+        
+        사용 예: analyzer.show_quantile_bands('profile_sketch_20250601.npz', 'profile_sketch_20250602.npz')
+        """
+        if self.quantile_sketch is None and not sketch_paths:
+            print("⚠️ 먼저 데이터를 로드하거나 스케치 파일을 지정해주세요.")
+            return None
+        
+        sketch = None
+        sources = ([self.quantile_sketch] if self.quantile_sketch is not None else [])
+        sources += [ProfileQuantileSketch.load(path) for path in sketch_paths]
+        for source in sources:
+            if sketch is None:
+                sketch = ProfileQuantileSketch(pitch=source.pitch, resolution=source.resolution)
+            sketch.merge(source)
+        
+        color_palette = [
+            '#1f77b4', '#ff7f0e', '#2ca02c', '#d62728',
+            '#9467bd', '#8c564b', '#e377c2', '#7f7f7f',
+            '#bcbd22', '#17becf'
+        ]
+        df_q = sketch.quantiles((0.05, 0.5, 0.95))
+        
+        fig = go.Figure()
+        for i, (side, band) in enumerate(df_q.groupby('side')):
+            color = color_palette[i % len(color_palette)]
+            # Edge Profile 그래프와 같은 기준 (side별 P50 최소값 = 0)
+            base = band['p50'].min()
+            fig.add_trace(go.Scatter(
+                x=np.concatenate([band['x'], band['x'][::-1]]),
+                y=np.concatenate([band['p95'] - base, (band['p5'] - base)[::-1]]),
+                fill='toself',
+                fillcolor=color,
+                opacity=0.2,
+                line=dict(width=0),
+                hoverinfo='skip',
+                showlegend=False,
+                name=f"{side} P5~P95"
+            ))
+            fig.add_trace(go.Scatter(
+                x=band['x'],
+                y=band['p50'] - base,
+                mode='lines',
+                line=dict(color=color, width=3),
+                name=f"{side} P50"
+            ))
+        
+        fig.update_layout(
+            title="위치별 SIP 높이 분위수 밴드 (P5 / P50 / P95)",
+            xaxis_title='x[um]',
+            yaxis_title='SIP_height [um]',
+            template='plotly',
+            font=dict(size=12)
+        )
+        print(f"🔢 누적 샘플 수: {len(sketch):,}개 (스케치 {len(sources)}개 병합)")
+        fig.show()
+        return fig
+    
+    def show_cluster_centroids(self):
+        """형상 클러스터 중심 프로파일 그래프 표시"""
+        if self.shape_clusters.centers is None:
+            print("⚠️ 먼저 분석을 완료해주세요.")
+            return None
+        
+        color_palette = px.colors.qualitative.Plotly
+        fig = go.Figure()
+        for cluster, center in self.shape_clusters.centroids_frame().groupby('cluster'):
+            fig.add_trace(go.Scatter(
+                x=center['position'],
+                y=center['y'],
+                mode='lines',
+                line=dict(color=color_palette[cluster % len(color_palette)], width=3),
+                name=f"Cluster {cluster} (n={center['count'].iloc[0]:,})"
+            ))
+        fig.update_layout(
+            title="형상 클러스터 중심 프로파일 (정규화 형상)",
+            xaxis_title='프로파일 상대 위치',
+            yaxis_title='정규화 높이',
+            template='plotly',
+            font=dict(size=12)
+        )
+        fig.show()
+        return fig
+    
+    def update_profile_index(self, index_dir='profile_index'):
+        """현재 lot 프로파일을 디스크 인덱스에 추가 (같은 glass/cell/side는 교체)"""
+        if self.processed_df is None:
+            print("⚠️ 먼저 분석을 완료해주세요.")
+            return None
+        
+        # 기존 벡터는 그대로 두고 현재 lot 벡터만 파일 끝에 덧붙임
+        index = ProfileIndex.append_frame(index_dir, self.processed_df)
+        print(f"🔍 프로파일 인덱스 저장 완료: {index_dir} ({len(index):,}개 프로파일)")
+        return index
+    
+    def find_similar(self, glass, cell, side, k=10, index_dir=None):
+        """(glass, cell, side)와 형상이 비슷한 프로파일 k개 검색 및 비교 그래프 표시
+        
+        index_dir를 지정하면 과거 lot 인덱스에서, 없으면 현재 lot 안에서 검색
+        사용 예: analyzer.find_similar('G001', 'B03', 'Right', index_dir='profile_index')
+        """
+        if index_dir is not None:
+            index = ProfileIndex.load(index_dir)
+        elif self.processed_df is not None:
+            index = ProfileIndex.from_frame(self.processed_df)
+        else:
+            print("⚠️ 먼저 분석을 완료하거나 인덱스 디렉터리를 지정해주세요.")
+            return None
+        
+        neighbors = index.query(glass, cell, side, k=k)
+        positions = np.linspace(0.0, 1.0, index.n_points)
+        
+        fig = go.Figure()
+        for _, row in neighbors.iterrows():
+            fig.add_trace(go.Scatter(
+                x=positions,
+                y=index.reconstruct(index.vectors[row['index']]),
+                mode='lines',
+                line=dict(width=1.5),
+                opacity=0.6,
+                name=f"{row['glass']} / {row['cell']} ({row['similarity']:.3f})"
+            ))
+        fig.add_trace(go.Scatter(
+            x=positions,
+            y=index.reconstruct(index.vector_of(glass, cell, side)),
+            mode='lines',
+            line=dict(color='black', width=3),
+            name=f"{glass} / {cell} (검색 대상)"
+        ))
+        fig.update_layout(
+            title=f"{side} 유사 프로파일 (정규화 형상)",
+            xaxis_title='프로파일 상대 위치',
+            yaxis_title='정규화 높이',
+            template='plotly',
+            font=dict(size=12)
+        )
+        display(neighbors.drop(columns='index'))
+        fig.show()
+        return neighbors
+    
     def save_results(self, button):
         """결과 저장"""
         with self.output_status:
@@ -535,6 +736,44 @@ class CSVAnalyzer:
                 csv_filename = f"analysis_result_{timestamp}.csv"
                 self.result_df.to_csv(csv_filename, index=False, encoding='utf-8-sig')
                 print(f"💾 CSV 파일 저장 완료: {csv_filename}")
+
+                # Excel 저장 (전체 결과 + side별 시트, 행 묶음 단위 스트리밍 기록)
+                xlsx_filename = f"analysis_result_{timestamp}.xlsx"
+                write_xlsx(xlsx_filename, result_sheets(self.result_df, split_by='side'))
+                print(f"📗 Excel 파일 저장 완료: {xlsx_filename}")
+
+                # Parquet 저장 (pyarrow가 있을 때만, 처리된 프로파일 포함 - 후속 분석 도구용)
+                if pq is not None:
+                    parquet_filename = f"analysis_result_{timestamp}.parquet"
+                    write_parquet(parquet_filename, self.result_df)
+                    print(f"🧱 Parquet 파일 저장 완료: {parquet_filename}")
+                    if self.processed_df is not None:
+                        profiles_filename = f"processed_profiles_{timestamp}.parquet"
+                        write_parquet(profiles_filename, self.processed_df)
+                        print(f"🧱 프로파일 Parquet 저장 완료: {profiles_filename}")
+
+                # lot별 분위수 스케치 저장 (장기 분위수 밴드용)
+                if self.quantile_sketch is not None:
+                    sketch_filename = f"profile_sketch_{timestamp}.npz"
+                    self.quantile_sketch.save(sketch_filename)
+                    print(f"📈 분위수 스케치 저장 완료: {sketch_filename}")
+                
+                # 원본 lot 압축 아카이브 저장 (장기 보관, 다시 불러올 때 CSV 대신 사용)
+                if self.df_combined is not None and 'file' in self.df_combined.columns:
+                    archive_filename = f"raw_lot_{timestamp}.hparc"
+                    write_archive(archive_filename, self.df_combined.groupby('file', sort=False, dropna=False))
+                    print(f"🗄️ 원본 아카이브 저장 완료: {archive_filename}")
+                elif self.plan is not None:
+                    # lot을 합치지 않은 경우(chunked / spill)는 원본 파일을 하나씩 읽어 바로 기록
+                    archive_filename = f"raw_lot_{timestamp}.hparc"
+                    write_archive(archive_filename, manifest_sources(self.plan.files))
+                    print(f"🗄️ 원본 아카이브 저장 완료: {archive_filename}")
+                
+                # 형상 클러스터 모델 저장 (다음 lot: CSVAnalyzer(shape_clusters='shape_clusters_....npz'))
+                if self.shape_clusters.centers is not None:
+                    model_filename = f"shape_clusters_{timestamp}.npz"
+                    self.shape_clusters.save(model_filename)
+                    print(f"🧩 클러스터 모델 저장 완료: {model_filename}")
                 
                 # 색상이 보존된 그래프 HTML 저장
                 if self.plots:
@@ -595,7 +834,8 @@ class CSVAnalyzer:
                     plot_titles = {
                         'fig1': '📈 전체 데이터 시각화',
                         'fig2': '📉 위치별 SIP 잉크젯 Edge Profile', 
-                        'fig3': '📊 Hump Height vs Position 분석'
+                        'fig3': '📊 Hump Height vs Position 분석',
+                        'fig4': '🗺️ 패널 맵 (hump_dy, glass 중앙값)'
                     }
                     
                     for i, (name, plot) in enumerate(self.plots.items(), 1):
@@ -0,0 +1,284 @@
+"""
+Streamlit 앱 동시 사용자 부하 테스트
+App.py를 화면 없이(streamlit.testing의 AppTest) 세션 N개로 동시에 실행해 업로드 → 분석 → 다운로드 단계별
+지연 시간(p50 / p95 / p99)과 프로세스 CPU / RSS를 기록 - 서버 한 대가 버티는 동시 사용자 수와 성능 회귀 측정용
+세션은 Streamlit 서버처럼 한 프로세스 안의 스레드로 실행되므로 세션끼리 공유하는 자원(SessionStore 등)도 함께 측정됨
+
+python app_load_test.py --sessions 8 --glasses 10 --iterations 2 --out load.csv
+"""
+
+import io
+import os
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CELLS = ('A01', 'B02', 'A03', 'C08', 'B03', 'D10')
+STEPS = ('open', 'upload', 'analyze', 'download')
+APP_PATH = Path(__file__).with_name('App.py')
+
+
+def synthetic_lot(glasses=3, cells=DEFAULT_CELLS, points=600, seed=0):
+    """가상 lot - (파일명, CSV bytes) 목록 (glass × cell × position 1~4, 계단 + hump 프로파일)"""
+    rng = np.random.default_rng(seed)
+    no = np.arange(1, points + 1)
+    files = []
+    for g in range(glasses):
+        glass = f"G{g:03d}"
+        for cell in cells:
+            for position in '1234':
+                hump = 3.0 * np.exp(-((no - 120 - rng.integers(-5, 5)) / 15.0) ** 2)
+                base = 20 / (1 + np.exp(-(no - 80) / 10.0))
+                df = pd.DataFrame({
+                    'no': no,
+                    'CELL ID': f"XYZ{glass}{cell}",
+                    'Avg Offset': (base + hump + rng.normal(0, 0.05, points)).round(4),
+                    'Glass ID': glass,
+                })
+                files.append((f"{glass}_{cell}_{position}_1234567.csv", df.to_csv(index=False).encode('utf-8')))
+    return files
+
+
+class SyntheticUpload(io.BytesIO):
+    """st.file_uploader가 돌려주는 UploadedFile 대신 쓰는 메모리 파일"""
+
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+        self.type = 'text/csv'
+
+
+def _rss():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def _cpu_seconds():
+    times = os.times()
+    return times.user + times.system
+
+
+class ResourceSampler:
+    """프로세스 RSS / CPU 사용률을 일정 간격으로 기록하는 백그라운드 스레드 (/proc 사용, Linux)"""
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        last_time, last_cpu = time.perf_counter(), _cpu_seconds()
+        while not self._stop.wait(self.interval):
+            now, cpu = time.perf_counter(), _cpu_seconds()
+            self.samples.append((now, _rss(), (cpu - last_cpu) / max(now - last_time, 1e-9) * 100))
+            last_time, last_cpu = now, cpu
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def window(self, start, end):
+        """[start, end] 구간의 (최대 RSS, 평균 CPU %) - 구간이 샘플 간격보다 짧으면 가장 가까운 샘플"""
+        inside = [sample for sample in self.samples if start <= sample[0] <= end]
+        if not inside and self.samples:
+            inside = [min(self.samples, key=lambda sample: abs(sample[0] - end))]
+        if not inside:
+            return float('nan'), float('nan')
+        return max(sample[1] for sample in inside), float(np.mean([sample[2] for sample in inside]))
+
+
+def _click(at, label):
+    [button for button in at.button if label in button.label][0].click().run()
+
+
+def _check(at, step):
+    if len(at.exception):
+        raise RuntimeError(at.exception[0].message)
+    if step == 'analyze' and not at.session_state['analysis_complete']:
+        errors = [element.value for element in at.error]
+        raise RuntimeError(errors[0] if errors else "분석이 완료되지 않았습니다.")
+    if step == 'download' and not [button for button in at.get('download_button') if 'ZIP' in button.label]:
+        raise RuntimeError("ZIP 다운로드 버튼이 없습니다.")
+
+
+def run_session(index, iterations=1, timeout=300, memory_budget=None, app=APP_PATH, records=None):
+    """세션 하나: 앱 열기 → (업로드 → 분석 → 다운로드) × iterations, 단계별 기록을 records에 추가"""
+    from streamlit.testing.v1 import AppTest
+
+    records = [] if records is None else records
+    at = AppTest.from_file(str(app), default_timeout=timeout)
+    at.session_state['load_test_session'] = index
+
+    def step(name, iteration, action):
+        start = time.perf_counter()
+        error = None
+        try:
+            action()
+            _check(at, name)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        records.append({'session': index, 'iteration': iteration, 'step': name,
+                        'start': start, 'end': time.perf_counter(), 'error': error})
+        return error is None
+
+    def upload():
+        at.sidebar.selectbox[0].set_value("🔄 파일 업로드").run()
+        if memory_budget is not None:
+            at.number_input(key='memory_budget').set_value(memory_budget).run()
+        _click(at, '데이터 로드')
+
+    def analyze():
+        at.sidebar.selectbox[0].set_value("📈 데이터 분석").run()
+        _click(at, '분석 시작')
+
+    def download():
+        at.sidebar.selectbox[0].set_value("💾 결과 다운로드").run()
+        _click(at, 'ZIP 파일로 모든 결과 다운로드')
+
+    if not step('open', 0, at.run):
+        return records
+    for iteration in range(iterations):
+        for name, action in (('upload', upload), ('analyze', analyze), ('download', download)):
+            if not step(name, iteration, action):
+                break
+    return records
+
+
+def summarize(records, sampler, started):
+    """단계별 요약 (횟수, 실패, 지연 p50 / p95 / p99 / 최대, 단계 중 최대 RSS / 평균 CPU %)"""
+    df = pd.DataFrame(records)
+    df['latency_s'] = df['end'] - df['start']
+    df[['rss_peak_mb', 'cpu_pct']] = [
+        (rss / 2 ** 20, cpu) for rss, cpu in (sampler.window(start, end) for start, end in zip(df['start'], df['end']))
+    ]
+    df['start'] -= started
+    df['end'] -= started
+
+    rows = []
+    for step in [step for step in STEPS if step in set(df['step'])]:
+        group = df[df['step'] == step]
+        ok = group.loc[group['error'].isna(), 'latency_s']
+        rows.append({
+            'step': step,
+            'count': len(group),
+            'failed': int(group['error'].notna().sum()),
+            'p50_s': round(ok.quantile(0.5), 3) if len(ok) else float('nan'),
+            'p95_s': round(ok.quantile(0.95), 3) if len(ok) else float('nan'),
+            'p99_s': round(ok.quantile(0.99), 3) if len(ok) else float('nan'),
+            'max_s': round(ok.max(), 3) if len(ok) else float('nan'),
+            'rss_peak_mb': round(group['rss_peak_mb'].max(), 1),
+            'cpu_pct': round(group['cpu_pct'].mean(), 1),
+        })
+    return df, pd.DataFrame(rows)
+
+
+def load_test(sessions=4, iterations=1, ramp=0.0, glasses=3, points=600, timeout=300, memory_budget=None,
+              app=APP_PATH, interval=0.2):
+    """세션 sessions개를 ramp초 간격으로 시작해 동시에 실행
+
+    반환값: (단계별 기록 DataFrame, 단계별 요약 DataFrame, 전체 요약 dict)
+    세션마다 seed가 다른 가상 lot을 씀 (glass 수 × 6 cell × 4 position 파일, 파일당 points행)
+    """
+    import streamlit as st
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    lots = {index: synthetic_lot(glasses=glasses, points=points, seed=index) for index in range(sessions)}
+
+    # AppTest는 파일 업로드를 지원하지 않으므로 업로더를 세션별 가상 lot으로 바꿔 치움
+    def file_uploader(label, *args, **kwargs):
+        if 'CSV 파일을 선택' in label:
+            lot = lots[st.session_state['load_test_session']]
+            return [SyntheticUpload(name, data) for name, data in lot]
+        return [] if kwargs.get('accept_multiple_files') else None
+
+    # Python 3.11의 ast.parse는 여러 스레드에서 동시에 부르면 깨질 수 있음 - AppTest는 세션마다 스크립트를
+    # 따로 컴파일하므로 (실제 서버는 한 번만 컴파일해 공유) 컴파일만 한 번에 하나씩
+    compile_lock = threading.Lock()
+    get_bytecode = ScriptCache.get_bytecode
+
+    def locked_get_bytecode(self, script_path):
+        with compile_lock:
+            return get_bytecode(self, script_path)
+
+    records = []
+    sampler = ResourceSampler(interval)
+    rss_start = _rss()
+    started = time.perf_counter()
+    with mock.patch('streamlit.file_uploader', side_effect=file_uploader), \
+            mock.patch.object(ScriptCache, 'get_bytecode', locked_get_bytecode):
+        sampler.start()
+        threads = []
+        for index in range(sessions):
+            thread = threading.Thread(target=run_session, args=(index, iterations, timeout, memory_budget, app, records))
+            thread.start()
+            threads.append(thread)
+            if ramp:
+                time.sleep(ramp)
+        for thread in threads:
+            thread.join()
+        sampler.stop()
+    wall = time.perf_counter() - started
+
+    df, summary = summarize(records, sampler, started)
+    analyses = df[(df['step'] == 'analyze') & df['error'].isna()]
+    overall = {
+        'sessions': sessions,
+        'iterations': iterations,
+        'files_per_lot': glasses * len(DEFAULT_CELLS) * 4,
+        'rows_per_lot': glasses * len(DEFAULT_CELLS) * 4 * points,
+        'wall_s': round(wall, 2),
+        'analyses_per_min': round(len(analyses) / wall * 60, 1) if wall > 0 else float('nan'),
+        'failed_steps': int(df['error'].notna().sum()),
+        'rss_start_mb': round(rss_start / 2 ** 20, 1),
+        'rss_peak_mb': round(max((sample[1] for sample in sampler.samples), default=rss_start) / 2 ** 20, 1),
+        'cpu_mean_pct': round(float(np.mean([sample[2] for sample in sampler.samples])), 1) if sampler.samples else float('nan'),
+        'errors': df.loc[df['error'].notna(), 'error'].unique().tolist()[:3],
+    }
+    return df, summary, overall
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Streamlit 앱 동시 세션 부하 테스트 (업로드 → 분석 → 다운로드)")
+    parser.add_argument('--sessions', type=int, default=4, help="동시 세션 수")
+    parser.add_argument('--iterations', type=int, default=1, help="세션당 업로드 → 분석 → 다운로드 반복 횟수")
+    parser.add_argument('--ramp', type=float, default=0.0, help="세션 시작 간격 [초]")
+    parser.add_argument('--glasses', type=int, default=3, help="lot당 glass 수 (glass당 24개 파일)")
+    parser.add_argument('--points', type=int, default=600, help="파일당 행 수")
+    parser.add_argument('--timeout', type=float, default=300, help="단계 하나의 제한 시간 [초] (넘으면 실패로 기록)")
+    parser.add_argument('--memory-budget', type=int, help="업로드 화면의 메모리 예산 [MB] (없으면 앱 기본값)")
+    parser.add_argument('--out', help="단계별 기록을 저장할 CSV 경로")
+    args = parser.parse_args()
+
+    import streamlit
+    from streamlit.logger import set_log_level
+
+    # 화면 없이 실행할 때 나오는 ScriptRunContext / 사용 중단 경고 숨김 (설정 파일을 읽을 때 다시 적용되므로 둘 다)
+    streamlit.config.set_option('logger.level', 'error')
+    set_log_level('ERROR')
+
+    records, summary, overall = load_test(
+        sessions=args.sessions, iterations=args.iterations, ramp=args.ramp, glasses=args.glasses,
+        points=args.points, timeout=args.timeout, memory_budget=args.memory_budget
+    )
+    print(summary.to_string(index=False))
+    print(f"📊 세션 {overall['sessions']}개 × {overall['iterations']}회, lot당 {overall['files_per_lot']}개 파일 / "
+          f"{overall['rows_per_lot']:,}행 - {overall['wall_s']}초, 분석 {overall['analyses_per_min']}회/분, "
+          f"RSS {overall['rss_start_mb']} → 최대 {overall['rss_peak_mb']} MB, 평균 CPU {overall['cpu_mean_pct']}%, "
+          f"실패 {overall['failed_steps']}단계")
+    for error in overall['errors']:
+        print(f"❌ {error}")
+    if args.out:
+        records.to_csv(args.out, index=False)
+        print(f"💾 단계별 기록 저장: {args.out}")
@@ -0,0 +1,403 @@
+"""
+메모리 예산 기반 실행 계획 모듈
+lot 구성 사전 조회(manifest)의 예상 행 수 / 프로파일 수로 단계별 최대 메모리를 추정하고
+예산에 맞춰 읽기 / 분석 / 그래프 단계의 실행 방식을 선택
+
+- memory: lot 전체를 DataFrame 하나로 읽어 analyze_lot 한 번 (기존 방식)
+- chunked: glass 묶음별로 읽어 전처리 + 프로파일 행렬만 남기고 원본은 버림,
+           묶음별 행렬을 합쳐 분석 단계는 한 번만 실행 (golden 중앙값 / 이상치 z가 lot 전체 기준이라 결과 동일)
+- spill: chunked + 처리된 long 형식 데이터를 묶음별 파일로 디스크에 내려 두고 필요한 glass만 다시 읽음
+그래프는 예산을 넘으면 일부 glass만 그림 (평균 프로파일 / hump / 패널 맵은 전체 lot 기준)
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import weakref
+
+import pandas as pd
+
+from hump_kernels import PIXEL_PITCH
+from hump_pipeline import analyze_lot, analyze_profiles, merge_profiles, prepare_profiles
+from lot_manifest import manifest_sources
+from profile_stats import build_profile_stats
+from result_export import pq, write_parquet
+
+MODES = ('memory', 'chunked', 'spill')
+
+# 원본 1행이 DataFrame에서 차지하는 크기 [byte / 컬럼] (pandas, 문자열 컬럼 포함 평균)
+COLUMN_BYTES = 16
+# 단계별 최대 메모리 / 원본 DataFrame 크기 (432k행 lot에서 RSS로 측정한 값에 여유를 둔 배수)
+INGEST_FACTOR = 2.0
+ANALYSIS_FACTOR = {'pandas': 3.6, 'polars': 6.5}
+PROCESSED_FACTOR = 1.6
+PLOT_FACTOR = 0.8
+# 분석 단계 최대 메모리 / 프로파일 행렬 크기 (평활화 / 기준점 차감 / hump / golden 편차 중간 배열, 측정값 7.5배)
+MATRIX_COPIES = 8
+
+_SIZE = re.compile(r'^\s*([\d.]+)\s*([kmgt]?)i?b?\s*$', re.IGNORECASE)
+
+
+def parse_size(text):
+    """'2GB', '512M', '1.5g', 1073741824 -> byte 수"""
+    if isinstance(text, (int, float)):
+        return int(text)
+    match = _SIZE.match(str(text))
+    if match is None:
+        raise ValueError(f"메모리 크기 형식이 잘못되었습니다: {text} (예: 2GB, 512MB)")
+    value, unit = match.groups()
+    return int(float(value) * 1024 ** ' kmgt'.index(unit.lower() or ' '))
+
+
+def format_size(size):
+    """byte 수 -> 읽기 쉬운 문자열 (예: 1.2 GB)"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def available_memory():
+    """지금 쓸 수 있는 메모리 [byte] (/proc/meminfo + 컨테이너 cgroup 제한, 알 수 없으면 None)"""
+    available = None
+    try:
+        with open('/proc/meminfo') as handle:
+            for line in handle:
+                if line.startswith('MemAvailable:'):
+                    available = int(line.split()[1]) * 1024
+                    break
+    except OSError:
+        try:
+            available = os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+        except (ValueError, OSError, AttributeError):
+            pass
+    try:
+        # 컨테이너(cgroup v2) 메모리 제한이 있으면 남은 한도가 실제 상한
+        with open('/sys/fs/cgroup/memory.max') as handle:
+            limit = handle.read().strip()
+        if limit != 'max':
+            with open('/sys/fs/cgroup/memory.current') as handle:
+                remaining = int(limit) - int(handle.read())
+            available = remaining if available is None else min(available, remaining)
+    except (OSError, ValueError):
+        pass
+    return available
+
+
+def default_budget():
+    """환경 변수 HUMP_MEMORY_BUDGET (예: 2GB), 없으면 사용 가능 메모리의 절반 (알 수 없으면 2GB)"""
+    configured = os.environ.get('HUMP_MEMORY_BUDGET')
+    if configured:
+        return parse_size(configured)
+    available = available_memory()
+    return available // 2 if available else 2 * 1024 ** 3
+
+
+class SpilledFrame:
+    """디스크에 묶음별 파일로 내려 둔 처리된 long 형식 데이터 (processed_df 대신 사용)
+
+    pyarrow가 있으면 Parquet(필요한 컬럼만 읽기), 없으면 pickle로 저장
+    for part in spilled: 묶음별 DataFrame / spilled.read(glass=[...]): 해당 glass 행만 합쳐서 반환
+    객체가 사라지면 임시 디렉터리도 삭제
+    """
+
+    def __init__(self, directory=None):
+        self.directory = tempfile.mkdtemp(prefix='hump_spill_', dir=directory)
+        self.parts = []
+        self.rows = 0
+        self.columns = []
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.directory, ignore_errors=True)
+
+    def __len__(self):
+        return self.rows
+
+    def __iter__(self):
+        for part in self.parts:
+            yield self._read(part)
+
+    def append(self, df):
+        """묶음 하나를 파일로 저장"""
+        path = os.path.join(self.directory, f"part_{len(self.parts):05d}")
+        if pq is not None:
+            path += '.parquet'
+            write_parquet(path, df.reset_index(drop=True))
+        else:
+            path += '.pkl'
+            df.reset_index(drop=True).to_pickle(path)
+        glasses = set(df['Glass ID'].astype(str)) if 'Glass ID' in df.columns else set()
+        self.parts.append({'path': path, 'rows': len(df), 'glasses': glasses})
+        self.rows += len(df)
+        self.columns = self.columns or list(df.columns)
+        return self
+
+    def _read(self, part, columns=None):
+        if part['path'].endswith('.parquet'):
+            return pd.read_parquet(part['path'], columns=columns)
+        df = pd.read_pickle(part['path'])
+        return df if columns is None else df[columns]
+
+    def read(self, glass=None, columns=None):
+        """glass(값 또는 목록)가 들어 있는 묶음만 읽어 합침 (지정하지 않으면 전체)"""
+        if glass is None:
+            frames = [self._read(part, columns) for part in self.parts]
+        else:
+            glasses = {str(glass)} if isinstance(glass, str) else {str(value) for value in glass}
+            frames = []
+            for part in self.parts:
+                if part['glasses'] & glasses:
+                    df = self._read(part, columns)
+                    frames.append(df[df['Glass ID'].astype(str).isin(glasses)])
+        if not frames:
+            return pd.DataFrame(columns=columns or self.columns)
+        return pd.concat(frames, ignore_index=True)
+
+    def cleanup(self):
+        self._finalizer()
+
+
+def iter_frames(processed):
+    """processed_df(DataFrame) 또는 SpilledFrame을 묶음별 DataFrame으로"""
+    if processed is None:
+        return iter(())
+    if isinstance(processed, pd.DataFrame):
+        return iter([processed])
+    return iter(processed)
+
+
+class ExecutionPlan:
+    """lot 하나의 단계별 실행 방식과 메모리 추정치
+
+    mode: 'memory' / 'chunked' / 'spill' (읽기 + 분석 단계)
+    plots: 'full' (전체 glass) / 'limited' (plot_glasses만 그림)
+    batches: chunked / spill일 때 glass 단위로 나눈 manifest 행 목록
+    """
+
+    def __init__(self, budget, mode, plots, estimates, batches, plot_glasses, reasons, backend='pandas'):
+        self.budget = budget
+        self.mode = mode
+        self.plots = plots
+        self.estimates = estimates
+        self.batches = batches
+        self.plot_glasses = plot_glasses
+        self.reasons = reasons
+        self.backend = backend
+
+    @property
+    def files(self):
+        """계획에 포함된 manifest 행 전체"""
+        return pd.concat(self.batches) if self.batches else pd.DataFrame()
+
+    def describe(self):
+        """단계별 실행 방식 / 예상 최대 메모리 / 선택 이유 표"""
+        stages = [
+            ('읽기', 'memory' if self.mode == 'memory' else f"{self.mode} ({len(self.batches)}개 묶음)", 'ingest'),
+            ('전처리 / 행렬 변환', self.mode, 'prepare'),
+            ('hump / golden 분석', 'memory', 'analysis'),
+            ('처리된 데이터 보관', 'disk' if self.mode == 'spill' else 'memory', 'processed'),
+            ('그래프', self.plots if self.plots == 'full' else f"limited ({len(self.plot_glasses)}개 glass)", 'plots'),
+        ]
+        return pd.DataFrame([
+            {'단계': stage, '실행 방식': mode, '예상 최대 메모리': format_size(self.estimates[key]),
+             '이유': self.reasons.get(key, '')}
+            for stage, mode, key in stages
+        ])
+
+    def to_dict(self):
+        """JSON 저장 / 서비스 응답용 요약"""
+        return {
+            'budget': int(self.budget),
+            'mode': self.mode,
+            'plots': self.plots,
+            'batches': len(self.batches),
+            'batch_files': [len(batch) for batch in self.batches],
+            'plot_glasses': list(self.plot_glasses),
+            'estimates': {key: int(value) for key, value in self.estimates.items()},
+            'reasons': dict(self.reasons),
+        }
+
+
+def estimate_memory(frame, backend='pandas', resample_pitch=None):
+    """manifest 행(LotManifest.to_frame() 또는 select() 결과)으로 단계별 최대 메모리 [byte] 추정
+
+    resample_pitch: 공통 그리드 간격 (행렬 폭이 픽셀 간격 / 그리드 간격 배로 늘어남)
+
+    반환값: {'raw', 'ingest', 'prepare', 'analysis', 'processed', 'plots', 'matrices', 'memory_peak'}
+    """
+    rows = pd.to_numeric(frame['rows'], errors='coerce').fillna(0)
+    columns = pd.to_numeric(frame.get('columns', pd.Series(4, index=frame.index)), errors='coerce').fillna(4)
+    raw = float(((columns + 1) * COLUMN_BYTES * rows).sum())
+    profiles = len(frame.drop_duplicates(subset=['glass', 'cell', 'position'])) if len(frame) else 0
+    width = float(rows.max()) if len(rows) else 0.0
+    if resample_pitch:
+        width *= PIXEL_PITCH / resample_pitch
+    matrices = profiles * width * 8 * MATRIX_COPIES
+    ingest = raw * INGEST_FACTOR
+    prepare = raw * ANALYSIS_FACTOR.get(backend, ANALYSIS_FACTOR['pandas'])
+    processed = raw * PROCESSED_FACTOR
+    plots = raw * PLOT_FACTOR
+    return {
+        'raw': raw,
+        'ingest': ingest,
+        'prepare': prepare,
+        'analysis': matrices,
+        'processed': processed,
+        'plots': plots,
+        'matrices': matrices,
+        # 기존 방식: 원본을 들고 분석(최대) -> 원본 + 처리된 데이터 + 그래프
+        'memory_peak': max(ingest + prepare + matrices, ingest + processed + plots),
+    }
+
+
+def plan_execution(manifest, frame=None, budget=None, backend='pandas', resample_pitch=None, page_size=5):
+    """LotManifest와 메모리 예산으로 실행 계획 선택
+
+    frame: 실제로 읽을 manifest 행 (select() 결과, 없으면 전체)
+    budget: byte 수 또는 '2GB' 같은 문자열 (없으면 default_budget())
+    page_size: 그래프를 일부만 그릴 때 최소 glass 수 (그래프 한 페이지)
+    """
+    budget = default_budget() if budget is None else parse_size(budget)
+    frame = manifest.to_frame() if frame is None else frame
+    estimates = estimate_memory(frame, backend=backend, resample_pitch=resample_pitch)
+    raw = estimates['raw']
+    rows = max(float(pd.to_numeric(frame['rows'], errors='coerce').fillna(0).sum()), 1.0)
+    row_bytes = raw / rows
+    glass_rows = pd.to_numeric(frame['rows'], errors='coerce').fillna(0).groupby(frame['glass'].fillna('')).sum()
+    largest_glass = float(glass_rows.max()) if len(glass_rows) else 0.0
+    per_row = row_bytes * (INGEST_FACTOR + ANALYSIS_FACTOR.get(backend, ANALYSIS_FACTOR['pandas']))
+    reasons = {}
+
+    if estimates['memory_peak'] <= budget:
+        mode, batches = 'memory', [frame]
+        reasons['ingest'] = f"예상 최대 {format_size(estimates['memory_peak'])} ≤ 예산 {format_size(budget)}"
+    else:
+        # 처리된 데이터를 메모리에 두고 남는 예산으로 묶음 크기 결정, 한 glass도 안 되면 디스크로
+        # (마지막에 묶음들을 합치는 동안 처리된 데이터가 잠시 두 배)
+        kept = estimates['processed'] + estimates['matrices']
+        batch_rows = (budget - kept) / per_row
+        if batch_rows >= largest_glass and 2 * estimates['processed'] + estimates['matrices'] <= budget:
+            mode = 'chunked'
+            reasons['ingest'] = (f"예상 최대 {format_size(estimates['memory_peak'])} > 예산 {format_size(budget)}"
+                                 f" -> 묶음당 약 {int(batch_rows):,}행씩 읽음")
+            reasons['processed'] = f"처리된 데이터 {format_size(estimates['processed'])}는 메모리에 보관"
+        else:
+            mode = 'spill'
+            batch_rows = (budget - estimates['matrices']) / per_row
+            reasons['ingest'] = f"처리된 데이터({format_size(estimates['processed'])})까지 예산 초과 -> 묶음별로 읽음"
+            if batch_rows < largest_glass:
+                # 예산이 최소 실행 단위(glass 1개 + 프로파일 행렬)보다 작아도 중단하지 않고 가장 작게 실행
+                batch_rows = largest_glass
+                minimum = estimates['matrices'] + largest_glass * per_row
+                reasons['ingest'] += f" (최소 실행 단위 약 {format_size(minimum)} > 예산, glass 1개씩 읽음)"
+            reasons['processed'] = "처리된 데이터를 묶음별 파일로 디스크에 보관"
+        batches = manifest.batches(max_rows=int(batch_rows), frame=frame)
+        reasons['prepare'] = f"{len(batches)}개 묶음으로 나눠 전처리 후 프로파일 행렬만 보관"
+        reasons['analysis'] = "묶음별 행렬을 합쳐 lot 전체 기준으로 한 번 분석 (결과 동일)"
+    if estimates['matrices'] > budget:
+        # golden 중앙값 / 이상치 z가 lot 전체 기준이라 행렬 단계는 나눌 수 없음
+        reasons['analysis'] = (f"프로파일 행렬 분석만 약 {format_size(estimates['matrices'])}로 예산 초과"
+                               " (리샘플링 간격을 넓히거나 glass를 나눠 분석)")
+
+    # 그래프: 분석이 끝난 뒤 남는 예산으로 그릴 수 있는 glass 수
+    glasses = sorted(glass_rows.index[glass_rows.index != ''])
+    resident = estimates['ingest'] + estimates['processed'] if mode == 'memory' else (
+        estimates['processed'] if mode == 'chunked' else 0.0
+    )
+    plot_budget = budget - resident
+    if estimates['plots'] <= plot_budget:
+        plots, plot_glasses = 'full', glasses
+    else:
+        plots, plot_glasses, used = 'limited', [], 0.0
+        for glass in glasses:
+            cost = glass_rows[glass] * row_bytes * (PLOT_FACTOR + (PROCESSED_FACTOR if mode == 'spill' else 0))
+            if len(plot_glasses) >= page_size and used + cost > plot_budget:
+                break
+            plot_glasses.append(glass)
+            used += cost
+        reasons['plots'] = f"그래프 예상 {format_size(estimates['plots'])} > 남은 예산 -> {len(plot_glasses)}개 glass만 그림"
+    reasons.setdefault('plots', "전체 glass")
+
+    if mode != 'memory':
+        batch_raw = max(
+            float(pd.to_numeric(batch['rows'], errors='coerce').fillna(0).sum()) for batch in batches
+        ) * row_bytes
+        estimates = dict(estimates)
+        estimates['ingest'] = batch_raw * INGEST_FACTOR
+        estimates['prepare'] = batch_raw * (INGEST_FACTOR + ANALYSIS_FACTOR.get(backend, ANALYSIS_FACTOR['pandas']))
+        if mode == 'spill':
+            estimates['processed'] = 0.0
+    if plots == 'limited':
+        plotted = float(glass_rows[plot_glasses].sum()) if plot_glasses else 0.0
+        estimates['plots'] = plotted * row_bytes * PLOT_FACTOR
+    return ExecutionPlan(budget, mode, plots, estimates, batches, plot_glasses, reasons, backend=backend)
+
+
+def _batch_frame(batch, source=None, report=None):
+    """묶음 하나의 manifest 행 -> 원본 컬럼 + 'file' DataFrame (source가 있으면 거기서 해당 파일만)"""
+    if source is not None:
+        return source[source['file'].isin(set(batch['file']))]
+    frames = []
+    for filename, df in manifest_sources(batch):
+        if report is not None:
+            report.add(filename, df)
+        df['file'] = filename
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def execute_plan(plan, source=None, smoothing=None, baseline='fixed', resample_pitch=None, golden=None, log=None,
+                 spill_dir=None, profile_stats=False, report=None):
+    """실행 계획대로 lot 분석 (memory는 analyze_lot 한 번, chunked / spill은 묶음별 전처리 후 행렬을 합쳐 분석)
+
+    source: 이미 읽은 lot DataFrame (없으면 manifest 행의 파일을 묶음마다 다시 읽음)
+    profile_stats: True면 묶음별로 평균 프로파일 집계를 만들어 합침 (처리된 데이터를 다시 읽지 않게)
+    report: IngestReport를 주면 파일을 읽을 때마다 품질 검사도 함께 (source가 없을 때)
+    반환값: (결과 DataFrame, 처리된 데이터 - DataFrame 또는 SpilledFrame(spill), 평균 프로파일 집계 또는 None)
+    """
+    outer = log or (lambda level, message: None)
+    seen = set()
+
+    def log_once(level, message):
+        # 묶음마다 반복되는 전처리 메시지(컬럼 매핑 등)는 한 번만
+        if (level, message) not in seen:
+            seen.add((level, message))
+            outer(level, message)
+
+    if plan.mode == 'memory':
+        result, processed = analyze_lot(
+            source if source is not None else _batch_frame(plan.files, report=report),
+            smoothing=smoothing, baseline=baseline, resample_pitch=resample_pitch, golden=golden, log=outer,
+            backend=plan.backend
+        )
+        stats = build_profile_stats(processed, resample_pitch=resample_pitch) if profile_stats and len(processed) else None
+        return result, processed, stats
+
+    stats = None
+    processed = SpilledFrame(spill_dir) if plan.mode == 'spill' else []
+    fronts, downs = [], []
+    for number, batch in enumerate(plan.batches, start=1):
+        outer('info', f"📦 묶음 {number}/{len(plan.batches)} 처리 중... ({len(batch)}개 파일)")
+        df_batch = _batch_frame(batch, source, report)
+        if len(df_batch) == 0:
+            continue
+        prepared = prepare_profiles(df_batch, resample_pitch=resample_pitch, log=log_once, backend=plan.backend)
+        del df_batch
+        if prepared is None:
+            return pd.DataFrame(), pd.DataFrame(), None
+        df, front_profiles, down_profiles = prepared
+        fronts.append(front_profiles)
+        downs.append(down_profiles)
+        if profile_stats:
+            batch_stats = build_profile_stats(df, resample_pitch=resample_pitch)
+            stats = batch_stats if stats is None else stats.merge(batch_stats)
+        processed.append(df)
+        del df
+
+    result = analyze_profiles(
+        merge_profiles(fronts, resample_pitch), merge_profiles(downs, resample_pitch),
+        smoothing=smoothing, baseline=baseline, resample_pitch=resample_pitch, golden=golden, log=log_once
+    )
+    if plan.mode == 'chunked':
+        processed = pd.concat(processed, ignore_index=True) if processed else pd.DataFrame()
+    return result, processed, stats
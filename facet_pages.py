@@ -0,0 +1,166 @@
+"""
+glass × cell 소형 다중 그래프 페이지 렌더링 모듈
+facet_row/facet_col로 한 Figure에 모든 glass-cell 조합을 그리면 glass가 많을 때 매우 느려지므로
+glass를 페이지 단위로 나눠 필요한 페이지만 그리고, 축 틀(subplot 레이아웃)은 페이지끼리 공유
+"""
+
+import numpy as np
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+DEFAULT_COLORS = [
+    '#1f77b4', '#ff7f0e', '#2ca02c', '#d62728',
+    '#9467bd', '#8c564b', '#e377c2', '#7f7f7f',
+    '#bcbd22', '#17becf'
+]
+
+
+def _padded_range(values, pad=0.05):
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return None
+    lo, hi = values.min(), values.max()
+    margin = (hi - lo) * pad or 1.0
+    return [lo - margin, hi + margin]
+
+
+class FacetPager:
+    """행(row) 값을 page_size개씩 나눠 페이지별 facet Figure를 만드는 렌더러
+
+    - 데이터는 생성 시 (행, 열, 색) 그룹별 배열로 한 번만 나눠 두고 페이지마다 골라 씀
+    - 모든 페이지가 같은 축 범위 / 색상 / 범례를 쓰므로 페이지를 넘겨도 비교 가능
+    - 같은 행 수의 subplot 틀은 한 번 만들어 복사해서 재사용
+    kind: 'scatter' (WebGL 점) 또는 'bar'
+    """
+
+    def __init__(self, df, x, y, row, col, color, kind='scatter', page_size=5, row_height=180,
+                 title='', labels=None, color_palette=None):
+        self.x, self.y, self.row, self.col, self.color = x, y, row, col, color
+        self.kind = kind
+        self.page_size = max(int(page_size), 1)
+        self.row_height = row_height
+        self.title = title
+        self.labels = labels or {}
+
+        df = df[list(dict.fromkeys([x, y, row, col, color]))].dropna(subset=[row, col, color])
+        self.rows = sorted(df[row].unique().tolist(), key=str)
+        self.cols = sorted(df[col].unique().tolist(), key=str)
+        self.colors = sorted(df[color].unique().tolist(), key=str)
+        palette = color_palette or DEFAULT_COLORS
+        self.color_map = {value: palette[i % len(palette)] for i, value in enumerate(self.colors)}
+
+        # (행, 열, 색) -> (x, y) 배열
+        self._groups = {
+            key: (group[x].to_numpy(), group[y].to_numpy())
+            for key, group in df.groupby([row, col, color], sort=False)
+        }
+        self.x_range = None if kind == 'bar' else _padded_range(df[x])
+        self.y_range = _padded_range(np.append(df[y].to_numpy(dtype=float), 0.0) if kind == 'bar' else df[y])
+        self._templates = {}
+        self._figures = {}
+
+    @property
+    def n_pages(self):
+        return max(int(np.ceil(len(self.rows) / self.page_size)), 1)
+
+    def page_rows(self, page):
+        start = page * self.page_size
+        return self.rows[start:start + self.page_size]
+
+    def _template(self, n_rows):
+        """행 수별 공유 subplot 틀 (축 범위, 열 제목, 높이)"""
+        if n_rows not in self._templates:
+            fig = make_subplots(
+                rows=n_rows,
+                cols=max(len(self.cols), 1),
+                shared_xaxes=True,
+                shared_yaxes=True,
+                column_titles=[f"{self.col}={value}" for value in self.cols],
+                horizontal_spacing=0.01,
+                vertical_spacing=min(0.04, 0.3 / n_rows),
+            )
+            if self.x_range is not None:
+                fig.update_xaxes(range=self.x_range)
+            else:
+                fig.update_xaxes(categoryorder='array', categoryarray=self.colors)
+            if self.y_range is not None:
+                fig.update_yaxes(range=self.y_range)
+            fig.update_xaxes(title_text=self.labels.get(self.x, self.x), row=n_rows)
+            fig.update_yaxes(title_text=self.labels.get(self.y, self.y), col=1)
+            fig.update_layout(
+                height=n_rows * self.row_height + 160,
+                template='plotly',
+                font=dict(size=12),
+                showlegend=True,
+                legend=dict(
+                    orientation="h",
+                    yanchor="bottom",
+                    y=1.02,
+                    xanchor="right",
+                    x=1
+                )
+            )
+            self._templates[n_rows] = fig
+        return self._templates[n_rows]
+
+    def figure(self, page=0):
+        """page번째 페이지 Figure (한 번 만든 페이지는 캐시)"""
+        page = min(max(int(page), 0), self.n_pages - 1)
+        if page in self._figures:
+            return self._figures[page]
+
+        rows = self.page_rows(page)
+        template = self._template(max(len(rows), 1))
+        traces, annotations = [], list(template.layout.annotations)
+        shown = set()
+        for i, row_value in enumerate(rows):
+            for j, col_value in enumerate(self.cols):
+                # subplot 번호로 축을 직접 지정 (add_trace(row=, col=)보다 훨씬 빠름)
+                axis = i * len(self.cols) + j + 1
+                suffix = '' if axis == 1 else str(axis)
+                for color_value in self.colors:
+                    group = self._groups.get((row_value, col_value, color_value))
+                    if group is None:
+                        continue
+                    common = dict(
+                        x=group[0],
+                        y=group[1],
+                        xaxis=f"x{suffix}",
+                        yaxis=f"y{suffix}",
+                        name=str(color_value),
+                        legendgroup=str(color_value),
+                        showlegend=color_value not in shown,
+                    )
+                    shown.add(color_value)
+                    if self.kind == 'bar':
+                        traces.append(go.Bar(
+                            marker=dict(color=self.color_map[color_value], opacity=0.8,
+                                        line=dict(width=1, color='white')),
+                            **common
+                        ))
+                    else:
+                        traces.append(go.Scattergl(
+                            mode='markers',
+                            marker=dict(color=self.color_map[color_value], size=4, opacity=0.7),
+                            **common
+                        ))
+
+            # 행 제목 (오른쪽 세로 글자)
+            domain = template.layout[f"yaxis{'' if i == 0 else i * len(self.cols) + 1}"].domain
+            annotations.append(go.layout.Annotation(
+                text=f"{self.row}={row_value}", textangle=90, showarrow=False,
+                xref='paper', yref='paper', x=1.02, y=(domain[0] + domain[1]) / 2,
+                xanchor='left', yanchor='middle'
+            ))
+
+        fig = go.Figure(data=traces, layout=template.layout)
+        fig.update_layout(annotations=annotations)
+        title = self.title if self.n_pages == 1 else f"{self.title} (페이지 {page + 1}/{self.n_pages})"
+        fig.update_layout(title=title)
+        self._figures[page] = fig
+        return fig
+
+    def page_of(self, row_value):
+        """row 값이 들어 있는 페이지 번호"""
+        return self.rows.index(row_value) // self.page_size
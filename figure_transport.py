@@ -0,0 +1,136 @@
+"""
+Figure 전송 최적화 모듈
+st.plotly_chart는 rerun마다 Figure를 JSON으로 바꿔 브라우저로 보내는데, facet 그래프는 trace마다
+수천~수만 개의 float64 숫자 배열이라 이 변환 / 전송이 페이지 지연의 대부분을 차지함
+- 숫자 배열은 미리 plotly.js typed array(base64 bdata, float32 / 가장 작은 정수형)로 인코딩
+- 등간격 x 배열(x = no * PIXEL_PITCH)은 x0 / dx 두 숫자로 대체, 등간격이 아닌 같은 배열은 한 번만 인코딩
+- 변환 결과는 모듈에 캐시하지 않음 - 호출하는 쪽이 세션 데이터(SessionStore)에 보관해 크기를 함께 관리
+"""
+
+import base64
+
+import numpy as np
+import plotly.graph_objects as go
+
+FLOAT_DTYPE = 'f4'
+# x0 / dx를 지원하는 trace 종류
+UNIFORM_TRACES = ('scatter', 'scattergl', 'bar')
+# 숫자 배열이어도 그대로 두는 키 (축 범위 등 짧은 설정 값)
+SKIP_KEYS = ('range', 'domain', 'geojson', 'layer', 'layers')
+
+
+def _int_dtype(array):
+    """정수 배열을 담을 수 있는 가장 작은 plotly.js 정수형"""
+    if array.size == 0:
+        return np.int8
+    lo, hi = array.min(), array.max()
+    for dtype in (np.int8, np.int16, np.int32) if lo < 0 else (np.uint8, np.uint16, np.uint32):
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return dtype
+    return None
+
+
+def encode_array(values, float_dtype=FLOAT_DTYPE, memo=None):
+    """숫자 배열 -> plotly.js typed array spec ({'dtype', 'bdata'}), 숫자가 아니면 그대로
+
+    memo: 같은 바이트의 배열을 한 번만 인코딩하기 위한 dict (Figure 하나를 변환하는 동안 공유)
+    """
+    array = np.asarray(values)
+    if array.ndim != 1 or array.size == 0:
+        return values
+    if array.dtype.kind == 'f':
+        array = array.astype(float_dtype, copy=False)
+    elif array.dtype.kind in 'iu':
+        dtype = _int_dtype(array)
+        if dtype is None:
+            return values
+        array = array.astype(dtype, copy=False)
+    else:
+        return values
+
+    array = np.ascontiguousarray(array)
+    key = (array.dtype.str, array.tobytes())
+    if memo is not None and key in memo:
+        return memo[key]
+    spec = {'dtype': array.dtype.str.lstrip('<|='), 'bdata': base64.b64encode(array).decode('ascii')}
+    if memo is not None:
+        memo[key] = spec
+    return spec
+
+
+def uniform_step(values, tol=1e-6):
+    """등간격 숫자 배열이면 (시작값, 간격), 아니면 None (간격의 tol 배 이내 오차는 허용)"""
+    try:
+        array = np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        return None
+    if array.ndim != 1 or len(array) < 3 or not np.isfinite(array).all():
+        return None
+    step = (array[-1] - array[0]) / (len(array) - 1)
+    if step == 0:
+        return None
+    grid = array[0] + step * np.arange(len(array))
+    if np.abs(array - grid).max() > abs(step) * tol:
+        return None
+    return float(array[0]), float(step)
+
+
+def decode_array(value):
+    """plotly.js typed array spec(1차원) -> numpy 배열, spec이 아니면 None
+
+    plotly 6 이상은 Figure.to_dict()에서 numpy 배열을 이미 float64 spec으로 바꿔 돌려줌
+    """
+    if not (isinstance(value, dict) and 'bdata' in value and 'dtype' in value) or value.get('shape'):
+        return None
+    return np.frombuffer(base64.b64decode(value['bdata']), dtype=value['dtype'])
+
+
+def _is_numeric(value):
+    if isinstance(value, np.ndarray):
+        return value.dtype.kind in 'iuf'
+    if isinstance(value, (list, tuple)) and value:
+        return all(isinstance(item, (int, float)) and not isinstance(item, bool) for item in value)
+    return False
+
+
+def _encode_tree(node, float_dtype, memo):
+    """dict 안의 숫자 배열을 모두 typed array로 (중첩된 marker.color 등 포함)"""
+    for key, value in node.items():
+        if key in SKIP_KEYS:
+            continue
+        decoded = decode_array(value)
+        if decoded is not None:
+            node[key] = encode_array(decoded, float_dtype, memo)
+        elif isinstance(value, dict):
+            _encode_tree(value, float_dtype, memo)
+        elif _is_numeric(value):
+            node[key] = encode_array(value, float_dtype, memo)
+
+
+def compact_trace(trace, float_dtype=FLOAT_DTYPE, memo=None):
+    """trace dict 하나를 전송용으로 변환 (제자리 수정 후 반환)"""
+    memo = {} if memo is None else memo
+    if trace.get('type', 'scatter') in UNIFORM_TRACES and 'x0' not in trace and 'dx' not in trace:
+        x = trace.get('x')
+        x = decode_array(x) if isinstance(x, dict) else x
+        uniform = uniform_step(x) if _is_numeric(x) else None
+        if uniform is not None:
+            del trace['x']
+            trace['x0'], trace['dx'] = uniform
+    _encode_tree(trace, float_dtype, memo)
+    return trace
+
+
+def compact_figure(fig, float_dtype=FLOAT_DTYPE):
+    """Figure -> 숫자 배열을 typed array로 바꾼 전송용 Figure
+
+    float_dtype='f8'이면 값은 그대로 두고 x 중복 제거 / 인코딩만 적용
+    결과는 원본과 별개의 사본이므로 rerun마다 다시 변환하지 않으려면 세션 데이터에 보관
+    """
+    figure = fig.to_dict()
+    memo = {}
+    for trace in figure.get('data', []):
+        compact_trace(trace, float_dtype, memo)
+    # 원본 Figure 생성 때 이미 검증된 값이므로 검증 없이 그대로 생성 (skip_invalid는 검증하면서 값을 버림)
+    return go.Figure(figure, skip_invalid=False, _validate=False)
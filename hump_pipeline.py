@@ -0,0 +1,434 @@
+"""
+hump 분석 파이프라인 모듈
+Streamlit / Jupyter / HTTP 서비스가 같이 쓰는 화면 없는(headless) 분석 흐름
+진행 메시지는 log(level, message) 콜백으로 전달 (level: 'info' / 'success' / 'warning' / 'error')
+"""
+
+import glob
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from hump_kernels import (
+    PIXEL_PITCH, compute_hump, flag_outliers, golden_scores, load_profiles, smooth_by_side, subtract_baseline
+)
+from hump_polars import column_names, prepare_lot
+from profile_archive import ARCHIVE_SUFFIX, is_archive, iter_archive
+
+# analyze_lot 백엔드 ('polars'는 polars 패키지 필요)
+BACKENDS = ('pandas', 'polars')
+
+
+def extract_cell_from_id(cell_id):
+    """CELL ID에서 cell 정보 추출"""
+    return str(cell_id)[-3:]
+
+
+def extract_position_from_file(filename):
+    """파일명에서 position 정보 추출 (하위 폴더 경로가 붙은 이름이면 파일명 부분만 사용)"""
+    filename = str(filename).replace('\\', '/').rsplit('/', 1)[-1]
+    # 파일명에서 마지막 13글자 중 첫 번째 글자 추출
+    if len(filename) >= 13:
+        return filename[-13]
+    return "1"  # 기본값
+
+
+def assign_split_category(cell):
+    """cell에 따른 split 카테고리 할당"""
+    if cell in ["A01", "B02", "C04", "D05", "A06", "B07", "C09", "D10"]:
+        return "Sp1"
+    elif cell in ["A03", "C03", "A08", "C08"]:
+        return "Sp2"
+    elif cell in ["B03", "D03", "B08", "D08"]:
+        return "Sp3"
+    else:
+        return "Unknown"
+
+
+def position_to_side(position):
+    """position을 side로 변환"""
+    position_map = {
+        "1": "Left",
+        "2": "Right", 
+        "3": "Top",
+        "4": "Down"
+    }
+    return position_map.get(str(position), "Unknown")
+
+
+def resolve_paths(*paths, recursive=True):
+    """파일 / glob 패턴 / 디렉터리(하위 폴더 포함)를 CSV·.hparc 파일 목록으로 변환"""
+    files = []
+    for path in paths:
+        path = os.path.expanduser(str(path))
+        if os.path.isdir(path):
+            candidates = Path(path).glob('**/*' if recursive else '*')
+            matches = [p for p in candidates if p.suffix.lower() in ('.csv', ARCHIVE_SUFFIX)]
+        elif glob.has_magic(path):
+            matches = [Path(p) for p in glob.glob(path, recursive=True)]
+        else:
+            matches = [Path(path)]
+        files.extend(sorted(p for p in matches if p.is_file()))
+    return list(dict.fromkeys(files))
+
+
+def source_names(files):
+    """디스크 파일 -> 'file' 컬럼에 쓸 이름 {파일: 이름}
+
+    모든 파일의 공통 상위 폴더 기준 상대 경로('/' 구분) - 한 폴더의 파일이면 파일명 그대로이고,
+    하위 폴더 여러 곳에 같은 파일명이 있어도 (sub1/a.csv, sub2/a.csv) 이름이 겹치지 않음
+    """
+    files = list(files)
+    paths = [Path(os.path.abspath(str(path))) for path in files]
+    try:
+        root = os.path.commonpath([str(path.parent) for path in paths]) if paths else ''
+    except ValueError:
+        # 드라이브가 다른 경우 (Windows) - 전체 경로 사용
+        return {file: path.as_posix() for file, path in zip(files, paths)}
+    return {file: path.relative_to(root).as_posix() for file, path in zip(files, paths)}
+
+
+def path_sources(files):
+    """디스크 파일의 (이름, DataFrame) - CSV는 메모리 맵으로 바로 파싱 (바이트 복사 없음)
+
+    이름은 source_names()의 상대 경로 (아카이브 안의 파일은 아카이브에 저장된 이름)
+    """
+    for path, name in source_names(map(Path, files)).items():
+        if is_archive(path.name):
+            yield from iter_archive(path)
+        else:
+            yield name, pd.read_csv(path, memory_map=True)
+
+
+def _silent(level, message):
+    pass
+
+
+def resolve_columns(columns, log=None):
+    """필수 컬럼의 대안 컬럼명 확인
+
+    반환값: ('no'로 쓸 컬럼 (없으면 None - 인덱스 사용), {표준 컬럼명: 대안 컬럼명}, 여전히 없는 필수 컬럼)
+    """
+    log = log or _silent
+    columns = list(columns)
+    
+    # 'no' 컬럼 확인
+    no_column = 'no'
+    if 'no' not in columns:
+        no_column = next((alt for alt in ['No', 'NO', 'index', 'Index'] if alt in columns), None)
+        if no_column is None:
+            log('warning', "⚠️ 'no' 컬럼을 찾을 수 없어서 인덱스를 사용합니다.")
+        columns.append('no')
+    
+    # 필수 컬럼 확인
+    required_cols = ['CELL ID', 'Avg Offset', 'Glass ID']
+    missing_cols = [col for col in required_cols if col not in columns]
+    
+    col_mapping = {}
+    if missing_cols:
+        # 대안 컬럼명 확인
+        for col in missing_cols:
+            if col == 'CELL ID':
+                alternatives = ['Cell ID', 'cell_id', 'cellid', 'Cell_ID', 'CellID']
+            elif col == 'Avg Offset':
+                alternatives = ['avg_offset', 'AvgOffset', 'Average Offset', 'Offset']
+            elif col == 'Glass ID':
+                alternatives = ['Glass_ID', 'glass_id', 'glassid', 'GlassID', 'glass']
+            
+            for alt in alternatives:
+                if alt in columns:
+                    col_mapping[col] = alt
+                    break
+        
+        for original, alternative in col_mapping.items():
+            columns.append(original)
+            log('info', f"✅ '{alternative}' 컬럼을 '{original}'로 매핑했습니다.")
+    
+    # 여전히 없는 컬럼 확인
+    still_missing = [col for col in required_cols if col not in columns]
+    if still_missing:
+        log('error', f"❌ 다음 필수 컬럼을 찾을 수 없습니다: {still_missing}")
+        log('error', f"사용 가능한 컬럼: {columns}")
+    return no_column, col_mapping, still_missing
+
+
+def _prepare_pandas(df_combined, no_column, col_mapping):
+    """pandas 백엔드 전처리 - 컬럼 매핑과 파생 컬럼(cell, position, x, side)"""
+    df = df_combined.copy()
+    if no_column is None:
+        # 인덱스를 'no' 컬럼으로 사용
+        df['no'] = df.index + 1
+    elif no_column != 'no':
+        df['no'] = df[no_column]
+    
+    # 컬럼명 변경
+    for original, alternative in col_mapping.items():
+        df[original] = df[alternative]
+    
+    df['cell'] = df['CELL ID'].apply(extract_cell_from_id)
+    df['position'] = df['file'].apply(extract_position_from_file)
+    # 레시피별 픽셀 간격(pitch 컬럼)이 있으면 사용
+    df['x'] = df['no'] * (df['pitch'].fillna(PIXEL_PITCH) if 'pitch' in df.columns else PIXEL_PITCH)
+    df['side'] = df['position'].apply(position_to_side)
+    return df
+
+
+def prepare_profiles(df_combined, resample_pitch=None, log=None, backend='pandas'):
+    """전처리 + Position 1-3 / Position 4 프로파일 행렬 변환 (analyze_profiles 입력)
+
+    반환값: (처리된 long 형식 DataFrame, Position 1-3 프로파일, Position 4 프로파일)
+            프로파일은 (키 DataFrame, x 축, 값 행렬), 해당 position 데이터가 없으면 None
+            필수 컬럼이 없으면 None
+            resample_pitch를 지정하면 Position 1-3 키에 프로파일별 'pitch' 컬럼이 붙음 (고정 기준점 위치 계산용)
+    """
+    log = log or _silent
+    if backend not in BACKENDS:
+        raise ValueError(f"지원하지 않는 분석 백엔드: {backend} (가능: {', '.join(BACKENDS)})")
+    
+    no_column, col_mapping, still_missing = resolve_columns(column_names(df_combined), log)
+    if still_missing:
+        return None
+    
+    if backend == 'polars':
+        # 전처리 + 프로파일 행렬 변환을 Polars lazy 쿼리 하나로 실행
+        df, front_profiles, down_profiles = prepare_lot(
+            df_combined, no_column=no_column, mapping=col_mapping, resample_pitch=resample_pitch
+        )
+    else:
+        df = _prepare_pandas(df_combined, no_column, col_mapping)
+        front_profiles, down_profiles = None, None
+    
+    front = df['position'] != "4"
+    if not front.any():
+        front_profiles = None
+    elif front_profiles is None:
+        # pivot_wider 구현 - (프로파일 × no) 행렬로 한 번에 변환
+        try:
+            front_profiles = load_profiles(
+                df[front],
+                keys=['Glass ID', 'cell', 'position'],
+                value_col='Avg Offset',
+                resample_pitch=resample_pitch
+            )
+        except Exception as e:
+            log('error', f"❌ Pivot 처리 중 오류: {str(e)}")
+            front_profiles = (pd.DataFrame(), np.array([]), np.empty((0, 0)))
+    
+    if not (~front).any():
+        down_profiles = None
+    elif down_profiles is None:
+        try:
+            down_profiles = load_profiles(
+                df[~front].rename(columns={'Glass ID': 'glass', 'Avg Offset': 'y'}),
+                keys=['glass', 'cell', 'side'],
+                value_col='y',
+                resample_pitch=resample_pitch
+            )
+        except Exception as e:
+            log('error', f"❌ Position 4 분석 중 오류: {str(e)}")
+            down_profiles = (pd.DataFrame(), np.array([]), np.empty((0, 0)))
+    if resample_pitch and front_profiles is not None:
+        # 공통 그리드의 고정 기준점(456번째 no) 위치는 파일마다 pitch에 따라 다르므로 프로파일별 pitch를 키에 붙임
+        keys, x_values, matrix = front_profiles
+        front_profiles = keys.assign(pitch=_profile_pitch(df[front], keys)), x_values, matrix
+    return df, front_profiles, down_profiles
+
+
+def _profile_pitch(df, profile_keys):
+    """profile_keys 행 순서의 프로파일별 픽셀 간격 [um] (pitch 컬럼 첫 값, 없거나 결측이면 PIXEL_PITCH)"""
+    if 'pitch' not in df.columns or len(profile_keys) == 0:
+        return np.full(len(profile_keys), PIXEL_PITCH)
+    keys = list(profile_keys.columns)
+    first = df.groupby(keys, sort=False)['pitch'].first()
+    return profile_keys.join(first, on=keys)['pitch'].fillna(PIXEL_PITCH).to_numpy(dtype=float)
+
+
+def merge_profiles(parts, resample_pitch=None):
+    """batch별 프로파일 행렬을 lot 전체 하나로 합침 (한 번에 변환한 결과와 같은 행 / 열 순서)
+
+    parts: prepare_profiles가 batch마다 반환한 (키 DataFrame, x 축, 값 행렬) 목록 (None은 건너뜀)
+    리샘플링 그리드는 pitch 배수에 정렬되어 있으므로 전체 범위 그리드에 그대로 배치
+    """
+    parts = [part for part in parts if part is not None]
+    if not parts:
+        return None
+    if len(parts) == 1:
+        return parts[0]
+    
+    axes = [np.asarray(x, dtype=float) for _, x, _ in parts]
+    if resample_pitch:
+        steps = [np.rint(x / resample_pitch).astype(np.int64) for x in axes if len(x)]
+        lo = min(step.min() for step in steps) if steps else 0
+        hi = max(step.max() for step in steps) if steps else -1
+        x_values = np.arange(lo, hi + 1) * resample_pitch
+        columns = [np.rint(x / resample_pitch).astype(np.int64) - lo for x in axes]
+    else:
+        x_values = np.unique(np.concatenate(axes))
+        columns = [np.searchsorted(x_values, x) for x in axes]
+    
+    profile_keys = pd.concat([keys for keys, _, _ in parts], ignore_index=True)
+    matrix = np.full((len(profile_keys), len(x_values)), np.nan)
+    start = 0
+    for (keys, _, values), cols in zip(parts, columns):
+        matrix[start:start + len(keys), cols] = values
+        start += len(keys)
+    
+    # 한 번에 변환할 때와 같이 프로파일 키 순서로 정렬
+    order = profile_keys.sort_values(list(profile_keys.columns), kind='stable').index.to_numpy()
+    return profile_keys.iloc[order].reset_index(drop=True), x_values, matrix[order]
+
+
+def analyze_profiles(front_profiles, down_profiles, smoothing=None, baseline='fixed', resample_pitch=None,
+                     golden=None, log=None):
+    """프로파일 행렬의 평활화 / 기준점 차감 / hump / golden 비교 (analyze_lot의 행렬 단계)
+
+    front_profiles / down_profiles: prepare_profiles 또는 merge_profiles 결과 (데이터가 없으면 None)
+    반환값: 결과 DataFrame
+    """
+    log = log or _silent
+    
+    # position이 "4"가 아닌 데이터 분석 (result1)
+    if front_profiles is not None:
+        log('info', "📊 Position 1-3 데이터 분석 중...")
+        
+        try:
+            profile_keys, x_values, profile_matrix = front_profiles
+            # 공통 그리드일 때 prepare_profiles가 붙인 프로파일별 pitch
+            pitch = profile_keys['pitch'].to_numpy() if 'pitch' in profile_keys.columns else PIXEL_PITCH
+            profile_keys = profile_keys.drop(columns='pitch', errors='ignore')
+            
+            log('success', f"✅ Pivot 테이블 생성 완료: {(len(x_values), len(profile_keys))}")
+            
+            # side별 평활화 (선택)
+            if smoothing:
+                sides = profile_keys['position'].apply(position_to_side)
+                profile_matrix = smooth_by_side(profile_matrix, sides, smoothing)
+                log('info', "✅ 프로파일 평활화 완료")
+            
+            # 기준점 차감 (고정: 456번째 행 / 자동: 프로파일별 평탄 구간)
+            if len(x_values) > 0:
+                # 공통 그리드에서는 프로파일별로 456번째 no에 해당하는 x 위치(456 × 파일 pitch)를 고정 기준점으로 사용
+                if resample_pitch:
+                    reference_x = 456 * np.broadcast_to(pitch, len(profile_keys))
+                    steps = np.rint((reference_x - x_values[0]) / resample_pitch).astype(np.int64)
+                    reference_row = np.clip(steps, 0, len(x_values) - 1)
+                else:
+                    reference_row = 455
+                profile_matrix, reference_index = subtract_baseline(
+                    profile_matrix, mode=baseline, reference_row=reference_row
+                )
+                if baseline == 'fixed':
+                    log('info', f"✅ 기준점({reference_index[0] + 1}번째 행) 차감 완료")
+                else:
+                    log('info', f"✅ 자동 기준점 차감 완료 (평탄 구간 중앙: {int(np.median(reference_index)) + 1}번째 행 부근)")
+            
+        except Exception as e:
+            log('error', f"❌ Pivot 처리 중 오류: {str(e)}")
+            profile_keys = pd.DataFrame()
+        
+        if len(profile_keys) > 0:
+            profile_keys = profile_keys.rename(columns={'Glass ID': 'glass'})
+            profile_keys['side'] = profile_keys['position'].apply(position_to_side)
+            
+            # hump 분석 - 전체 프로파일 행렬에서 서브픽셀 피크까지 한 번에 계산
+            try:
+                result1 = compute_hump(
+                    profile_keys[['glass', 'cell', 'side']], x_values, profile_matrix
+                )
+                # golden 프로파일 대비 편차 점수 (전체 프로파일 행렬 한 번에 계산)
+                result1 = pd.concat(
+                    [result1, golden_scores(profile_keys, x_values, profile_matrix, golden=golden)], axis=1
+                )
+                
+                if len(result1) > 0:
+                    result1['split'] = result1['cell'].apply(assign_split_category)
+                    log('success', f"✅ Position 1-3 분석 완료: {len(result1)}개 결과")
+                else:
+                    result1 = pd.DataFrame()
+                    log('warning', "⚠️ Position 1-3 분석 결과가 없습니다.")
+                    
+            except Exception as e:
+                log('error', f"❌ Hump 분석 중 오류: {str(e)}")
+                result1 = pd.DataFrame()
+        else:
+            result1 = pd.DataFrame()
+            log('warning', "⚠️ Position 1-3 데이터 변환 결과가 없습니다.")
+    else:
+        result1 = pd.DataFrame()
+        log('info', "ℹ️ Position 1-3 데이터가 없습니다.")
+    
+    # position이 "4"인 데이터 분석 (result2)
+    if down_profiles is not None:
+        log('info', "📊 Position 4 데이터 분석 중...")
+        
+        try:
+            profile_keys, x_values, profile_matrix = down_profiles
+            profile_matrix = smooth_by_side(profile_matrix, profile_keys['side'], smoothing)
+            result2 = compute_hump(profile_keys, x_values, profile_matrix, span=True)
+            result2 = pd.concat([
+                result2,
+                golden_scores(profile_keys, x_values, profile_matrix, golden=golden, normalize='min')
+            ], axis=1)
+            
+            if len(result2) > 0:
+                result2['split'] = result2['cell'].apply(assign_split_category)
+                log('success', f"✅ Position 4 분석 완료: {len(result2)}개 결과")
+            else:
+                result2 = pd.DataFrame()
+                log('warning', "⚠️ Position 4 분석 결과가 없습니다.")
+                
+        except Exception as e:
+            log('error', f"❌ Position 4 분석 중 오류: {str(e)}")
+            result2 = pd.DataFrame()
+    else:
+        result2 = pd.DataFrame()
+        log('info', "ℹ️ Position 4 데이터가 없습니다.")
+    
+    # 결과 합치기
+    if len(result1) > 0 and len(result2) > 0:
+        result = pd.concat([result1, result2], ignore_index=True)
+        log('success', "✅ 모든 분석 결과 합치기 완료")
+    elif len(result1) > 0:
+        result = result1
+        log('info', "ℹ️ Position 1-3 결과만 사용")
+    elif len(result2) > 0:
+        result = result2
+        log('info', "ℹ️ Position 4 결과만 사용")
+    else:
+        result = pd.DataFrame()
+        log('error', "❌ 분석 결과가 없습니다.")
+    
+    if len(result) > 0:
+        # golden 프로파일 대비 이상 프로파일 표시
+        result = flag_outliers(result)
+        n_outliers = int(result['outlier'].sum())
+        if n_outliers > 0:
+            log('warning', f"⚠️ Golden 프로파일 대비 이상 프로파일 {n_outliers}개가 발견되었습니다.")
+        result = result.sort_values(['glass', 'cell', 'side']).reset_index(drop=True)
+        log('success', f"🎉 최종 분석 완료! 총 {len(result)}개의 결과가 생성되었습니다.")
+    
+    return result
+
+
+def analyze_lot(df_combined, smoothing=None, baseline='fixed', resample_pitch=None, golden=None, log=None,
+                backend='pandas'):
+    """로드한 lot(원본 컬럼 + 'file')의 hump 분석
+
+    smoothing: side별 평활화 설정 (예: {'Left': {'method': 'savgol', 'window': 7}})
+    baseline: Position 1-3 기준점 방식 ('fixed': 456번째 행, 'auto': 자동 평탄 구간)
+    resample_pitch: 지정하면 모든 프로파일을 이 간격 [um]의 공통 x 그리드로 리샘플링
+    golden: side, x, y 컬럼의 golden 프로파일 (없으면 lot의 side별 중앙값 프로파일과 비교)
+    backend: 'pandas' 또는 'polars' (전처리 + 행렬 변환을 lazy 쿼리로 실행, df_combined에 hump_polars.scan_lot() 사용 가능)
+    반환값: (결과 DataFrame, 처리된 long 형식 DataFrame) - 필수 컬럼이 없으면 빈 DataFrame 두 개
+    """
+    prepared = prepare_profiles(df_combined, resample_pitch=resample_pitch, log=log, backend=backend)
+    if prepared is None:
+        return pd.DataFrame(), pd.DataFrame()
+    df, front_profiles, down_profiles = prepared
+    result = analyze_profiles(
+        front_profiles, down_profiles, smoothing=smoothing, baseline=baseline, resample_pitch=resample_pitch,
+        golden=golden, log=log
+    )
+    return result, df
@@ -0,0 +1,192 @@
+"""
+Polars 분석 백엔드 모듈
+컬럼 매핑 → 파생 컬럼(cell, position, x, side) → 중복 제거 / 정렬 → 프로파일 행렬 변환을
+Polars lazy 쿼리로 표현해 한 번에 멀티스레드 실행 (pandas .copy() / 행 단위 apply / pivot 대체)
+행렬 이후 단계(평활화, 기준점 차감, hump, golden 점수)는 hump_kernels의 numpy 행렬 연산을 그대로 쓰므로
+결과는 pandas 백엔드와 동일
+"""
+
+import numpy as np
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+from hump_kernels import PIXEL_PITCH, common_grid, lot_pitch, resample_profiles
+
+AVAILABLE = pl is not None
+SIDE_OF_POSITION = {'1': 'Left', '2': 'Right', '3': 'Top', '4': 'Down'}
+FRONT_KEYS = ['Glass ID', 'cell', 'position']
+DOWN_KEYS = ['glass', 'cell', 'side']
+
+
+def _require_polars():
+    if pl is None:
+        raise ImportError("polars 백엔드에는 polars 패키지가 필요합니다: pip install polars")
+
+
+def column_names(source):
+    """pandas / Polars DataFrame 또는 LazyFrame의 컬럼 목록"""
+    if pl is not None and isinstance(source, pl.LazyFrame):
+        return source.collect_schema().names()
+    return list(source.columns)
+
+
+def scan_lot(files):
+    """CSV 파일 목록을 읽지 않고 lazy 스캔 (로더와 같이 'file' 컬럼 = source_names() 이름, 모든 파일 컬럼 구성이 같아야 함)"""
+    _require_polars()
+    # hump_pipeline이 이 모듈을 import하므로 함수 안에서 import
+    from hump_pipeline import source_names
+    names = {str(path): name for path, name in source_names(files).items()}
+    return pl.scan_csv(list(names), include_file_paths='file').with_columns(
+        pl.col('file').replace_strict(names, return_dtype=pl.String)
+    )
+
+
+def _to_lazy(source):
+    if isinstance(source, pl.LazyFrame):
+        return source
+    if isinstance(source, pl.DataFrame):
+        return source.lazy()
+    return pl.from_pandas(source).lazy()
+
+
+def _fixed_grid_plan(lf, keys, value_col, pitch):
+    """build_profile_matrix와 같은 (프로파일 키, 정렬된 no, (행, 열, 값), pitch 값) lazy 쿼리"""
+    pitches = lf.select(pitch.alias('pitch')).unique()
+    lf = lf.select(keys + ['no', value_col]).drop_nulls()
+    profile_keys = lf.select(keys).unique().sort(keys)
+    no = lf.select(pl.col('no').unique().sort())
+    # 프로파일 × no 조합별 원래 순서의 첫 번째 행만 사용 (pivot_table aggfunc='first'와 동일)
+    cells = (
+        lf.unique(subset=keys + ['no'], keep='first', maintain_order=True)
+        .join(profile_keys.with_row_index('row'), on=keys)
+        .join(no.with_row_index('col'), on='no')
+        .select('row', 'col', value_col)
+    )
+    return [profile_keys, no, cells, pitches]
+
+
+def _ragged_plan(lf, keys, value_col):
+    """build_ragged_matrix와 같은 (프로파일 키, (행, 열, x, 값)) lazy 쿼리"""
+    lf = (
+        lf.select(keys + ['x', value_col]).drop_nulls()
+        .sort(keys + ['x'], maintain_order=True)
+        .unique(subset=keys + ['x'], keep='first', maintain_order=True)
+        .with_columns(pl.int_range(pl.len()).over(keys).alias('col'))
+    )
+    profile_keys = lf.select(keys).unique().sort(keys)
+    cells = lf.join(profile_keys.with_row_index('row'), on=keys).select('row', 'col', 'x', value_col)
+    return [profile_keys, cells]
+
+
+def _scatter(shape, frame, value_col):
+    matrix = np.full(shape, np.nan)
+    matrix[frame['row'].to_numpy(), frame['col'].to_numpy()] = frame[value_col].to_numpy().astype(float)
+    return matrix
+
+
+def _fixed_grid_profiles(profile_keys, no, cells, pitches, value_col):
+    no = no['no'].to_numpy()
+    matrix = _scatter((len(profile_keys), len(no)), cells, value_col)
+    return profile_keys.to_pandas(), no * lot_pitch(pitches['pitch'].to_numpy().astype(float)), matrix
+
+
+def _ragged_profiles(profile_keys, cells, value_col, pitch):
+    width = int(cells['col'].max()) + 1 if len(cells) else 0
+    shape = (len(profile_keys), width)
+    x_matrix = _scatter(shape, cells, 'x')
+    y_matrix = _scatter(shape, cells, value_col)
+    if x_matrix.size == 0:
+        return profile_keys.to_pandas(), np.array([]), y_matrix
+    grid = common_grid(x_matrix, pitch)
+    return profile_keys.to_pandas(), grid, resample_profiles(x_matrix, y_matrix, grid)
+
+
+def prepare_lot(source, no_column='no', mapping=None, resample_pitch=None):
+    """lot 전처리 + Position 1-3 / Position 4 프로파일 행렬을 lazy 쿼리 하나로 실행
+
+    source: 로더 형식(원본 컬럼 + 'file')의 pandas DataFrame, Polars DataFrame 또는 scan_lot() LazyFrame
+    no_column: 'no'로 쓸 컬럼 (None이면 1부터 순번), mapping: {표준 컬럼명: 대안 컬럼명}
+    반환값: (처리된 long 형식 pandas DataFrame, Position 1-3 프로파일, Position 4 프로파일)
+            프로파일은 hump_kernels.load_profiles와 같은 (키 DataFrame, x 축, 값 행렬)
+    """
+    _require_polars()
+    lf = _to_lazy(source)
+    columns = column_names(lf)
+    # pandas의 NaN 결측 처리(dropna)와 맞추기 위해 NaN을 null로
+    lf = lf.with_columns(pl.col(pl.Float32, pl.Float64).fill_nan(None))
+
+    if no_column is None:
+        lf = lf.with_columns(pl.int_range(1, pl.len() + 1).alias('no'))
+    elif no_column != 'no':
+        lf = lf.with_columns(pl.col(no_column).alias('no'))
+    if mapping:
+        lf = lf.with_columns([pl.col(alternative).alias(original) for original, alternative in mapping.items()])
+
+    # position은 하위 폴더 경로를 뺀 파일명 부분에서
+    file = pl.col('file').cast(pl.String).str.extract(r'([^/\\]+)$')
+    # 레시피별 픽셀 간격(pitch 컬럼), 없거나 결측이면 PIXEL_PITCH
+    pitch = pl.col('pitch').fill_null(PIXEL_PITCH) if 'pitch' in columns else pl.lit(PIXEL_PITCH)
+    lf = lf.with_columns(
+        # str(값)[-3:]과 같이 결측 CELL ID는 'nan'
+        pl.col('CELL ID').cast(pl.String).fill_null('nan').str.slice(-3).alias('cell'),
+        pl.when(file.str.len_chars() >= 13).then(file.str.slice(-13, 1)).otherwise(pl.lit('1')).alias('position'),
+    ).with_columns(
+        (pl.col('no') * pitch).alias('x'),
+        pl.col('position').replace_strict(SIDE_OF_POSITION, default='Unknown').alias('side'),
+    )
+
+    front = lf.filter(pl.col('position') != '4')
+    down = lf.filter(pl.col('position') == '4').rename({'Glass ID': 'glass', 'Avg Offset': 'y'})
+    if resample_pitch:
+        plans = _ragged_plan(front, FRONT_KEYS, 'Avg Offset') + _ragged_plan(down, DOWN_KEYS, 'y')
+    else:
+        plans = (_fixed_grid_plan(front, FRONT_KEYS, 'Avg Offset', pitch)
+                 + _fixed_grid_plan(down, DOWN_KEYS, 'y', pitch))
+
+    # 공통 부분(스캔, 파생 컬럼)은 한 번만 계산되도록 모든 결과를 함께 실행
+    processed, *parts = pl.collect_all([lf] + plans)
+    half = len(parts) // 2
+    if resample_pitch:
+        front_profiles = _ragged_profiles(*parts[:half], 'Avg Offset', resample_pitch)
+        down_profiles = _ragged_profiles(*parts[half:], 'y', resample_pitch)
+    else:
+        front_profiles = _fixed_grid_profiles(*parts[:half], 'Avg Offset')
+        down_profiles = _fixed_grid_profiles(*parts[half:], 'y')
+    return processed.to_pandas(), front_profiles, down_profiles
+
+
+if __name__ == '__main__':
+    # pandas / polars 백엔드 결과 비교 (가상 lot): python hump_polars.py [glass 수]
+    import io
+    import sys
+
+    import pandas as pd
+
+    from app_load_test import synthetic_lot
+    from hump_pipeline import analyze_lot
+
+    _require_polars()
+    frames = []
+    for i, (name, data) in enumerate(synthetic_lot(glasses=int(sys.argv[1]) if len(sys.argv) > 1 else 3)):
+        df = pd.read_csv(io.BytesIO(data))
+        if i % 7 == 0:
+            # 결측 값 / 중복 no (첫 행 사용) 포함
+            df.loc[df.index[::50], 'Avg Offset'] = np.nan
+            df = pd.concat([df, df.iloc[100:110].assign(**{'Avg Offset': 99.0})], ignore_index=True)
+        df['file'] = name
+        frames.append(df)
+    lot = pd.concat(frames, ignore_index=True)
+
+    cases = {
+        '기본': (lot, {}),
+        'pitch 컬럼 + auto 기준점': (lot.assign(pitch=5.0), {'baseline': 'auto'}),
+        '공통 그리드 리샘플링': (lot, {'resample_pitch': 8.0}),
+    }
+    for label, (df, options) in cases.items():
+        expected, _ = analyze_lot(df.copy(), backend='pandas', **options)
+        result, _ = analyze_lot(df.copy(), backend='polars', **options)
+        pd.testing.assert_frame_equal(result, expected)
+        print(f"✅ {label}: 결과 {len(result)}행 일치")
@@ -0,0 +1,576 @@
+"""
+hump 분석 HTTP 서비스 모듈
+자동화 / 다른 시스템이 화면 없이 lot 분석을 요청할 수 있는 로컬 HTTP 서버 (표준 라이브러리만 사용)
+
+    POST /lots               lot 제출 -> 202 {"job_id": ...}
+        - JSON {"paths": [...], "options": {...}, "select": {...}}: 서버 디스크의 파일 / glob 패턴 / 디렉터리
+          (파싱 전 사전 조회로 lot 구성을 바로 응답, select의 glass / cell / side / skip_duplicates에 맞는 파일만 분석)
+        - 본문이 .hparc 아카이브 (Content-Type: application/octet-stream), 옵션은 쿼리 문자열
+    GET  /lots/<id>          작업 상태 (queued / running / done / failed)
+    GET  /lots/<id>/result   분석 결과 JSON (?format=csv 이면 CSV)
+    GET  /health             작업자 / 대기열 상태
+
+분석은 정해진 수의 작업자 프로세스에서 실행하고, 실행 + 대기 작업이 한도를 넘으면
+503 + Retry-After로 거절해 요청이 몰려도 메모리 / CPU 사용량이 일정하게 유지됨
+경로 작업은 작업자당 메모리 예산으로 실행 계획을 세워 큰 lot은 glass 묶음별로 분석 (상태 응답의 plan)
+"""
+
+import io
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+from execution_plan import default_budget, execute_plan, parse_size, plan_execution
+from hump_pipeline import BACKENDS, analyze_lot, path_sources, resolve_paths
+from lot_manifest import LotManifest, manifest_sources
+from profile_archive import MAGIC, iter_archive
+from profile_validation import IngestReport
+
+DEFAULT_PORT = 8765
+MAX_UPLOAD_BYTES = 512 * 1024 * 1024
+BASELINES = ('fixed', 'auto')
+
+
+def parse_options(raw):
+    """요청 옵션 검사 -> analyze_lot 인자 (잘못된 값은 ValueError)"""
+    # 없을 때(None)만 기본값 - [] / 0 / "" 같은 객체가 아닌 값은 거부
+    raw = {} if raw is None else raw
+    if not isinstance(raw, dict):
+        raise ValueError("options는 옵션 이름 -> 값 객체여야 합니다.")
+    unknown = set(raw) - {'baseline', 'resample_pitch', 'smoothing', 'golden', 'backend'}
+    if unknown:
+        raise ValueError(f"알 수 없는 옵션: {sorted(unknown)}")
+
+    options = {'baseline': raw.get('baseline') or 'fixed'}
+    if options['baseline'] not in BASELINES:
+        raise ValueError(f"baseline은 {BASELINES} 중 하나여야 합니다.")
+    pitch = raw.get('resample_pitch')
+    try:
+        options['resample_pitch'] = float(pitch) if pitch not in (None, '') else None
+    except (TypeError, ValueError):
+        raise ValueError(f"resample_pitch는 숫자여야 합니다: {pitch!r}")
+    if options['resample_pitch'] is not None and options['resample_pitch'] <= 0:
+        raise ValueError("resample_pitch는 0보다 커야 합니다.")
+    smoothing = raw.get('smoothing')
+    if smoothing is not None and not isinstance(smoothing, dict):
+        raise ValueError("smoothing은 side별 설정 객체여야 합니다.")
+    options['smoothing'] = smoothing or None
+    options['golden'] = raw.get('golden') or None
+    options['backend'] = raw.get('backend') or 'pandas'
+    if options['backend'] not in BACKENDS:
+        raise ValueError(f"backend는 {BACKENDS} 중 하나여야 합니다.")
+    return options
+
+
+def parse_selection(raw):
+    """파일 선택 조건 검사 -> LotManifest.select 인자"""
+    raw = {} if raw is None else raw
+    if not isinstance(raw, dict):
+        raise ValueError("select는 glass / cell / side / skip_duplicates 객체여야 합니다.")
+    unknown = set(raw) - {'glass', 'cell', 'side', 'skip_duplicates'}
+    if unknown:
+        raise ValueError(f"알 수 없는 선택 조건: {sorted(unknown)}")
+    return {key: value for key, value in raw.items() if value is not None}
+
+
+def run_job(files=None, archive=None, options=None, selection=None, plan=None):
+    """작업자에서 실행되는 lot 하나의 로드 + 품질 검사 + 분석
+
+    selection: 사전 조회(LotManifest.select) 결과 - 있으면 선택된 파일만 파싱
+    plan: 메모리 예산 실행 계획 - chunked / spill이면 lot을 합치지 않고 glass 묶음별로 읽어 분석
+    """
+    options = options or {}
+    started = time.time()
+    golden = options.get('golden')
+    messages = []
+    if plan is not None and plan.mode != 'memory':
+        report = IngestReport()
+        result, processed, _ = execute_plan(
+            plan,
+            smoothing=options.get('smoothing'),
+            baseline=options.get('baseline', 'fixed'),
+            resample_pitch=options.get('resample_pitch'),
+            golden=pd.read_csv(golden) if golden else None,
+            log=lambda level, message: messages.append({'level': level, 'message': message}),
+            report=report
+        )
+        if len(report) == 0:
+            raise ValueError("분석할 파일이 없습니다.")
+        points = int(report.to_frame()['rows'].sum())
+        if hasattr(processed, 'cleanup'):
+            processed.cleanup()
+        return {
+            'result': result,
+            'messages': messages,
+            'ingest': report.summary(),
+            'files': len(report),
+            'points': points,
+            'started': started,
+            'elapsed': round(time.time() - started, 3),
+        }
+
+    if archive is not None:
+        sources = iter_archive(io.BytesIO(archive))
+    elif selection is not None:
+        sources = manifest_sources(selection)
+    else:
+        sources = path_sources(files)
+
+    report = IngestReport()
+    dataframes = []
+    for filename, df in sources:
+        report.add(filename, df)
+        df['file'] = filename
+        dataframes.append(df)
+    if not dataframes:
+        raise ValueError("분석할 파일이 없습니다.")
+    df_combined = pd.concat(dataframes, ignore_index=True)
+
+    result, _ = analyze_lot(
+        df_combined,
+        smoothing=options.get('smoothing'),
+        baseline=options.get('baseline', 'fixed'),
+        resample_pitch=options.get('resample_pitch'),
+        golden=pd.read_csv(golden) if golden else None,
+        log=lambda level, message: messages.append({'level': level, 'message': message}),
+        backend=options.get('backend', 'pandas')
+    )
+    return {
+        'result': result,
+        'messages': messages,
+        'ingest': report.summary(),
+        'files': len(report),
+        'points': len(df_combined),
+        'started': started,
+        'elapsed': round(time.time() - started, 3),
+    }
+
+
+class AnalysisService:
+    """작업 저장소 + 고정 크기 작업자 풀
+
+    workers: 동시에 분석하는 lot 수, queue_size: 작업자를 기다릴 수 있는 lot 수
+    processes=False면 스레드로 실행 (디버깅 / 작은 lot용)
+    keep_jobs: 보관하는 끝난 작업 수 (넘으면 오래된 것부터 삭제)
+    memory_budget: 작업자 하나의 메모리 예산 (byte 수 또는 '2GB', 없으면 default_budget()을 작업자 수로 나눈 값)
+    """
+
+    def __init__(self, workers=2, queue_size=8, processes=True, keep_jobs=500, memory_budget=None):
+        self.workers = max(int(workers), 1)
+        self.queue_size = max(int(queue_size), 0)
+        self.keep_jobs = keep_jobs
+        self.memory_budget = (parse_size(memory_budget) if memory_budget is not None
+                              else default_budget() // self.workers)
+        pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        self.executor = pool(max_workers=self.workers)
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+        self._lock = threading.Lock()
+        self.jobs = OrderedDict()
+        self._futures = {}
+        self._elapsed = []
+
+    def reserve(self):
+        """작업 자리 하나를 미리 확보 (없으면 False) - submit(reserved=True)로 쓰거나 release()로 반환"""
+        return self._slots.acquire(blocking=False)
+
+    def release(self):
+        self._slots.release()
+
+    def submit(self, files=None, archive=None, options=None, selection=None, manifest=None, plan=None,
+               reserved=False):
+        """작업 등록 - 자리가 없으면 None (호출 측에서 503 처리)
+
+        selection / manifest: 경로 작업의 사전 조회 결과 (선택된 파일 행, lot 구성 요약)
+        plan: 경로 작업의 메모리 예산 실행 계획 (execution_plan.plan_execution)
+        reserved: reserve()로 이미 확보한 자리를 사용 (실패하면 자리도 반환)
+        """
+        if not reserved and not self.reserve():
+            return None
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            'job_id': job_id,
+            'status': 'queued',
+            'submitted': time.time(),
+            'source': 'archive' if archive is not None else 'paths',
+            'files': len(selection) if selection is not None else (len(files) if files is not None else None),
+        }
+        if manifest is not None:
+            job['manifest'] = manifest
+        if plan is not None:
+            job['plan'] = plan.to_dict()
+        with self._lock:
+            self.jobs[job_id] = job
+        try:
+            future = self.executor.submit(run_job, files, archive, options, selection, plan)
+        except Exception:
+            with self._lock:
+                self.jobs.pop(job_id, None)
+            self._slots.release()
+            raise
+        with self._lock:
+            self._futures[job_id] = future
+        future.add_done_callback(lambda done: self._finish(job_id, done))
+        return dict(job)
+
+    def _finish(self, job_id, future):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            self._futures.pop(job_id, None)
+            if job is not None:
+                job['finished'] = time.time()
+                try:
+                    output = future.result()
+                except Exception as e:
+                    job.update(status='failed', error=str(e))
+                else:
+                    job.update({key: output[key] for key in ('messages', 'ingest', 'files', 'points', 'started', 'elapsed')})
+                    if len(output['result']) > 0:
+                        job.update(status='done', result=output['result'])
+                    else:
+                        errors = [m['message'] for m in output['messages'] if m['level'] == 'error']
+                        job.update(status='failed', error=' / '.join(errors) or "분석 결과가 없습니다.")
+                    self._elapsed = (self._elapsed + [output['elapsed']])[-50:]
+            self._evict()
+        self._slots.release()
+
+    def _evict(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job['status'] in ('done', 'failed')]
+        for job_id in finished[:max(len(finished) - self.keep_jobs, 0)]:
+            del self.jobs[job_id]
+
+    def status(self, job_id):
+        """작업 상태 (결과 DataFrame 제외) - 없는 작업이면 None"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            future = self._futures.get(job_id)
+            if job['status'] == 'queued' and future is not None and future.running():
+                job['status'] = 'running'
+            status = {key: value for key, value in job.items() if key != 'result'}
+        if 'result' in job:
+            status['results'] = len(job['result'])
+        return status
+
+    def result(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return None if job is None else job.get('result')
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+        return {'workers': self.workers, 'queue_size': self.queue_size, 'memory_budget': self.memory_budget,
+                'jobs': counts}
+
+    def retry_after(self):
+        """대기 중인 작업이 빠질 때까지 예상 시간 [초] (최근 작업 평균 소요 시간 기준)"""
+        with self._lock:
+            pending = sum(job['status'] in ('queued', 'running') for job in self.jobs.values())
+            average = sum(self._elapsed) / len(self._elapsed) if self._elapsed else 1.0
+        return max(1, math.ceil(average * pending / self.workers))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """AnalysisService를 HTTP로 노출 (server.service, server.roots 사용)"""
+
+    server_version = 'HumpService/1.0'
+    quiet = False
+
+    def _send(self, code, body, content_type, headers=None):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, code, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        self._send(code, body, 'application/json; charset=utf-8', headers)
+
+    def _route(self):
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        return parts, {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+    def _send_busy(self):
+        retry = self.server.service.retry_after()
+        return self._send_json(503, {'error': '대기열이 가득 찼습니다.', 'retry_after': retry},
+                               headers={'Retry-After': str(retry)})
+
+    def _allowed(self, files):
+        roots = self.server.roots
+        if not roots:
+            return True
+        for path in files:
+            real = os.path.realpath(path)
+            if not any(os.path.commonpath([real, root]) == root for root in roots):
+                return False
+        return True
+
+    def do_POST(self):
+        parts, query = self._route()
+        if parts != ['lots']:
+            return self._send_json(404, {'error': '없는 경로입니다.'})
+
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            return self._send_json(400, {'error': 'Content-Length가 올바르지 않습니다.'})
+        if length > MAX_UPLOAD_BYTES:
+            return self._send_json(413, {'error': f"본문이 너무 큽니다 (최대 {MAX_UPLOAD_BYTES:,} bytes)."})
+
+        # 본문을 읽기 전에 작업 자리부터 확보 - 업로드가 몰려도 메모리에 올리는 본문은 작업 한도까지만
+        service = self.server.service
+        if not service.reserve():
+            return self._send_busy()
+        submitted = False
+        files, archive, selection, manifest, plan = None, None, None, None, None
+        try:
+            body = self.rfile.read(length)
+            if self.headers.get('Content-Type', '').startswith('application/json'):
+                payload = json.loads(body or b'{}')
+                if not isinstance(payload, dict):
+                    raise ValueError("JSON 본문은 {\"paths\": [...], \"options\": {...}} 객체여야 합니다.")
+                paths = payload.get('paths') or []
+                paths = [paths] if isinstance(paths, str) else paths
+                if not isinstance(paths, list) or not all(isinstance(path, str) for path in paths):
+                    raise ValueError("paths는 경로 문자열 목록이어야 합니다.")
+                options = parse_options(payload.get('options'))
+                files = [str(path) for path in resolve_paths(*paths)]
+                if not files:
+                    raise ValueError("경로에서 CSV/.hparc 파일을 찾을 수 없습니다.")
+                if not self._allowed(files):
+                    return self._send_json(403, {'error': '허용된 디렉터리 밖의 경로입니다.'})
+                # 파싱 전에 파일명 / 첫 행만 읽어 lot 구성 확인, 선택 조건에 맞는 파일만 작업자에 넘김
+                lot = LotManifest.scan(files)
+                selection = lot.select(**parse_selection(payload.get('select')))
+                if selection.empty:
+                    raise ValueError("선택 조건에 맞는 파일이 없습니다.")
+                selection = selection.drop(columns=['status', 'issues'])
+                manifest = lot.summary()
+                # 작업자 메모리 예산을 넘는 lot은 glass 묶음별로 분석 (chunked / spill)
+                plan = plan_execution(
+                    lot, frame=selection, budget=self.server.service.memory_budget,
+                    backend=options['backend'], resample_pitch=options['resample_pitch']
+                )
+            else:
+                if not body.startswith(MAGIC):
+                    raise ValueError("JSON 요청 또는 .hparc 아카이브 본문이 필요합니다.")
+                archive = body
+                options = parse_options(query)
+            if options['golden'] and not self._allowed([options['golden']]):
+                return self._send_json(403, {'error': '허용된 디렉터리 밖의 golden 경로입니다.'})
+            # 이후 실패는 submit이 자리를 반환
+            submitted = True
+            job = service.submit(files=files, archive=archive, options=options, selection=selection,
+                                 manifest=manifest, plan=plan, reserved=True)
+        except (ValueError, TypeError) as e:
+            return self._send_json(400, {'error': str(e)})
+        except OSError as e:
+            return self._send_json(400, {'error': f"파일을 읽을 수 없습니다: {e}"})
+        except Exception as e:
+            # 사전 조회 / 실행 계획 / 종료 중 submit(RuntimeError) 등 - 연결을 끊지 않고 JSON 오류로 응답
+            return self._send_json(500, {'error': f"요청 처리 중 오류: {e}"})
+        finally:
+            if not submitted:
+                service.release()
+        self._send_json(202, job, headers={'Location': f"/lots/{job['job_id']}"})
+
+    def do_GET(self):
+        parts, query = self._route()
+        service = self.server.service
+        if parts == ['health']:
+            return self._send_json(200, service.stats())
+        if len(parts) not in (2, 3) or parts[0] != 'lots' or (len(parts) == 3 and parts[2] != 'result'):
+            return self._send_json(404, {'error': '없는 경로입니다.'})
+
+        status = service.status(parts[1])
+        if status is None:
+            return self._send_json(404, {'error': '없는 작업입니다.'})
+        if len(parts) == 2:
+            return self._send_json(200, status)
+
+        if status['status'] == 'failed':
+            return self._send_json(422, status)
+        result = service.result(parts[1])
+        if result is None:
+            return self._send_json(409, status, headers={'Retry-After': '1'})
+        if query.get('format') == 'csv':
+            return self._send(200, result.to_csv(index=False).encode('utf-8'), 'text/csv; charset=utf-8')
+        status['result'] = json.loads(result.to_json(orient='records', force_ascii=False))
+        self._send_json(200, status)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(host='127.0.0.1', port=DEFAULT_PORT, workers=2, queue_size=8, processes=True, roots=None,
+                quiet=False, memory_budget=None):
+    """서비스 + HTTP 서버 생성 (serve_forever()로 실행, 끝나면 server.service.shutdown())"""
+    handler = type('Handler', (ServiceHandler,), {'quiet': quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.service = AnalysisService(workers=workers, queue_size=queue_size, processes=processes,
+                                     memory_budget=memory_budget)
+    server.roots = [os.path.realpath(os.path.expanduser(root)) for root in roots or []]
+    return server
+
+
+def _request(method, url, body=None, content_type=None):
+    from urllib.error import HTTPError
+    from urllib.request import Request, urlopen
+
+    request = Request(url, data=body, method=method)
+    if content_type:
+        request.add_header('Content-Type', content_type)
+    try:
+        with urlopen(request) as response:
+            return response.status, dict(response.headers), response.read()
+    except HTTPError as e:
+        return e.code, dict(e.headers), e.read()
+
+
+def benchmark(url, source, lots=20, concurrency=4, poll=0.05, options=None):
+    """lot을 동시에 제출하고 끝날 때까지 기다려 처리량(lots/분) / 지연 시간 측정
+
+    source가 .hparc 파일이면 아카이브 업로드, 아니면 경로 JSON으로 제출
+    """
+    if str(source).lower().endswith('.hparc'):
+        with open(source, 'rb') as f:
+            body, content_type = f.read(), 'application/octet-stream'
+        query = '?' + '&'.join(f"{key}={value}" for key, value in (options or {}).items()) if options else ''
+    else:
+        body = json.dumps({'paths': [str(source)], 'options': options or {}}).encode('utf-8')
+        content_type, query = 'application/json', ''
+
+    counter = iter(range(lots))
+    counter_lock = threading.Lock()
+    latencies, failures, rejected = [], [], [0]
+
+    def client():
+        while True:
+            with counter_lock:
+                if next(counter, None) is None:
+                    return
+            start = time.perf_counter()
+            while True:
+                code, headers, payload = _request('POST', f"{url}/lots{query}", body, content_type)
+                if code != 503:
+                    break
+                with counter_lock:
+                    rejected[0] += 1
+                time.sleep(min(float(headers.get('Retry-After', 1)), 1.0))
+            if code != 202:
+                failures.append(payload.decode('utf-8', 'replace'))
+                continue
+            job_id = json.loads(payload)['job_id']
+            while True:
+                _, _, payload = _request('GET', f"{url}/lots/{job_id}")
+                status = json.loads(payload)
+                if status['status'] in ('done', 'failed'):
+                    break
+                time.sleep(poll)
+            if status['status'] == 'failed':
+                failures.append(status.get('error'))
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+
+    def percentile(q):
+        return latencies[min(int(q * len(latencies)), len(latencies) - 1)] if latencies else float('nan')
+
+    return {
+        'lots': lots,
+        'completed': len(latencies),
+        'failed': len(failures),
+        'rejected_503': rejected[0],
+        'wall_s': round(wall, 2),
+        'lots_per_min': round(len(latencies) / wall * 60, 1) if wall > 0 else float('nan'),
+        'latency_p50_s': round(percentile(0.5), 3),
+        'latency_p95_s': round(percentile(0.95), 3),
+        'errors': failures[:3],
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="hump lot 분석 HTTP 서비스")
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('serve', "서비스 실행"), ('bench', "동시 제출 처리량 측정")):
+        command = sub.add_parser(name, help=help_text)
+        command.add_argument('--host', default='127.0.0.1')
+        command.add_argument('--port', type=int, default=DEFAULT_PORT if name == 'serve' else 0)
+        command.add_argument('--workers', type=int, default=max((os.cpu_count() or 2) // 2, 1))
+        command.add_argument('--queue', type=int, default=8, help="작업자를 기다릴 수 있는 lot 수")
+        command.add_argument('--threads', action='store_true', help="프로세스 대신 스레드 작업자 사용")
+        command.add_argument('--root', action='append', help="읽기를 허용할 디렉터리 (여러 번 지정 가능)")
+        command.add_argument('--memory-budget', help="작업자당 메모리 예산 (예: 2GB, 기본: 사용 가능 메모리의 절반 / 작업자 수)")
+    bench = sub.choices['bench']
+    bench.add_argument('source', help="lot 디렉터리 / glob / .hparc 파일")
+    bench.add_argument('--lots', type=int, default=20)
+    bench.add_argument('--concurrency', type=int, default=4)
+    bench.add_argument('--url', help="이미 실행 중인 서비스 주소 (없으면 내부에서 서버 실행)")
+    bench.add_argument('--baseline', choices=BASELINES, default='fixed')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        server = make_server(args.host, args.port, args.workers, args.queue, not args.threads, args.root,
+                             memory_budget=args.memory_budget)
+        print(f"🚀 hump 분석 서비스 실행: http://{args.host}:{server.server_port} "
+              f"(작업자 {args.workers}, 대기열 {args.queue}, 작업자당 메모리 예산 {args.memory_budget or '자동'})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            server.service.shutdown()
+    else:
+        server = None
+        url = args.url
+        if url is None:
+            server = make_server(args.host, args.port, args.workers, args.queue, not args.threads, args.root,
+                                 quiet=True, memory_budget=args.memory_budget)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            url = f"http://{args.host}:{server.server_port}"
+        try:
+            stats = benchmark(url.rstrip('/'), args.source, lots=args.lots, concurrency=args.concurrency,
+                              options={'baseline': args.baseline})
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+                server.service.shutdown()
+        print(f"📊 {stats['completed']}/{stats['lots']} lot 완료 ({stats['wall_s']}초) - "
+              f"{stats['lots_per_min']} lots/분, 지연 p50 {stats['latency_p50_s']}초 / "
+              f"p95 {stats['latency_p95_s']}초, 503 거절 {stats['rejected_503']}회, 실패 {stats['failed']}개")
+        for error in stats['errors']:
+            print(f"❌ {error}")
@@ -0,0 +1,326 @@
+"""
+lot 구성 사전 조회(manifest) 모듈
+CSV 전체를 파싱하기 전에 파일명 / 크기 / 앞부분(헤더 + 첫 데이터 행)만 읽어
+glass × cell × side 구성, 예상 행 수, 중복 / 누락 side를 바로 파악
+.hparc 아카이브는 본문을 풀지 않고 헤더의 파일별 메타데이터만 사용
+
+로드 전에 lot 구조를 보여주고, 읽을 파일을 고르거나(건너뛰기) 묶음 단위로 나누는 데 사용
+"""
+
+import csv
+import io
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from hump_pipeline import extract_position_from_file, position_to_side, source_names
+from profile_archive import is_archive, iter_archive, read_archive_header
+from profile_validation import COLUMN_ALIASES, MIN_ROWS_FIXED_BASELINE, VALID_POSITIONS
+
+HEAD_BYTES = 16 * 1024
+SIDES = ['Left', 'Right', 'Top', 'Down']
+
+
+def _read_head(source, size):
+    """파일 앞부분 size 바이트 (파일 객체는 원래 위치로 되돌림)"""
+    if isinstance(source, (str, Path)):
+        with open(source, 'rb') as handle:
+            return handle.read(size)
+    start = source.tell()
+    try:
+        return source.read(size)
+    finally:
+        source.seek(start)
+
+
+def _source_size(source):
+    if isinstance(source, (str, Path)):
+        return os.path.getsize(source)
+    size = getattr(source, 'size', None)
+    if size is not None:
+        return size
+    start = source.tell()
+    size = source.seek(0, io.SEEK_END)
+    source.seek(start)
+    return size
+
+
+def _count_rows(source, block=1 << 20):
+    """줄바꿈 수로 데이터 행 수 계산 (파싱 없이 바이트만 스캔)"""
+    lines, last = 0, b'\n'
+    handle = open(source, 'rb') if isinstance(source, (str, Path)) else source
+    start = None if handle is not source else source.tell()
+    try:
+        while True:
+            chunk = handle.read(block)
+            if not chunk:
+                break
+            lines += chunk.count(b'\n')
+            last = chunk[-1:]
+    finally:
+        if start is None:
+            handle.close()
+        else:
+            source.seek(start)
+    return max(lines + (last != b'\n') - 1, 0)
+
+
+def _estimate_rows(head, size):
+    """앞부분 데이터 행 평균 길이로 전체 데이터 행 수 추정"""
+    lines = head.split(b'\n')
+    complete = [line for line in lines[1:-1] if line.strip()]
+    if not complete:
+        return 0
+    mean_length = np.mean([len(line) + 1 for line in complete])
+    return int(round((size - len(lines[0]) - 1) / mean_length))
+
+
+def _first_value(columns, column, pick):
+    """대안 컬럼명 중 첫 번째로 있는 컬럼의 첫 행 값"""
+    for alias in COLUMN_ALIASES[column]:
+        if alias in columns:
+            value = pick(alias)
+            return None if value is None or pd.isna(value) else str(value)
+    return None
+
+
+def scan_csv(source, name=None, exact=False):
+    """CSV 하나의 manifest 행 (헤더 + 첫 데이터 행만 파싱)
+
+    source: 경로 또는 파일 객체(업로드 파일 등), exact: True면 줄바꿈을 세어 정확한 행 수 (파싱보다 훨씬 빠름)
+    """
+    name = name or Path(getattr(source, 'name', str(source))).name
+    row = {'file': name, 'source': source}
+    try:
+        size = _source_size(source)
+        head = _read_head(source, HEAD_BYTES)
+        # pandas 파서는 파일마다 준비 비용이 커서 헤더 + 첫 데이터 행은 csv 모듈로 직접 파싱
+        lines = csv.reader(head.decode('utf-8-sig', errors='replace').splitlines()[:2])
+        header = next(lines, [])
+        first = next(lines, [])
+    except Exception as e:
+        row.update(bytes=None, rows=None, exact=False, issues=f'unreadable: {e}')
+        return row
+
+    if not header:
+        row.update(bytes=size, rows=0, exact=True)
+        return row
+    whole = len(head) >= size
+    row['bytes'] = size
+    row['columns'] = len(header)
+    row['rows'] = _count_rows(source) if exact or whole else _estimate_rows(head, size)
+    row['exact'] = bool(exact or whole)
+    values = {column: value or None for column, value in zip(header, first)}
+    row['glass'] = _first_value(header, 'Glass ID', values.get)
+    cell = _first_value(header, 'CELL ID', values.get)
+    row['cell'] = cell[-3:] if cell is not None else None
+    return row
+
+
+def scan_archive(source, name=None):
+    """.hparc 아카이브의 파일별 manifest 행 (헤더만 읽음, 행 수는 정확)"""
+    name = name or Path(getattr(source, 'name', str(source))).name
+    try:
+        header = read_archive_header(source)
+    except Exception as e:
+        return [{'file': name, 'source': source, 'archive': name, 'issues': f'unreadable: {e}'}]
+
+    rows = []
+    for entry in header['files']:
+        specs = dict(entry['columns'])
+
+        def pick(alias):
+            spec = specs[alias]
+            if spec['kind'] == 'const':
+                return spec['value']
+            if spec['kind'] == 'list':
+                return spec['values'][0] if spec['values'] else None
+            # 숫자 배열은 본문을 풀어야 하므로 생략
+            return None
+
+        cell = _first_value(specs, 'CELL ID', pick)
+        rows.append({
+            'file': entry['file'], 'source': source, 'archive': name, 'bytes': None,
+            'columns': len(specs), 'rows': entry['rows'], 'exact': True,
+            'glass': _first_value(specs, 'Glass ID', pick), 'cell': cell[-3:] if cell is not None else None,
+        })
+    return rows
+
+
+class LotManifest:
+    """lot 파일 목록의 구성 요약
+
+    사용 예:
+        manifest = LotManifest.scan(resolve_paths('/data/lot01'))
+        manifest.summary(); manifest.coverage(); manifest.missing_sides()
+        files = manifest.select(side=['Top', 'Down'], skip_duplicates=True)
+    """
+
+    COLUMNS = ['file', 'status', 'issues', 'glass', 'cell', 'position', 'side', 'rows', 'exact', 'bytes',
+               'columns', 'archive']
+
+    def __init__(self, rows, truncation_ratio=0.9):
+        self.rows = list(rows)
+        self.truncation_ratio = truncation_ratio
+        self._frame = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    @classmethod
+    def scan(cls, sources, exact=False, **kwargs):
+        """경로 또는 파일 객체(name 속성) 목록을 훑어 manifest 생성 (.hparc는 헤더만)"""
+        sources = list(sources)
+        # 디스크 파일은 공통 상위 폴더 기준 상대 경로로 (하위 폴더의 같은 파일명끼리 겹치지 않도록)
+        names = source_names(source for source in sources if isinstance(source, (str, Path)))
+        rows = []
+        for source in sources:
+            if isinstance(source, (str, Path)):
+                name = names[source]
+            else:
+                name = Path(getattr(source, 'name', str(source))).name
+            if is_archive(name):
+                rows.extend(scan_archive(source, name))
+            else:
+                rows.append(scan_csv(source, name, exact=exact))
+        return cls(rows, **kwargs)
+
+    def to_frame(self):
+        """파일별 manifest (IngestReport와 같은 문제 코드 / 상태)"""
+        if self._frame is not None:
+            return self._frame
+        frame = pd.DataFrame(self.rows).reindex(columns=self.COLUMNS + ['source'])
+        if frame.empty:
+            self._frame = frame
+            return frame
+
+        frame['position'] = frame['file'].map(extract_position_from_file)
+        frame['side'] = frame['position'].map(position_to_side)
+        rows = pd.to_numeric(frame['rows'], errors='coerce')
+        issues = [[] for _ in range(len(frame))]
+        errors = [False] * len(frame)
+
+        typical = rows.groupby(frame['position']).transform('median')
+        truncated = (rows < typical * self.truncation_ratio).to_numpy()
+        short = (frame['position'].isin(['1', '2', '3']) & (rows > 0) & (rows < MIN_ROWS_FIXED_BASELINE)).to_numpy()
+        duplicated = (
+            frame.duplicated(subset=['glass', 'cell', 'position'], keep=False) & frame['glass'].notna()
+        ).to_numpy()
+        for i, (file, position, note) in enumerate(zip(frame['file'], frame['position'], frame['issues'])):
+            if isinstance(note, str) and note:
+                issues[i].append(note)
+                errors[i] = True
+            # position과 같이 하위 폴더 경로를 뺀 파일명 부분 기준
+            if len(str(file).replace('\\', '/').rsplit('/', 1)[-1]) < 13:
+                issues[i].append('filename_short')
+                errors[i] = True
+            elif position not in VALID_POSITIONS:
+                issues[i].append('position_invalid')
+                errors[i] = True
+            if rows.iloc[i] == 0:
+                issues[i].append('empty')
+                errors[i] = True
+            if duplicated[i]:
+                issues[i].append('duplicate_profile')
+                errors[i] = True
+            if truncated[i]:
+                issues[i].append('truncated')
+            if short[i]:
+                issues[i].append('short_for_fixed_baseline')
+
+        frame['issues'] = [', '.join(items) for items in issues]
+        frame['status'] = np.where(errors, 'ERROR', np.where(frame['issues'] != '', 'WARN', 'OK'))
+        self._frame = frame
+        return frame
+
+    def coverage(self):
+        """(glass, cell)별 side 파일 수 + 누락 side"""
+        frame = self.to_frame()
+        if frame.empty:
+            return pd.DataFrame(columns=['glass', 'cell'] + SIDES + ['missing'])
+        known = frame.dropna(subset=['glass', 'cell'])
+        table = pd.crosstab([known['glass'], known['cell']], known['side'])
+        table = table.reindex(columns=SIDES + sorted(set(table.columns) - set(SIDES)), fill_value=0)
+        table['missing'] = [
+            ', '.join(side for side in SIDES if counts[side] == 0) for _, counts in table.iterrows()
+        ]
+        return table.reset_index()
+
+    def missing_sides(self):
+        """side가 하나라도 빠진 (glass, cell)"""
+        coverage = self.coverage()
+        return coverage[coverage['missing'] != ''].reset_index(drop=True)
+
+    def duplicates(self):
+        """같은 (glass, cell, position) 프로파일이 여러 파일에 있는 경우"""
+        frame = self.to_frame()
+        return frame[frame['issues'].str.contains('duplicate_profile', regex=False)]
+
+    def summary(self):
+        """lot 구성 요약 (파일 / glass / cell / 예상 행 수 / 누락 / 중복 / 상태별 파일 수)"""
+        frame = self.to_frame()
+        coverage = self.coverage()
+        return {
+            'files': len(frame),
+            'glasses': int(frame['glass'].nunique()),
+            'cells': int(frame['cell'].nunique()),
+            'profiles': int(len(frame.drop_duplicates(subset=['glass', 'cell', 'position']))),
+            'rows': int(pd.to_numeric(frame['rows'], errors='coerce').sum()),
+            'bytes': int(pd.to_numeric(frame['bytes'], errors='coerce').sum()),
+            'incomplete_cells': int((coverage['missing'] != '').sum()),
+            'duplicate_files': len(self.duplicates()),
+            **{status.lower(): int((frame['status'] == status).sum()) for status in ('OK', 'WARN', 'ERROR')},
+        }
+
+    def select(self, glass=None, cell=None, side=None, skip_duplicates=False):
+        """조건에 맞는 파일 manifest 행 (값 또는 목록, 중복 프로파일은 첫 파일만 남길 수 있음)"""
+        frame = self.to_frame()
+        mask = pd.Series(True, index=frame.index)
+        for column, value in (('glass', glass), ('cell', cell), ('side', side)):
+            if value is not None:
+                values = [value] if isinstance(value, str) else list(value)
+                mask &= frame[column].astype(str).isin([str(v) for v in values])
+        selected = frame[mask]
+        if skip_duplicates:
+            keyed = selected['glass'].notna()
+            selected = selected[~(selected.duplicated(subset=['glass', 'cell', 'position']) & keyed)]
+        return selected
+
+    def batches(self, max_rows=500_000, frame=None):
+        """glass 단위로 묶어 batch당 예상 행 수가 max_rows 이하가 되도록 나눈 manifest 행 목록
+
+        한 glass의 파일은 가능한 같은 batch에 두어 batch별 분석 결과를 glass 단위로 합칠 수 있게 함
+        """
+        frame = self.to_frame() if frame is None else frame
+        batches, current, current_rows = [], [], 0
+        rows = pd.to_numeric(frame['rows'], errors='coerce').fillna(0)
+        for _, group in frame.groupby(frame['glass'].fillna(''), sort=True):
+            group_rows = int(rows[group.index].sum())
+            if current and current_rows + group_rows > max_rows:
+                batches.append(pd.concat(current))
+                current, current_rows = [], 0
+            current.append(group)
+            current_rows += group_rows
+        if current:
+            batches.append(pd.concat(current))
+        return batches
+
+
+def manifest_sources(selected):
+    """select() 결과 행의 (파일명, DataFrame) - 선택한 파일만 파싱 (아카이브는 선택한 항목만 복원, 순서 유지)"""
+    done = set()
+    for _, row in selected.iterrows():
+        source = row['source']
+        if not isinstance(source, (str, Path)):
+            source.seek(0)
+        if pd.isna(row['archive']):
+            # 0바이트 파일은 파싱할 수 없으므로 건너뜀 (manifest에 'empty'로 표시됨)
+            if row['bytes'] == 0:
+                continue
+            yield row['file'], pd.read_csv(source, memory_map=isinstance(source, (str, Path)))
+        elif row['archive'] not in done:
+            done.add(row['archive'])
+            names = set(selected.loc[selected['archive'] == row['archive'], 'file'])
+            yield from iter_archive(source, names=names)
@@ -0,0 +1,472 @@
+"""
+공유 파일 시스템 작업 대기열로 여러 노드에서 lot 일괄 분석
+월말 재처리처럼 원본 보관소 전체를 다시 분석할 때 coordinator가 lot 폴더를 대기열 디렉터리에 넣으면
+여러 노드의 작업자가 lot을 하나씩 가져가(lease) 분석하고 결과를 원자적으로 기록, 마지막에 결과 테이블 하나로 병합
+- 상태는 디렉터리로 표현: todo/ → doing/ → done/ (또는 failed/), 상태 변경은 같은 파일 시스템 안의 rename (원자적)
+- lease: doing/ 작업 파일의 변경 시각 (작업자가 주기적으로 갱신), 만료되면 시도 횟수를 올려 todo/로 되돌림
+- 시각은 공유 파일 시스템 기준 (.clock 파일을 갱신해 읽음) - 노드 간 시계 차이 영향 없음
+- 결과는 임시 파일에 쓴 뒤 os.replace로 교체 - 같은 lot이 두 번 분석돼도 같은 결과로 덮어쓸 뿐 (at-least-once)
+
+python lot_queue.py enqueue /shared/q /archive/2024-06 --children --baseline auto
+python lot_queue.py work /shared/q --processes 4       # 노드마다 실행
+python lot_queue.py status /shared/q
+python lot_queue.py merge /shared/q month_end.parquet
+"""
+
+import hashlib
+import json
+import os
+import re
+import socket
+import threading
+import time
+import traceback
+from pathlib import Path
+
+import pandas as pd
+
+from execution_plan import default_budget, parse_size, plan_execution
+from hump_pipeline import resolve_paths
+from hump_service import parse_options, run_job
+from lot_manifest import LotManifest
+from result_export import pq, write_parquet, write_xlsx
+
+STATES = ('todo', 'doing', 'done', 'failed')
+LEASE_SECONDS = 600
+MAX_ATTEMPTS = 3
+
+
+def lot_id(path):
+    """lot 폴더 -> 대기열 안의 이름 (폴더명 + 전체 경로 해시, 같은 이름의 다른 폴더와 구분)"""
+    real = os.path.realpath(os.path.expanduser(str(path)))
+    name = re.sub(r'[^A-Za-z0-9_.-]', '_', Path(real).name) or 'lot'
+    return f"{name}-{hashlib.sha1(real.encode('utf-8')).hexdigest()[:8]}"
+
+
+def worker_name():
+    """기본 작업자 이름 (호스트-pid)"""
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', f"{socket.gethostname()}-{os.getpid()}")
+
+
+def _atomic_write(path, write, suffix=''):
+    """같은 디렉터리의 임시 파일에 write(임시 경로)로 쓴 뒤 교체 (읽는 쪽은 완성된 파일만 봄)"""
+    tmp = f"{path}.{worker_name()}{suffix}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _write_json(path, data):
+    def write(tmp):
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1, default=str)
+    _atomic_write(path, write)
+
+
+def _read_json(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _parse_task(filename):
+    """'lot~시도[~작업자].json' -> (lot, 시도, 작업자)"""
+    parts = filename[:-len('.json')].split('~')
+    return parts[0], int(parts[1]), parts[2] if len(parts) > 2 else None
+
+
+class Lease:
+    """작업자가 가져간 lot 하나 (doing/ 파일을 가진 동안 유효)"""
+
+    def __init__(self, queue, path, worker):
+        self.queue = queue
+        self.path = path
+        self.worker = worker
+        self.lot, self.attempt, _ = _parse_task(os.path.basename(path))
+        self.task = _read_json(path)
+
+    def renew(self):
+        """lease 갱신 - 이미 만료되어 다른 작업자에게 넘어갔으면 False"""
+        try:
+            os.utime(self.path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def complete(self, result, meta):
+        """결과 -> results/, 요약 -> done/ 순서로 기록 (done이 있으면 결과도 있음)"""
+        self.queue.write_result(self.lot, result)
+        _write_json(self.queue.path('done', f"{self.lot}.json"), dict(self.task, attempt=self.attempt,
+                                                                       worker=self.worker, **meta))
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def fail(self, error):
+        """실패 기록 후 다시 시도하도록 todo/로 (시도 횟수를 다 쓰면 failed/로) - failed/로 끝났으면 True"""
+        moved = self.queue.retry(self.path, error)
+        return moved and self.attempt + 1 >= self.queue.max_attempts
+
+
+class LotQueue:
+    """공유 디렉터리의 lot 작업 대기열
+
+    directory: 모든 노드가 같은 경로로 보는 디렉터리 (NFS 등, 한 대에서는 로컬 디렉터리)
+    queue.json에 분석 옵션 / lease 시간 / 최대 시도 횟수를 저장해 모든 작업자가 같은 설정을 씀
+    """
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+        config_path = os.path.join(self.directory, 'queue.json')
+        if not os.path.exists(config_path):
+            raise FileNotFoundError(f"대기열이 없습니다: {self.directory} (먼저 LotQueue.create / enqueue)")
+        self.config = _read_json(config_path)
+        self.options = self.config['options']
+        self.lease_seconds = self.config['lease_seconds']
+        self.max_attempts = self.config['max_attempts']
+
+    @classmethod
+    def create(cls, directory, options=None, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        """대기열 생성 (이미 있으면 그대로 열고, 분석 옵션이 다르면 ValueError)"""
+        options = parse_options(options)
+        for name in STATES + ('results', 'errors'):
+            os.makedirs(os.path.join(directory, name), exist_ok=True)
+        config_path = os.path.join(directory, 'queue.json')
+        if os.path.exists(config_path):
+            queue = cls(directory)
+            if queue.options != options:
+                raise ValueError(f"이미 다른 분석 옵션으로 만든 대기열입니다: {queue.options}")
+            return queue
+        _write_json(config_path, {
+            'options': options,
+            'lease_seconds': lease_seconds,
+            'max_attempts': max_attempts,
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        })
+        return cls(directory)
+
+    def path(self, *parts):
+        return os.path.join(self.directory, *parts)
+
+    def _list(self, state):
+        try:
+            return sorted(name for name in os.listdir(self.path(state)) if name.endswith('.json'))
+        except FileNotFoundError:
+            return []
+
+    def now(self):
+        """공유 파일 시스템 기준 현재 시각 (.clock 파일을 갱신한 변경 시각)"""
+        clock = self.path('.clock')
+        with open(clock, 'a'):
+            pass
+        os.utime(clock)
+        return os.stat(clock).st_mtime
+
+    def known_lots(self):
+        """모든 상태의 lot 이름"""
+        return {_parse_task(name)[0] for state in STATES for name in self._list(state)}
+
+    def enqueue(self, paths, children=False):
+        """lot 폴더를 todo/에 추가 (이미 들어 있는 lot은 건너뜀) - 추가한 lot 이름 목록
+
+        children: True면 주어진 폴더의 하위 폴더 하나하나를 lot으로 (보관소 루트를 통째로 넣을 때)
+        """
+        folders = []
+        for path in paths:
+            path = os.path.expanduser(str(path))
+            if children:
+                folders.extend(sorted(str(child) for child in Path(path).iterdir() if child.is_dir()))
+            else:
+                folders.append(path)
+
+        known = self.known_lots()
+        added = []
+        for folder in folders:
+            if not os.path.isdir(folder):
+                raise ValueError(f"lot 폴더가 아닙니다: {folder}")
+            name = lot_id(folder)
+            if name in known:
+                continue
+            _write_json(self.path('todo', f"{name}~0.json"), {
+                'lot': name,
+                'path': os.path.realpath(folder),
+                'enqueued': time.strftime('%Y-%m-%d %H:%M:%S'),
+            })
+            known.add(name)
+            added.append(name)
+        return added
+
+    def claim(self, worker=None):
+        """todo/에서 lot 하나를 가져감 (rename이 성공한 작업자만 가짐) - 없으면 None"""
+        worker = worker or worker_name()
+        self.requeue_expired()
+        for name in self._list('todo'):
+            lot, attempt, _ = _parse_task(name)
+            source = self.path('todo', name)
+            if os.path.exists(self.path('done', f"{lot}.json")):
+                # lease가 만료된 뒤 원래 작업자가 끝낸 lot - 다시 분석할 필요 없음
+                try:
+                    os.remove(source)
+                except FileNotFoundError:
+                    pass
+                continue
+            target = self.path('doing', f"{lot}~{attempt}~{worker}.json")
+            try:
+                os.rename(source, target)
+            except FileNotFoundError:
+                continue
+            os.utime(target)
+            return Lease(self, target, worker)
+        return None
+
+    def retry(self, doing_path, error):
+        """doing/ 작업을 시도 횟수 + 1로 todo/에 되돌림 (최대 시도 횟수를 넘으면 failed/)"""
+        lot, attempt, worker = _parse_task(os.path.basename(doing_path))
+        with open(self.path('errors', f"{lot}~{attempt}.txt"), 'w', encoding='utf-8') as f:
+            f.write(f"worker: {worker}\n{error}\n")
+        if attempt + 1 >= self.max_attempts:
+            target = self.path('failed', f"{lot}~{attempt}~{worker}.json")
+        else:
+            target = self.path('todo', f"{lot}~{attempt + 1}.json")
+        try:
+            os.rename(doing_path, target)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def requeue_expired(self):
+        """lease가 만료된 doing/ 작업을 되돌림 (작업자가 죽었거나 노드가 끊긴 경우) - 되돌린 수"""
+        names = self._list('doing')
+        if not names:
+            return 0
+        now = self.now()
+        count = 0
+        for name in names:
+            path = self.path('doing', name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            # rename / utime 모두 변경 시각(ctime)을 갱신하므로 mtime과 함께 확인
+            if now - max(stat.st_mtime, stat.st_ctime) <= self.lease_seconds:
+                continue
+            if os.path.exists(self.path('done', f"{_parse_task(name)[0]}.json")):
+                # 만료 뒤 다른 작업자가 이미 끝낸 lot - 되돌리지 않고 작업 파일만 정리
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            count += self.retry(path, f"lease 만료 ({self.lease_seconds}초 동안 갱신 없음)")
+        return count
+
+    def write_result(self, lot, result):
+        """lot 결과를 원자적으로 기록 (pyarrow가 있으면 Parquet, 아니면 pickle)"""
+        for stale in ('.parquet', '.pkl'):
+            if os.path.exists(self.path('results', lot + stale)) and (stale == '.pkl') == (pq is not None):
+                os.remove(self.path('results', lot + stale))
+        if pq is not None:
+            _atomic_write(self.path('results', f"{lot}.parquet"), lambda tmp: write_parquet(tmp, result))
+        else:
+            _atomic_write(self.path('results', f"{lot}.pkl"), result.to_pickle, suffix='.pkl')
+
+    def read_result(self, lot):
+        path = self.path('results', f"{lot}.parquet")
+        if os.path.exists(path):
+            return pd.read_parquet(path)
+        return pd.read_pickle(self.path('results', f"{lot}.pkl"))
+
+    def lots(self):
+        """lot별 상태 (lot, state, attempt, worker, path)"""
+        rows = []
+        for state in STATES:
+            for name in self._list(state):
+                lot, attempt, worker = _parse_task(name) if '~' in name else (name[:-len('.json')], None, None)
+                task = _read_json(self.path(state, name)) if state == 'done' else {}
+                rows.append({'lot': lot, 'state': state, 'attempt': task.get('attempt', attempt),
+                             'worker': task.get('worker', worker), 'rows': task.get('rows')})
+        return pd.DataFrame(rows, columns=['lot', 'state', 'attempt', 'worker', 'rows'])
+
+    def status(self):
+        """상태별 lot 수"""
+        return {state: len(self._list(state)) for state in STATES}
+
+    def iter_results(self):
+        """완료된 lot 결과를 lot 이름 순서로 하나씩"""
+        for name in self._list('done'):
+            yield self.read_result(name[:-len('.json')])
+
+    def merge(self, output=None):
+        """완료된 lot 결과를 하나로 병합
+
+        output: 없으면 DataFrame 반환, 경로면 확장자(.parquet / .csv / .xlsx)에 맞춰 lot별로 흘려 쓰기
+        """
+        if output is None:
+            frames = list(self.iter_results())
+            return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+        output = str(output)
+        suffix = Path(output).suffix.lower()
+        if not self._list('done'):
+            raise ValueError("병합할 결과가 없습니다.")
+        if suffix == '.parquet':
+            write_parquet(output, self.iter_results())
+        elif suffix == '.xlsx':
+            write_xlsx(output, [('result', self.iter_results())])
+        elif suffix == '.csv':
+            with open(output, 'w', encoding='utf-8-sig', newline='') as f:
+                for i, frame in enumerate(self.iter_results()):
+                    frame.to_csv(f, index=False, header=i == 0)
+        else:
+            raise ValueError("병합 결과는 .parquet / .csv / .xlsx 중 하나로 저장할 수 있습니다.")
+        return output
+
+
+def analyze_lot_folder(path, options, memory_budget=None):
+    """lot 폴더 하나 분석 (HTTP 서비스 작업과 같은 run_job + 메모리 예산 실행 계획)"""
+    files = [str(file) for file in resolve_paths(path)]
+    if not files:
+        raise ValueError(f"CSV/.hparc 파일이 없습니다: {path}")
+    plan = plan_execution(
+        LotManifest.scan(files),
+        budget=memory_budget,
+        backend=options['backend'],
+        resample_pitch=options['resample_pitch']
+    )
+    output = run_job(files=files, options=options, plan=plan)
+    if len(output['result']) == 0:
+        errors = [m['message'] for m in output['messages'] if m['level'] == 'error']
+        raise ValueError('; '.join(errors) or "분석 결과가 없습니다.")
+    output['mode'] = plan.mode
+    return output
+
+
+def run_worker(directory, worker=None, memory_budget=None, max_lots=None, wait=False, poll=5.0):
+    """대기열이 빌 때까지 lot을 가져가 분석 (wait=True면 계속 대기) - 끝낸 lot 수
+
+    끝낸 lot: 완료(done/) + 시도 횟수를 다 써서 실패(failed/) - 다시 시도하도록 되돌린 시도는 세지 않음
+    max_lots도 끝낸 lot 수 기준, lot을 분석하는 동안 lease 시간의 1/3마다 lease를 갱신
+    """
+    queue = LotQueue(directory)
+    worker = worker or worker_name()
+    memory_budget = parse_size(memory_budget) if memory_budget is not None else default_budget()
+    processed = 0
+    while max_lots is None or processed < max_lots:
+        lease = queue.claim(worker)
+        if lease is None:
+            status = queue.status()
+            if not wait and status['todo'] == 0 and status['doing'] == 0:
+                break
+            time.sleep(poll)
+            continue
+
+        print(f"🔒 [{worker}] {lease.lot} 시작 (시도 {lease.attempt + 1}/{queue.max_attempts})")
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(queue.lease_seconds / 3):
+                if not lease.renew():
+                    print(f"⚠️ [{worker}] {lease.lot} lease가 만료되어 다른 작업자에게 넘어갔습니다.")
+                    return
+
+        thread = threading.Thread(target=heartbeat, daemon=True)
+        thread.start()
+        try:
+            output = analyze_lot_folder(lease.task['path'], queue.options, memory_budget)
+            result = output['result']
+            result.insert(0, 'lot', lease.lot)
+            result.insert(1, 'lot_path', lease.task['path'])
+            lease.complete(result, {
+                'files': output['files'],
+                'points': output['points'],
+                'rows': len(result),
+                'mode': output['mode'],
+                'elapsed': output['elapsed'],
+                'ingest': output['ingest'],
+                'finished': time.strftime('%Y-%m-%d %H:%M:%S'),
+            })
+            print(f"✅ [{worker}] {lease.lot} 완료 - 파일 {output['files']}개, 결과 {len(result)}행 "
+                  f"({output['mode']}, {output['elapsed']}초)")
+            processed += 1
+        except Exception as e:
+            if lease.fail(traceback.format_exc()):
+                processed += 1
+            print(f"❌ [{worker}] {lease.lot} 실패: {str(e)}")
+        finally:
+            stop.set()
+            thread.join()
+    return processed
+
+
+if __name__ == '__main__':
+    import argparse
+    from concurrent.futures import ProcessPoolExecutor
+
+    from hump_service import BASELINES
+    from hump_pipeline import BACKENDS
+
+    parser = argparse.ArgumentParser(description="공유 파일 시스템 작업 대기열로 여러 노드에서 lot 일괄 분석")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    enqueue = sub.add_parser('enqueue', help="lot 폴더를 대기열에 추가 (대기열이 없으면 생성)")
+    enqueue.add_argument('queue', help="공유 대기열 디렉터리")
+    enqueue.add_argument('paths', nargs='+', help="lot 폴더")
+    enqueue.add_argument('--children', action='store_true', help="주어진 폴더의 하위 폴더 각각을 lot으로 추가")
+    enqueue.add_argument('--baseline', choices=BASELINES, default='fixed')
+    enqueue.add_argument('--resample-pitch', type=float)
+    enqueue.add_argument('--backend', choices=BACKENDS, default='pandas')
+    enqueue.add_argument('--golden', help="golden 프로파일 CSV (모든 노드에서 같은 경로)")
+    enqueue.add_argument('--lease', type=int, default=LEASE_SECONDS, help="lease 시간 [초] (대기열을 만들 때만)")
+    enqueue.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS, help="lot당 최대 시도 횟수 (대기열을 만들 때만)")
+
+    work = sub.add_parser('work', help="작업자 실행 (노드마다)")
+    work.add_argument('queue')
+    work.add_argument('--processes', type=int, default=1, help="이 노드에서 실행할 작업자 프로세스 수")
+    work.add_argument('--memory-budget', help="작업자당 메모리 예산 (예: 2GB, 기본: 사용 가능 메모리의 절반 / 프로세스 수)")
+    work.add_argument('--max-lots', type=int, help="작업자당 끝낼 최대 lot 수 (완료 + 최종 실패, 재시도는 제외)")
+    work.add_argument('--wait', action='store_true', help="대기열이 비어도 종료하지 않고 새 lot을 기다림")
+
+    status = sub.add_parser('status', help="상태별 lot 수 / 실패 lot")
+    status.add_argument('queue')
+
+    merge = sub.add_parser('merge', help="완료된 lot 결과를 하나로 병합")
+    merge.add_argument('queue')
+    merge.add_argument('output', help="결과 파일 (.parquet / .csv / .xlsx)")
+    args = parser.parse_args()
+
+    if args.command == 'enqueue':
+        queue = LotQueue.create(
+            args.queue,
+            options={'baseline': args.baseline, 'resample_pitch': args.resample_pitch,
+                     'backend': args.backend, 'golden': args.golden},
+            lease_seconds=args.lease,
+            max_attempts=args.max_attempts
+        )
+        added = queue.enqueue(args.paths, children=args.children)
+        print(f"📥 {len(added)}개 lot 추가 - {queue.status()}")
+    elif args.command == 'work':
+        budget = parse_size(args.memory_budget) if args.memory_budget else default_budget() // max(args.processes, 1)
+        if args.processes <= 1:
+            count = run_worker(args.queue, memory_budget=budget, max_lots=args.max_lots, wait=args.wait)
+        else:
+            with ProcessPoolExecutor(args.processes) as pool:
+                futures = [pool.submit(run_worker, args.queue, None, budget, args.max_lots, args.wait)
+                           for _ in range(args.processes)]
+                count = sum(future.result() for future in futures)
+        print(f"🏁 {count}개 lot 끝냄 (완료 + 최종 실패) - {LotQueue(args.queue).status()}")
+    elif args.command == 'status':
+        queue = LotQueue(args.queue)
+        print(f"📋 {queue.status()}")
+        lots = queue.lots()
+        failed = lots[lots['state'] == 'failed']
+        if len(failed):
+            print(f"❌ 실패한 lot (errors/ 참고):\n{failed.to_string(index=False)}")
+    else:
+        queue = LotQueue(args.queue)
+        status = queue.status()
+        if status['todo'] or status['doing']:
+            print(f"⚠️ 아직 끝나지 않은 lot이 있습니다: {status}")
+        print(f"💾 {status['done']}개 lot 결과 병합: {queue.merge(args.output)}")
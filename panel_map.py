@@ -0,0 +1,83 @@
+"""
+패널 맵 모듈
+cell 코드(A01…D10)를 마더 글라스 위 (행 문자 × 열 번호) 위치로 풀어
+side별 hump 결과를 heatmap trace 하나로 표시
+"""
+
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+SIDE_ORDER = ['Left', 'Right', 'Top', 'Down']
+
+
+def parse_cells(cells):
+    """cell 코드 -> (행 문자, 열 번호) DataFrame (형식이 다르면 NaN)"""
+    parts = pd.Series(cells, dtype=str).str.extract(r'^([A-Za-z]+)(\d+)$')
+    return pd.DataFrame({
+        'panel_row': parts[0].str.upper(),
+        'panel_col': pd.to_numeric(parts[1], errors='coerce'),
+    })
+
+
+def panel_matrix(result_df, value='hump_dy', side=None, glass=None, agg='median', rows=None, cols=None):
+    """result_df를 (행 문자 × 열 번호) 행렬로 변환
+
+    glass를 지정하지 않으면 glass 전체를 agg('median' / 'mean' / 'max' 등)로 집계
+    rows/cols를 주면 그 격자로 맞춤 (없는 cell은 NaN)
+    """
+    df = result_df
+    if side is not None:
+        df = df[df['side'] == side]
+    if glass is not None:
+        df = df[df['glass'].astype(str) == str(glass)]
+    grid = parse_cells(df['cell'].to_numpy()).set_index(df.index)
+    grid[value] = pd.to_numeric(df[value], errors='coerce')
+    grid = grid.dropna(subset=['panel_row', 'panel_col'])
+
+    matrix = grid.pivot_table(index='panel_row', columns='panel_col', values=value, aggfunc=agg)
+    if rows is not None or cols is not None:
+        matrix = matrix.reindex(index=rows, columns=cols)
+    return matrix
+
+
+def panel_heatmap(result_df, value='hump_dy', glass=None, agg='median', sides=None, title=None):
+    """side별 패널 맵 heatmap (side 하나당 trace 하나, 색 범위 공유)"""
+    # 측정하지 않은 cell도 빈 칸으로 남겨 마더 글라스 위 실제 배치가 보이도록 전체 격자 사용
+    grid = parse_cells(result_df['cell'].to_numpy()).dropna()
+    single = grid['panel_row'].str.len() == 1
+    rows = (
+        [chr(code) for code in range(ord('A'), ord(grid['panel_row'].max()) + 1)]
+        if len(grid) and single.all() else sorted(grid['panel_row'].unique())
+    )
+    cols = list(range(1, int(grid['panel_col'].max()) + 1)) if len(grid) else []
+    if sides is None:
+        present = set(result_df['side'])
+        sides = [side for side in SIDE_ORDER if side in present]
+        sides += sorted(present - set(SIDE_ORDER))
+
+    fig = make_subplots(rows=1, cols=max(len(sides), 1), shared_yaxes=True, subplot_titles=sides,
+                        horizontal_spacing=0.03)
+    for i, side in enumerate(sides, start=1):
+        matrix = panel_matrix(result_df, value=value, side=side, glass=glass, agg=agg, rows=rows, cols=cols)
+        fig.add_trace(go.Heatmap(
+            z=matrix.to_numpy(dtype=float),
+            x=[f"{col:02d}" for col in cols],
+            y=rows,
+            coloraxis='coloraxis',
+            texttemplate='%{z:.2f}',
+            hovertemplate=f"{side}<br>행 %{{y}} / 열 %{{x}}<br>{value}: %{{z:.3f}}<extra></extra>",
+            name=side
+        ), row=1, col=i)
+
+    scope = f"Glass {glass}" if glass is not None else f"전체 glass {agg}"
+    fig.update_yaxes(autorange='reversed', title_text='행', col=1)
+    fig.update_xaxes(type='category', title_text='열')
+    fig.update_layout(
+        title=title or f"패널 맵 - {value} ({scope})",
+        coloraxis=dict(colorscale='Viridis', colorbar=dict(title=value)),
+        height=max(300, 60 * len(rows) + 160),
+        template='plotly',
+        font=dict(size=12)
+    )
+    return fig
@@ -0,0 +1,311 @@
+"""
+원본 Edge Profile lot 압축 보관 모듈
+lot의 CSV 여러 개를 한 파일(.hparc)로 묶어 장기 보관
+
+- 파일별로 값이 하나뿐인 컬럼(Glass ID, CELL ID 등)은 메타데이터에 한 번만 저장
+- 숫자 컬럼은 소수 자릿수를 찾아 정수로 바꾼 뒤 delta 인코딩 (float64 값 기준 무손실)
+- 전체 배열을 zstd(설치된 경우) / lzma / zlib로 압축
+"""
+
+import io
+import json
+import lzma
+import struct
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b'HPARC001'
+MAX_DECIMALS = 9
+ARCHIVE_SUFFIX = '.hparc'
+
+
+def _compress(payload, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ImportError("zstd 압축에는 zstandard 패키지가 필요합니다: pip install zstandard")
+        return zstandard.ZstdCompressor(level=10).compress(payload)
+    if codec == 'lzma':
+        return lzma.compress(payload, preset=6)
+    if codec == 'zlib':
+        return zlib.compress(payload, 9)
+    raise ValueError(f"지원하지 않는 압축 방식: {codec}")
+
+
+def _decompress(payload, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ImportError("zstd 아카이브를 읽으려면 zstandard 패키지가 필요합니다: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    if codec == 'lzma':
+        return lzma.decompress(payload)
+    if codec == 'zlib':
+        return zlib.decompress(payload)
+    raise ValueError(f"지원하지 않는 압축 방식: {codec}")
+
+
+def default_codec():
+    return 'zstd' if zstandard is not None else 'zlib'
+
+
+def _smallest_int(values):
+    """값 범위에 맞는 가장 작은 정수 dtype으로 변환"""
+    if len(values) == 0:
+        return values.astype(np.int8)
+    lo, hi = values.min(), values.max()
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return values.astype(dtype)
+    return values.astype(np.int64)
+
+
+def _decimal_scale(values):
+    """정수 * 10^-d 로 정확히 복원되는 최소 소수 자릿수 d (없으면 None)"""
+    for decimals in range(MAX_DECIMALS + 1):
+        scale = 10.0 ** decimals
+        scaled = np.rint(values * scale)
+        if np.abs(scaled).max(initial=0.0) >= 2 ** 53:
+            return None
+        if np.array_equal(scaled / scale, values):
+            return decimals
+    return None
+
+
+class _PayloadWriter:
+    """배열을 이어 붙이고 (offset, dtype, 길이)를 기록"""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def put(self, array):
+        array = np.ascontiguousarray(array)
+        offset = self.buffer.tell()
+        self.buffer.write(array.tobytes())
+        return {'offset': offset, 'dtype': array.dtype.str, 'length': len(array)}
+
+
+def _encode_column(series, payload):
+    """컬럼 하나를 메타데이터(상수) 또는 payload 배열 참조로 인코딩"""
+    dtype = str(series.dtype)
+    values = series.to_numpy()
+    if len(values) > 0 and series.nunique(dropna=False) == 1:
+        value = values[0]
+        if pd.isna(value):
+            value = None
+        elif isinstance(value, np.generic):
+            value = value.item()
+        return {'kind': 'const', 'dtype': dtype, 'value': value}
+
+    if pd.api.types.is_bool_dtype(series) or not pd.api.types.is_numeric_dtype(series):
+        # 문자열 등 - 파일 안에서 값이 바뀌는 경우는 드물어 JSON 목록으로 저장
+        return {'kind': 'list', 'dtype': dtype, 'values': [None if pd.isna(v) else v for v in values.tolist()]}
+
+    values = values.astype(float)
+    missing = np.flatnonzero(np.isnan(values))
+    spec = {'kind': 'delta', 'dtype': dtype}
+    if len(missing):
+        spec['missing'] = payload.put(_smallest_int(np.diff(missing, prepend=0)))
+        values = np.where(np.isnan(values), 0.0, values)
+
+    decimals = _decimal_scale(values)
+    if decimals is None:
+        # 소수 자릿수로 표현되지 않는 값은 float64 비트 그대로 저장
+        spec['kind'] = 'raw'
+        spec['data'] = payload.put(values.astype(np.float64))
+        return spec
+    ints = np.rint(values * 10.0 ** decimals).astype(np.int64)
+    spec['decimals'] = decimals
+    spec['data'] = payload.put(_smallest_int(np.diff(ints, prepend=0)))
+    return spec
+
+
+def write_archive(target, frames, codec=None):
+    """(파일명, DataFrame) 목록을 아카이브 하나로 저장
+
+    target: 경로 또는 쓰기 가능한 파일 객체
+    frames: (파일명, DataFrame) iterable (CSV를 읽은 그대로, 'file' 컬럼 제외)
+    """
+    codec = codec or default_codec()
+    payload = _PayloadWriter()
+    entries = []
+    for name, df in frames:
+        df = df.drop(columns='file', errors='ignore')
+        entries.append({
+            'file': name,
+            'rows': len(df),
+            'columns': [[str(col), _encode_column(df[col], payload)] for col in df.columns],
+        })
+
+    header = json.dumps({'codec': codec, 'files': entries}, ensure_ascii=False).encode('utf-8')
+    body = _compress(payload.buffer.getvalue(), codec)
+
+    own = isinstance(target, (str, Path))
+    handle = open(target, 'wb') if own else target
+    try:
+        handle.write(MAGIC)
+        handle.write(struct.pack('<QQ', len(header), len(body)))
+        handle.write(header)
+        handle.write(body)
+    finally:
+        if own:
+            handle.close()
+    return target
+
+
+def write_archive_from_dir(target, directory, pattern='*.csv', codec=None):
+    """디렉터리의 CSV 파일들을 읽어 아카이브로 저장"""
+    paths = sorted(Path(directory).glob(pattern))
+    return write_archive(target, ((path.name, pd.read_csv(path)) for path in paths), codec=codec)
+
+
+def _read_header(handle):
+    if handle.read(len(MAGIC)) != MAGIC:
+        raise ValueError("hump 아카이브(.hparc) 파일이 아닙니다.")
+    header_size, body_size = struct.unpack('<QQ', handle.read(16))
+    return json.loads(handle.read(header_size).decode('utf-8')), body_size
+
+
+def _read_parts(source):
+    own = isinstance(source, (str, Path))
+    handle = open(source, 'rb') if own else source
+    try:
+        header, body_size = _read_header(handle)
+        body = handle.read(body_size)
+    finally:
+        if own:
+            handle.close()
+    return header, _decompress(body, header['codec'])
+
+
+def read_archive_header(source):
+    """본문을 풀지 않고 헤더(파일별 이름 / 행 수 / 컬럼 메타데이터)만 읽기
+
+    파일 객체는 읽은 뒤 원래 위치로 되돌림 (이어서 iter_archive 등으로 읽을 수 있게)
+    """
+    if isinstance(source, (str, Path)):
+        with open(source, 'rb') as handle:
+            return _read_header(handle)[0]
+    start = source.tell()
+    try:
+        return _read_header(source)[0]
+    finally:
+        source.seek(start)
+
+
+def _numpy_dtype(dtype):
+    """저장된 pandas dtype 이름 -> numpy dtype (문자열 계열은 object)"""
+    try:
+        np_dtype = np.dtype(dtype)
+    except TypeError:
+        return np.dtype(object)
+    return np.dtype(object) if np_dtype.kind in 'OUS' else np_dtype
+
+
+def _decode_column(spec, rows, payload):
+    dtype = _numpy_dtype(spec['dtype'])
+    if spec['kind'] == 'const':
+        value = spec['value']
+        if value is None:
+            return np.full(rows, np.nan)
+        return np.full(rows, value, dtype=dtype)
+    if spec['kind'] == 'list':
+        return np.array(spec['values'], dtype=object)
+
+    def take(ref):
+        return np.frombuffer(payload, dtype=ref['dtype'], count=ref['length'], offset=ref['offset'])
+
+    if spec['kind'] == 'raw':
+        values = take(spec['data']).copy()
+    else:
+        values = np.cumsum(take(spec['data']), dtype=np.int64) / 10.0 ** spec['decimals']
+    if 'missing' in spec:
+        values[np.cumsum(take(spec['missing']), dtype=np.int64)] = np.nan
+        return values
+    return values.astype(dtype) if dtype != np.float64 else values
+
+
+def iter_archive(source, names=None):
+    """아카이브의 (파일명, DataFrame)을 저장 순서대로 반환 (CSV를 읽은 결과와 동일)
+
+    names: 지정하면 이 파일명만 복원 (나머지는 컬럼을 풀지 않고 건너뜀)
+    """
+    header, payload = _read_parts(source)
+    for entry in header['files']:
+        if names is not None and entry['file'] not in names:
+            continue
+        rows = entry['rows']
+        yield entry['file'], pd.DataFrame(
+            {col: _decode_column(spec, rows, payload) for col, spec in entry['columns']}
+        )
+
+
+def read_archive(source):
+    """아카이브 전체를 로더와 같은 형식(원본 컬럼 + 'file')의 DataFrame 하나로 읽기
+
+    파일별 DataFrame을 만들어 합치지 않고 컬럼별 배열을 바로 이어 붙임
+    """
+    header, payload = _read_parts(source)
+    entries = header['files']
+    if not entries:
+        return pd.DataFrame()
+
+    # 컬럼 순서는 파일마다 'file'을 붙여 pd.concat한 결과와 같게
+    order = list(dict.fromkeys(col for entry in entries for col in [c for c, _ in entry['columns']] + ['file']))
+    names = [name for name in order if name != 'file']
+    parts = {name: [] for name in names}
+    for entry in entries:
+        rows = entry['rows']
+        specs = dict(entry['columns'])
+        for name in names:
+            spec = specs.get(name)
+            # 컬럼이 없는 파일은 pd.concat과 같이 NaN
+            parts[name].append(np.full(rows, np.nan) if spec is None else _decode_column(spec, rows, payload))
+
+    columns = {}
+    for name in names:
+        dtypes = {_numpy_dtype(spec['dtype']) for entry in entries for col, spec in entry['columns'] if col == name}
+        column = np.concatenate(parts[name]) if len(parts[name]) > 1 else parts[name][0]
+        if np.dtype(object) in dtypes and column.dtype != object:
+            column = column.astype(object)
+        columns[name] = column
+    columns['file'] = np.repeat(
+        np.array([entry['file'] for entry in entries], dtype=object), [entry['rows'] for entry in entries]
+    )
+    return pd.DataFrame({name: columns[name] for name in order})
+
+
+def is_archive(name):
+    return str(name).lower().endswith(ARCHIVE_SUFFIX)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Edge Profile lot CSV 압축 보관 / 복원")
+    sub = parser.add_subparsers(dest='command', required=True)
+    pack = sub.add_parser('pack', help="CSV 디렉터리 -> .hparc")
+    pack.add_argument('directory')
+    pack.add_argument('archive')
+    pack.add_argument('--codec', choices=['zstd', 'lzma', 'zlib'])
+    unpack = sub.add_parser('unpack', help=".hparc -> CSV 디렉터리")
+    unpack.add_argument('archive')
+    unpack.add_argument('directory')
+    args = parser.parse_args()
+
+    if args.command == 'pack':
+        write_archive_from_dir(args.archive, args.directory, codec=args.codec)
+        print(f"📦 아카이브 저장 완료: {args.archive}")
+    else:
+        out_dir = Path(args.directory)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        for name, df in iter_archive(args.archive):
+            df.to_csv(out_dir / name, index=False)
+        print(f"📂 아카이브 복원 완료: {out_dir}")
@@ -0,0 +1,143 @@
+"""
+프로파일 형상 클러스터링 모듈
+정규화 프로파일을 미니배치 k-means로 스트리밍 학습해 lot 수와 무관하게 형상 클러스터 라벨 부여
+"""
+
+import numpy as np
+import pandas as pd
+
+from profile_index import KEY_COLUMNS, profile_vectors
+
+
+class ProfileShapeClusters:
+    """미니배치 k-means(Sculley) 형상 클러스터 모델
+
+    - partial_fit()에 lot/배치 단위로 프로파일을 넣으면 중심만 갱신하므로 전체 프로파일을 메모리에 올릴 필요 없음
+    - 중심은 profile_index와 같은 정규화 고정 길이 형상이라 그대로 그래프로 그릴 수 있음
+    - save()/load()로 모델을 이어서 다음 lot 학습에 사용
+    """
+
+    def __init__(self, n_clusters=6, n_points=128, batch_size=4096, seed=0):
+        self.n_clusters = n_clusters
+        self.n_points = n_points
+        self.batch_size = batch_size
+        self.seed = seed
+        self.centers = None
+        self.counts = np.zeros(n_clusters)
+
+    @property
+    def n_seen(self):
+        return int(self.counts.sum())
+
+    def _init_centers(self, vectors):
+        """k-means++ 초기화"""
+        rng = np.random.default_rng(self.seed)
+        centers = [vectors[rng.integers(len(vectors))]]
+        dist = ((vectors - centers[0]) ** 2).sum(axis=1)
+        for _ in range(1, self.n_clusters):
+            total = dist.sum()
+            pick = rng.choice(len(vectors), p=dist / total) if total > 0 else rng.integers(len(vectors))
+            centers.append(vectors[pick])
+            dist = np.minimum(dist, ((vectors - vectors[pick]) ** 2).sum(axis=1))
+        self.centers = np.array(centers)
+
+    def _assign(self, vectors):
+        """가장 가까운 중심 번호와 거리"""
+        d2 = (
+            (vectors ** 2).sum(axis=1)[:, None]
+            - 2.0 * vectors @ self.centers.T
+            + (self.centers ** 2).sum(axis=1)[None, :]
+        )
+        labels = d2.argmin(axis=1)
+        return labels, np.sqrt(np.maximum(d2[np.arange(len(vectors)), labels], 0.0))
+
+    def partial_fit(self, vectors):
+        """정규화 벡터 묶음으로 중심 갱신 (batch_size 단위로 나눠 처리)"""
+        vectors = np.asarray(vectors, dtype=float)
+        if len(vectors) == 0:
+            return self
+        if self.centers is None:
+            if len(vectors) < self.n_clusters:
+                raise ValueError(f"첫 학습에는 최소 {self.n_clusters}개 프로파일이 필요합니다.")
+            self._init_centers(vectors)
+
+        for start in range(0, len(vectors), self.batch_size):
+            batch = vectors[start:start + self.batch_size]
+            labels, _ = self._assign(batch)
+            n_new = np.bincount(labels, minlength=self.n_clusters)
+            sums = np.zeros_like(self.centers)
+            np.add.at(sums, labels, batch)
+            # 중심별 학습률 1/누적 개수 - 배치 합을 한 번에 반영
+            hit = n_new > 0
+            self.counts[hit] += n_new[hit]
+            self.centers[hit] += (sums[hit] - n_new[hit, None] * self.centers[hit]) / self.counts[hit, None]
+        return self
+
+    def predict(self, vectors):
+        """(라벨, 중심까지 거리)"""
+        if self.centers is None:
+            raise ValueError("먼저 partial_fit()으로 모델을 학습해주세요.")
+        return self._assign(np.asarray(vectors, dtype=float))
+
+    def partial_fit_frame(self, df):
+        """처리된 long 형식 DataFrame(processed_df)의 프로파일로 학습"""
+        _, vectors = profile_vectors(df, n_points=self.n_points)
+        return self.partial_fit(vectors)
+
+    def predict_frame(self, df):
+        """processed_df의 프로파일별 shape_cluster 라벨과 중심 거리 DataFrame"""
+        profile_keys, vectors = profile_vectors(df, n_points=self.n_points)
+        labels, dist = self.predict(vectors) if len(vectors) else (np.array([], dtype=int), np.array([]))
+        profile_keys['shape_cluster'] = labels
+        profile_keys['cluster_dist'] = np.round(dist, 4)
+        return profile_keys
+
+    @classmethod
+    def fit_batches(cls, frames, **kwargs):
+        """processed_df를 하나씩 내주는 iterable(lot별 로더 등)로 스트리밍 학습"""
+        model = cls(**kwargs)
+        for df in frames:
+            model.partial_fit_frame(df)
+        return model
+
+    def centroids_frame(self):
+        """클러스터 중심 형상 (cluster, position, y, count) long 형식"""
+        if self.centers is None:
+            return pd.DataFrame(columns=['cluster', 'position', 'y', 'count'])
+        positions = np.linspace(0.0, 1.0, self.n_points)
+        return pd.DataFrame({
+            'cluster': np.repeat(np.arange(self.n_clusters), self.n_points),
+            'position': np.tile(positions, self.n_clusters),
+            'y': self.centers.ravel(),
+            'count': np.repeat(self.counts.astype(int), self.n_points),
+        })
+
+    def save(self, file):
+        """npz 파일(또는 파일 객체)로 저장"""
+        np.savez(
+            file,
+            centers=self.centers if self.centers is not None else np.empty((0, self.n_points)),
+            counts=self.counts,
+            params=np.array([self.n_clusters, self.n_points, self.batch_size, self.seed]),
+        )
+
+    @classmethod
+    def load(cls, file):
+        with np.load(file) as data:
+            n_clusters, n_points, batch_size, seed = (int(v) for v in data['params'])
+            model = cls(n_clusters=n_clusters, n_points=n_points, batch_size=batch_size, seed=seed)
+            model.counts = data['counts'].astype(float)
+            if len(data['centers']):
+                model.centers = data['centers'].astype(float)
+        return model
+
+
+def assign_shape_clusters(result_df, processed_df, model):
+    """분석 결과에 shape_cluster / cluster_dist 컬럼 추가 (glass, cell, side 기준)"""
+    labels = model.predict_frame(processed_df)
+    keys = result_df[KEY_COLUMNS].astype(str)
+    merged = keys.merge(labels, on=KEY_COLUMNS, how='left')
+    result_df = result_df.copy()
+    result_df['shape_cluster'] = merged['shape_cluster'].astype('Int64').to_numpy()
+    result_df['cluster_dist'] = merged['cluster_dist'].to_numpy()
+    return result_df
@@ -0,0 +1,306 @@
+"""
+유사 프로파일 검색 인덱스 모듈
+과거 lot의 정규화 프로파일을 고정 길이(선택적으로 PCA 축소) 벡터로 디스크에 저장하고
+(glass, cell, side) 기준 k-최근접 프로파일을 검색
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from hump_kernels import build_ragged_matrix
+
+KEY_COLUMNS = ['glass', 'cell', 'side']
+
+
+def fixed_length_profiles(y_matrix, n_points=128):
+    """왼쪽 정렬된 프로파일 행렬을 행마다 n_points개 샘플로 선형 리샘플링
+
+    프로파일 길이가 달라도 시작~끝을 같은 개수로 나누므로 형상만 비교됨
+    유효 샘플이 2개 미만인 행은 NaN
+    """
+    y_matrix = np.asarray(y_matrix, dtype=float)
+    if y_matrix.size == 0:
+        return np.full((len(y_matrix), n_points), np.nan)
+    length = np.isfinite(y_matrix).cumprod(axis=1).sum(axis=1)
+    pos = np.linspace(0.0, 1.0, n_points)[None, :] * np.maximum(length - 1, 0)[:, None]
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, np.maximum(length - 1, 0)[:, None])
+    frac = pos - lo
+    rows = np.arange(len(y_matrix))[:, None]
+    out = y_matrix[rows, lo] * (1.0 - frac) + y_matrix[rows, hi] * frac
+    out[length < 2] = np.nan
+    return out
+
+
+def normalize_profiles(matrix):
+    """행별 평균 제거 후 단위 길이로 정규화 (유클리드 거리 = 상관 거리)"""
+    centered = matrix - matrix.mean(axis=1, keepdims=True)
+    norm = np.linalg.norm(centered, axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(norm > 0, centered / norm, np.nan)
+
+
+def profile_vectors(df, n_points=128, keys=('Glass ID', 'cell', 'side'), value_col='Avg Offset', x_col='x'):
+    """처리된 long 형식 DataFrame에서 (키, 정규화 고정 길이 벡터) 생성
+
+    df: DataFrame 또는 glass 단위 묶음 DataFrame iterable (execution_plan.SpilledFrame 등, 묶음별 벡터를 이어 붙임)
+    반환값: (glass/cell/side 키 DataFrame, 벡터 행렬) - 유효한 프로파일만
+    """
+    if not isinstance(df, pd.DataFrame):
+        parts = [profile_vectors(frame, n_points, keys, value_col, x_col) for frame in df]
+        if not parts:
+            return pd.DataFrame(columns=KEY_COLUMNS), np.empty((0, n_points))
+        return (pd.concat([part[0] for part in parts], ignore_index=True),
+                np.concatenate([part[1] for part in parts]))
+    profile_keys, _, y_matrix = build_ragged_matrix(df, list(keys), x_col, value_col)
+    vectors = normalize_profiles(fixed_length_profiles(y_matrix, n_points))
+    valid = np.isfinite(vectors).all(axis=1)
+    profile_keys = profile_keys[valid].reset_index(drop=True)
+    profile_keys.columns = KEY_COLUMNS
+    return profile_keys.astype(str), vectors[valid]
+
+
+class ProfileIndex:
+    """정규화 프로파일 벡터의 디스크 기반 k-NN 인덱스
+
+    - 벡터 / 길이는 float32 파일로 저장하고 load() 시 벡터는 메모리 맵으로 열어 수백만 개도 바로 검색
+    - append_frame()은 새 lot의 벡터 / 키를 파일 끝에만 덧붙임 (기존 벡터는 다시 읽거나 쓰지 않음)
+    - n_components를 지정하면 처음 추가한 프로파일로 PCA 축을 학습해 이후 모든 벡터에 동일 적용
+    - 검색은 청크 단위 행렬곱 + argpartition (전수 탐색이라 결과가 정확함)
+    """
+
+    def __init__(self, n_points=128, n_components=32, chunk_size=262_144):
+        self.n_points = n_points
+        self.n_components = n_components
+        self.chunk_size = chunk_size
+        self.mean = None
+        self.components = None
+        self.keys = pd.DataFrame(columns=KEY_COLUMNS)
+        self.vectors = np.empty((0, n_components or n_points), dtype=np.float32)
+        self.norms = np.empty(0, dtype=np.float32)
+        self._lookup = None
+        # 덧붙이기로 같은 키의 새 값이 생긴 이전 행은 False (None이면 모두 유효)
+        self._live = None
+        self._partial = False
+
+    def __len__(self):
+        return len(self.keys) if self._live is None else int(self._live.sum())
+
+    def _fit(self, vectors, max_samples=100_000):
+        """PCA 축 학습 (표본이 많으면 무작위 max_samples개만 사용)"""
+        sample = vectors
+        if len(sample) > max_samples:
+            sample = sample[np.random.default_rng(0).choice(len(sample), max_samples, replace=False)]
+        self.mean = sample.mean(axis=0)
+        _, _, vt = np.linalg.svd(sample - self.mean, full_matrices=False)
+        self.components = vt[:self.n_components].T
+
+    def transform(self, vectors):
+        """정규화 벡터를 인덱스 공간으로 투영"""
+        vectors = np.asarray(vectors, dtype=float)
+        if self.components is None:
+            return vectors.astype(np.float32)
+        return ((vectors - self.mean) @ self.components).astype(np.float32)
+
+    def reconstruct(self, embedded):
+        """인덱스 벡터를 정규화 프로파일 형상으로 복원 (그래프 표시용)"""
+        embedded = np.asarray(embedded, dtype=float)
+        if self.components is None:
+            return embedded
+        return embedded @ self.components.T + self.mean
+
+    def add(self, profile_keys, vectors):
+        """(키, 정규화 벡터) 추가 - 같은 (glass, cell, side)가 이미 있으면 새 값으로 교체"""
+        vectors = np.asarray(vectors, dtype=float)
+        if len(vectors) == 0:
+            return self
+        if self.n_components and self.components is None:
+            if len(vectors) <= self.n_components:
+                raise ValueError(f"PCA 학습에는 {self.n_components}개보다 많은 프로파일이 필요합니다.")
+            self._fit(vectors)
+
+        new_keys = pd.DataFrame(profile_keys, columns=KEY_COLUMNS).astype(str).reset_index(drop=True)
+        embedded = self.transform(vectors)
+        keys = pd.concat([self.keys, new_keys], ignore_index=True)
+        keep = ~keys.duplicated(subset=KEY_COLUMNS, keep='last').to_numpy()
+        self.keys = keys[keep].reset_index(drop=True)
+        self.vectors = np.concatenate([np.asarray(self.vectors), embedded])[keep]
+        self.norms = np.einsum('ij,ij->i', self.vectors, self.vectors)
+        self._lookup = None
+        self._live = None
+        return self
+
+    def add_frame(self, df, **kwargs):
+        """처리된 long 형식 DataFrame(processed_df)의 프로파일을 모두 추가"""
+        profile_keys, vectors = profile_vectors(df, n_points=self.n_points, **kwargs)
+        return self.add(profile_keys, vectors)
+
+    @classmethod
+    def from_frame(cls, df, n_points=128, n_components=32):
+        return cls(n_points=n_points, n_components=n_components).add_frame(df)
+
+    def vector_of(self, glass, cell, side):
+        """인덱스에 저장된 (glass, cell, side) 벡터"""
+        if self._lookup is None:
+            rows = np.arange(len(self.keys)) if self._live is None else np.flatnonzero(self._live)
+            self._lookup = pd.Series(rows, index=pd.MultiIndex.from_frame(self.keys.iloc[rows]))
+        try:
+            return self.vectors[self._lookup[(str(glass), str(cell), str(side))]]
+        except KeyError:
+            raise KeyError(f"인덱스에 없는 프로파일: {glass} / {cell} / {side}") from None
+
+    def search(self, query, k=10, side=None):
+        """인덱스 공간 벡터 query와 가장 가까운 k개 (키, 거리) 반환
+
+        side를 지정하면 같은 side 프로파일만 검색
+        """
+        query = np.asarray(query, dtype=np.float32).ravel()
+        q_norm = float(query @ query)
+        mask = None if side is None else (self.keys['side'] == str(side)).to_numpy()
+        if self._live is not None:
+            mask = self._live if mask is None else mask & self._live
+
+        best_idx = np.empty(0, dtype=np.int64)
+        best_dist = np.empty(0, dtype=np.float32)
+        for start in range(0, len(self.vectors), self.chunk_size):
+            stop = min(start + self.chunk_size, len(self.vectors))
+            dist = self.norms[start:stop] - 2.0 * (self.vectors[start:stop] @ query) + q_norm
+            if mask is not None:
+                dist = np.where(mask[start:stop], dist, np.inf)
+            take = min(k, len(dist))
+            top = np.argpartition(dist, take - 1)[:take]
+            best_idx = np.concatenate([best_idx, top + start])
+            best_dist = np.concatenate([best_dist, dist[top]])
+            if len(best_idx) > k:
+                keep = np.argpartition(best_dist, k - 1)[:k]
+                best_idx, best_dist = best_idx[keep], best_dist[keep]
+
+        order = np.argsort(best_dist, kind='stable')
+        best_idx, best_dist = best_idx[order], best_dist[order]
+        finite = np.isfinite(best_dist)
+        result = self.keys.iloc[best_idx[finite]].reset_index(drop=True)
+        distance = np.sqrt(np.maximum(best_dist[finite], 0.0))
+        result['distance'] = distance.round(4)
+        # 단위 벡터 사이 거리 d -> 상관계수 1 - d^2/2 (PCA 축소 시 근사값)
+        result['similarity'] = (1.0 - distance ** 2 / 2.0).round(4)
+        result['index'] = best_idx[finite]
+        return result
+
+    def query(self, glass, cell, side, k=10, same_side=True):
+        """(glass, cell, side) 프로파일과 형상이 가장 비슷한 과거 프로파일 k개 (자기 자신 제외)"""
+        query = self.vector_of(glass, cell, side)
+        result = self.search(query, k=k + 1, side=side if same_side else None)
+        is_self = (
+            (result['glass'] == str(glass)) & (result['cell'] == str(cell)) & (result['side'] == str(side))
+        )
+        return result[~is_self].head(k).reset_index(drop=True)
+
+    def query_profile(self, y, k=10, side=None):
+        """인덱스에 없는 새 프로파일 y(1차원 배열)와 비슷한 프로파일 k개"""
+        vector = normalize_profiles(fixed_length_profiles(np.asarray(y, dtype=float)[None, :], self.n_points))
+        if not np.isfinite(vector).all():
+            raise ValueError("유효 샘플이 2개 이상인 프로파일이 필요합니다.")
+        return self.search(self.transform(vector)[0], k=k, side=side)
+
+    def _meta(self, count):
+        return {'n_points': self.n_points, 'n_components': self.n_components,
+                'dim': int(self.vectors.shape[1]), 'count': int(count)}
+
+    @staticmethod
+    def _write_meta(path, meta):
+        # 벡터 / 키를 다 쓴 뒤 마지막에 교체 - 중간에 실패해도 이전 count까지는 그대로 유효
+        tmp = path / 'meta.json.tmp'
+        tmp.write_text(json.dumps(meta), encoding='utf-8')
+        os.replace(tmp, path / 'meta.json')
+
+    def save(self, path):
+        """디렉터리에 전체 저장 (vectors.f32, norms.f32, keys.csv, meta.json, pca.npz) - 교체된 이전 행은 정리"""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        live = np.ones(len(self.keys), dtype=bool) if self._live is None else self._live
+        vectors = np.asarray(self.vectors[live], dtype=np.float32)
+        vectors.tofile(path / 'vectors.f32')
+        np.asarray(self.norms[live], dtype=np.float32).tofile(path / 'norms.f32')
+        self.keys[live].to_csv(path / 'keys.csv', index=False, encoding='utf-8-sig')
+        if self.components is not None:
+            np.savez(path / 'pca.npz', mean=self.mean, components=self.components)
+        self._write_meta(path, self._meta(len(vectors)))
+        if (path / 'vectors.npy').exists():
+            (path / 'vectors.npy').unlink()
+        return path
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """save() / append_frame()으로 저장한 인덱스 열기 (mmap=True면 벡터를 메모리 맵으로 읽음)
+
+        벡터 길이는 norms.f32에서 읽으므로 여는 동안 벡터 파일은 읽지 않음
+        """
+        path = Path(path)
+        meta = json.loads((path / 'meta.json').read_text(encoding='utf-8'))
+        index = cls(n_points=meta['n_points'], n_components=meta['n_components'])
+        if (path / 'pca.npz').exists():
+            with np.load(path / 'pca.npz') as data:
+                index.mean, index.components = data['mean'], data['components']
+        count = meta['count']
+        if (path / 'vectors.f32').exists():
+            dim = meta['dim']
+            if mmap and count:
+                index.vectors = np.memmap(path / 'vectors.f32', dtype=np.float32, mode='r', shape=(count, dim))
+            else:
+                index.vectors = np.fromfile(path / 'vectors.f32', dtype=np.float32, count=count * dim).reshape(count, dim)
+            index.norms = np.fromfile(path / 'norms.f32', dtype=np.float32, count=count)
+        else:
+            # 이전 형식 (vectors.npy, 길이는 저장하지 않음)
+            index.vectors = np.load(path / 'vectors.npy', mmap_mode='r' if mmap else None)
+            index.norms = np.einsum('ij,ij->i', index.vectors, index.vectors)
+        keys = pd.read_csv(path / 'keys.csv', dtype=str, encoding='utf-8-sig', keep_default_na=False)
+        # count 뒤의 행은 중간에 실패한 덧붙이기의 나머지
+        index._partial = len(keys) > count
+        index.keys = keys.iloc[:count].reset_index(drop=True)
+        replaced = index.keys.duplicated(subset=KEY_COLUMNS, keep='last').to_numpy()
+        index._live = ~replaced if replaced.any() else None
+        return index
+
+    @classmethod
+    def append_frame(cls, path, df, **kwargs):
+        """디스크 인덱스 끝에 처리된 DataFrame(processed_df)의 프로파일을 덧붙임
+
+        기존 벡터는 다시 읽거나 쓰지 않으므로 lot 하나를 추가하는 비용은 그 lot의 프로파일 수에 비례
+        같은 (glass, cell, side)가 이미 있으면 새 값으로 검색 (이전 행은 save()로 다시 저장할 때 정리)
+        인덱스가 없으면 새로 만듦 - 반환값: 덧붙인 뒤의 인덱스 (메모리 맵)
+        """
+        path = Path(path)
+        if not (path / 'meta.json').exists():
+            cls().add_frame(df, **kwargs).save(path)
+            return cls.load(path)
+        if not (path / 'vectors.f32').exists():
+            # 이전 형식은 한 번만 전체를 다시 저장해 덧붙일 수 있는 형식으로
+            cls.load(path, mmap=False).save(path)
+
+        index = cls.load(path)
+        meta = index._meta(len(index.keys))
+        profile_keys, vectors = profile_vectors(df, n_points=index.n_points, **kwargs)
+        embedded = index.transform(vectors)
+        if len(embedded) == 0:
+            return index
+
+        dim = meta['dim']
+        # 이전 덧붙이기가 중간에 실패했으면 count 뒤에 남은 부분을 먼저 잘라냄
+        os.truncate(path / 'vectors.f32', meta['count'] * dim * 4)
+        os.truncate(path / 'norms.f32', meta['count'] * 4)
+        if index._partial:
+            index.keys.to_csv(path / 'keys.csv', index=False, encoding='utf-8-sig')
+
+        with open(path / 'vectors.f32', 'ab') as f:
+            embedded.astype(np.float32).tofile(f)
+        with open(path / 'norms.f32', 'ab') as f:
+            np.einsum('ij,ij->i', embedded, embedded).astype(np.float32).tofile(f)
+        new_keys = pd.DataFrame(profile_keys, columns=KEY_COLUMNS).astype(str)
+        new_keys.to_csv(path / 'keys.csv', mode='a', header=False, index=False, encoding='utf-8')
+        meta['count'] += len(embedded)
+        cls._write_meta(path, meta)
+        return cls.load(path)
@@ -0,0 +1,165 @@
+"""
+원본 CSV 디렉터리 SQL 조회 모듈
+DuckDB(설치된 경우)를 원본 Edge Profile CSV 폴더 트리 위에 바로 등록해 앱과 같은 파생 컬럼으로 SQL 조회
+pandas로 전부 읽지 않고 필요한 컬럼 / 파일만 병렬로 스캔 (메모리 한도를 넘으면 디스크로 내려 처리)
+
+profiles 뷰 컬럼: 원본 컬럼 + file(파일명), path(전체 경로), cell(CELL ID 끝 3글자),
+position(파일명 끝에서 13번째 글자), side(Left/Right/Top/Down), x(no × pitch, pitch 없으면 10.96)
+"""
+
+from pathlib import Path
+
+from hump_kernels import PIXEL_PITCH
+from hump_pipeline import source_names
+from profile_validation import COLUMN_ALIASES
+
+SIDE_OF_POSITION = {'1': 'Left', '2': 'Right', '3': 'Top', '4': 'Down'}
+
+
+def _ident(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+class ProfileCatalog:
+    """원본 CSV 트리에 등록된 DuckDB 조회 엔진
+
+    사용 예:
+        catalog = ProfileCatalog('/data/wsi')
+        catalog.query("SELECT * FROM profiles WHERE side = 'Top' AND cell = 'C08' AND path LIKE '%/2024-06/%'")
+        catalog.profiles(side='Top', cell='C08')
+
+    root: 디렉터리(pattern으로 하위 CSV 검색) 또는 glob 패턴
+    union_by_name: 파일마다 컬럼 구성이 다르면 True (모든 파일 헤더를 읽으므로 느림, 기본은 첫 파일 기준)
+    threads / memory_limit: DuckDB 스캔 스레드 수와 메모리 한도 (예: '4GB')
+    """
+
+    def __init__(self, root, pattern='**/*.csv', union_by_name=False, threads=None, memory_limit=None):
+        # duckdb는 import만으로도 시간이 걸려 조회 엔진을 만들 때만 import
+        try:
+            import duckdb
+        except ImportError:
+            raise ImportError("SQL 조회에는 duckdb 패키지가 필요합니다: pip install duckdb") from None
+        root = Path(root).expanduser()
+        self.source = str(root / pattern) if root.is_dir() else str(root)
+        self.con = duckdb.connect()
+        if threads:
+            self.con.execute(f"SET threads = {int(threads)}")
+        if memory_limit:
+            self.con.execute(f"SET memory_limit = {_literal(memory_limit)}")
+
+        self.con.execute(
+            "CREATE OR REPLACE VIEW raw_profiles AS "
+            f"SELECT * FROM read_csv({_literal(self.source)}, filename = true, "
+            f"union_by_name = {'true' if union_by_name else 'false'})"
+        )
+        self.raw_columns = [row[0] for row in self.con.execute("DESCRIBE raw_profiles").fetchall()]
+        self.raw_columns.remove('filename')
+        self.con.execute(f"CREATE OR REPLACE VIEW profiles AS {self._profiles_sql()}")
+
+    def _resolve(self, column):
+        """대안 컬럼명(profile_validation과 동일) 중 실제로 있는 컬럼"""
+        for alias in COLUMN_ALIASES[column]:
+            if alias in self.raw_columns:
+                return alias
+        return None
+
+    def _profiles_sql(self):
+        """원본 컬럼 + 앱과 같은 규칙의 파생 컬럼"""
+        select = ["* EXCLUDE (filename)"]
+        # 표준 컬럼명이 없으면 대안 컬럼을 표준 이름으로 노출
+        for column in ('no', 'CELL ID', 'Avg Offset', 'Glass ID'):
+            alias = self._resolve(column)
+            if alias is not None and alias != column and column not in self.raw_columns:
+                select.append(f"{_ident(alias)} AS {_ident(column)}")
+
+        cell_col, no_col = self._resolve('CELL ID'), self._resolve('no')
+        pitch = f'coalesce(TRY_CAST("pitch" AS DOUBLE), {PIXEL_PITCH})' if 'pitch' in self.raw_columns else str(PIXEL_PITCH)
+        sides = ' '.join(f"WHEN {_literal(p)} THEN {_literal(s)}" for p, s in SIDE_OF_POSITION.items())
+        select += [
+            "filename AS path",
+            f"right(CAST({_ident(cell_col)} AS VARCHAR), 3) AS cell" if cell_col else "NULL::VARCHAR AS cell",
+            f"CASE position {sides} ELSE 'Unknown' END AS side",
+            f"CAST({_ident(no_col)} AS DOUBLE) * {pitch} AS x" if no_col else "NULL::DOUBLE AS x",
+        ]
+        return (
+            f"SELECT {', '.join(select)} FROM ("
+            "SELECT *, regexp_extract(filename, '[^/\\\\]+$') AS file, "
+            "CASE WHEN length(file) >= 13 THEN substr(file, length(file) - 12, 1) ELSE '1' END AS position "
+            "FROM raw_profiles)"
+        )
+
+    def query(self, sql, params=None):
+        """SQL 실행 결과 DataFrame (profiles / raw_profiles 뷰 사용)"""
+        return self.con.execute(sql, params or []).df()
+
+    def _where(self, where=None, **filters):
+        """glass / cell / side / position / file 필터(값 또는 목록) + 추가 SQL 조건"""
+        columns = {'glass': 'Glass ID', 'cell': 'cell', 'side': 'side', 'position': 'position', 'file': 'file'}
+        clauses, params = [], []
+        positions = None
+        for key, value in filters.items():
+            if key not in columns:
+                raise ValueError(f"지원하지 않는 필터: {key} (가능: {', '.join(columns)})")
+            if value is None:
+                continue
+            values = [value] if isinstance(value, (str, int, float)) else list(value)
+            clauses.append(f"CAST({_ident(columns[key])} AS VARCHAR) IN ({', '.join('?' * len(values))})")
+            params += [str(v) for v in values]
+            if key in ('side', 'position'):
+                sides = {str(v) for v in values}
+                matched = {p for p, s in SIDE_OF_POSITION.items() if (s if key == 'side' else p) in sides}
+                positions = matched if positions is None else positions & matched
+        # position은 파일명에서 나오므로 파일명 LIKE 조건을 같이 주면 DuckDB가 읽을 파일 자체를 걸러냄
+        # (13자 미만 파일명은 position '1'로 보므로 '1'이 포함되면 생략)
+        if positions is not None and '1' not in positions:
+            likes = ' OR '.join(f"path LIKE '%{p}____________'" for p in sorted(positions))
+            clauses.append(f"({likes or 'false'})")
+        if where:
+            clauses.append(f"({where})")
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def profiles(self, where=None, columns='*', **filters):
+        """조건에 맞는 프로파일 행 (파일, no 순)"""
+        clause, params = self._where(where, **filters)
+        no_col = 'no' if self._resolve('no') else 'x'
+        return self.query(f"SELECT {columns} FROM profiles{clause} ORDER BY path, {_ident(no_col)}", params)
+
+    def sources(self, where=None, **filters):
+        """조건에 맞는 파일별 (이름, 원본 컬럼 DataFrame) - 로더에 그대로 넘길 수 있는 형식
+
+        이름은 hump_pipeline.source_names()의 상대 경로 (position은 analyze_lot이 파일명 부분에서 읽음)
+        값이 모두 비어 있는 컬럼도 그대로 둠 (모든 파일이 profiles 뷰와 같은 컬럼 구성)
+        """
+        raw = ', '.join(_ident(column) for column in self.raw_columns)
+        df = self.profiles(where, columns=f"{raw}, path", **filters)
+        # 디스크 로더와 같이 공통 상위 폴더 기준 상대 경로로 (다른 날짜 폴더의 같은 파일명끼리 겹치지 않도록)
+        names = source_names(df['path'].unique())
+        for path, group in df.groupby('path', sort=False):
+            yield names[path], group.drop(columns='path').reset_index(drop=True)
+
+    def close(self):
+        self.con.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="원본 Edge Profile CSV 트리 SQL 조회 (profiles 뷰)")
+    parser.add_argument('root', help="CSV 디렉터리 또는 glob 패턴")
+    parser.add_argument('sql', help="예: \"SELECT side, count(*) FROM profiles WHERE cell = 'C08' GROUP BY side\"")
+    parser.add_argument('--out', help="결과 CSV 저장 경로 (없으면 화면 출력)")
+    parser.add_argument('--threads', type=int)
+    parser.add_argument('--memory-limit')
+    args = parser.parse_args()
+
+    catalog = ProfileCatalog(args.root, threads=args.threads, memory_limit=args.memory_limit)
+    result = catalog.query(args.sql)
+    if args.out:
+        result.to_csv(args.out, index=False)
+        print(f"💾 {len(result):,}행 저장 완료: {args.out}")
+    else:
+        print(result.to_string(max_rows=50))
@@ -0,0 +1,307 @@
+"""
+Edge Profile 온라인 집계 모듈
+프로파일을 읽어 들이는 즉시 side별 x 그리드 위 평균/분산/최소/최대를 누적
+"""
+
+import numpy as np
+import pandas as pd
+
+from hump_kernels import PIXEL_PITCH, resample_by_key
+
+
+class EdgeProfileAccumulator:
+    """side별 평균 프로파일과 ±σ / min-max 포락선을 누적하는 집계기
+
+    분산은 Welford(Chan 병합) 방식으로 누적하므로 원본 데이터를 다시 읽지 않아도 되고,
+    다른 작업자/다른 lot에서 만든 집계기와 merge()로 합칠 수 있음
+    """
+
+    FIELDS = ('count', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self, pitch=PIXEL_PITCH):
+        self.pitch = pitch
+        # side -> {'start': 첫 그리드 번호, 'count'/'mean'/'m2'/'min'/'max': 그리드별 배열}
+        self.sides = {}
+
+    def __len__(self):
+        return int(sum(state['count'].sum() for state in self.sides.values()))
+
+    def _state(self, side, lo, hi):
+        """side 상태 배열이 그리드 번호 lo..hi를 덮도록 확장"""
+        state = self.sides.get(side)
+        if state is None:
+            size = hi - lo + 1
+            state = {
+                'start': lo,
+                'count': np.zeros(size),
+                'mean': np.zeros(size),
+                'm2': np.zeros(size),
+                'min': np.full(size, np.inf),
+                'max': np.full(size, -np.inf),
+            }
+            self.sides[side] = state
+            return state
+
+        start, stop = state['start'], state['start'] + len(state['count']) - 1
+        if lo < start or hi > stop:
+            new_start, new_stop = min(lo, start), max(hi, stop)
+            pad = (start - new_start, new_stop - stop)
+            for field, fill in (('count', 0.0), ('mean', 0.0), ('m2', 0.0), ('min', np.inf), ('max', -np.inf)):
+                state[field] = np.pad(state[field], pad, constant_values=fill)
+            state['start'] = new_start
+        return state
+
+    @staticmethod
+    def _combine(state, offset, count, mean, m2, low, high):
+        """그리드 구간 [offset, offset + len)에 배치 통계를 병합 (Chan et al.)"""
+        window = slice(offset, offset + len(count))
+        n_a, mean_a = state['count'][window].copy(), state['mean'][window].copy()
+        total = n_a + count
+        delta = mean - mean_a
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(total > 0, count / total, 0.0)
+        state['mean'][window] = mean_a + delta * ratio
+        state['m2'][window] += m2 + delta ** 2 * n_a * ratio
+        state['count'][window] = total
+        np.minimum(state['min'][window], low, out=state['min'][window])
+        np.maximum(state['max'][window], high, out=state['max'][window])
+
+    def add(self, side, x, y):
+        """한 side의 (x, y) 샘플 묶음을 누적 (프로파일 하나 또는 여러 개)"""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        keep = np.isfinite(x) & np.isfinite(y)
+        if not keep.any():
+            return self
+        x, y = x[keep], y[keep]
+
+        bins = np.rint(x / self.pitch).astype(np.int64)
+        lo, hi = bins.min(), bins.max()
+        state = self._state(side, lo, hi)
+
+        local = bins - lo
+        size = hi - lo + 1
+        count = np.bincount(local, minlength=size).astype(float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(count > 0, np.bincount(local, y, minlength=size) / count, 0.0)
+        m2 = np.bincount(local, (y - mean[local]) ** 2, minlength=size)
+        low = np.full(size, np.inf)
+        high = np.full(size, -np.inf)
+        np.minimum.at(low, local, y)
+        np.maximum.at(high, local, y)
+
+        self._combine(state, lo - state['start'], count, mean, m2, low, high)
+        return self
+
+    def add_frame(self, df, side_col='side', x_col='x', y_col='Avg Offset'):
+        """long 형식 DataFrame 전체를 side별로 누적"""
+        for side, group in df.groupby(side_col, sort=False):
+            self.add(side, group[x_col].to_numpy(), group[y_col].to_numpy())
+        return self
+
+    @classmethod
+    def from_frame(cls, df, pitch=PIXEL_PITCH, **columns):
+        """DataFrame에서 바로 집계기 생성"""
+        return cls(pitch=pitch).add_frame(df, **columns)
+
+    def merge(self, other):
+        """다른 집계기(다른 작업자/lot)의 누적 결과를 병합"""
+        if not np.isclose(self.pitch, other.pitch):
+            raise ValueError(f"그리드 간격이 다른 집계기는 병합할 수 없습니다: {self.pitch} != {other.pitch}")
+
+        for side, theirs in other.sides.items():
+            lo = theirs['start']
+            hi = lo + len(theirs['count']) - 1
+            state = self._state(side, lo, hi)
+            self._combine(
+                state, lo - state['start'],
+                theirs['count'], theirs['mean'], theirs['m2'], theirs['min'], theirs['max']
+            )
+        return self
+
+    def to_frame(self):
+        """side, x별 count/mean/std/min/max와 정규화 높이(y_normalized) 테이블"""
+        frames = []
+        for side, state in self.sides.items():
+            count = state['count']
+            has_data = count > 0
+            with np.errstate(divide='ignore', invalid='ignore'):
+                std = np.sqrt(np.where(count > 1, state['m2'] / (count - 1), 0.0))
+            grid = (state['start'] + np.arange(len(count))) * self.pitch
+            frames.append(pd.DataFrame({
+                'side': side,
+                'x': grid[has_data],
+                'count': count[has_data].astype(int),
+                'mean': state['mean'][has_data],
+                'std': std[has_data],
+                'min': state['min'][has_data],
+                'max': state['max'][has_data],
+            }))
+
+        if not frames:
+            return pd.DataFrame(columns=['side', 'x', 'count', 'mean', 'std', 'min', 'max', 'y_normalized'])
+
+        df_avg = pd.concat(frames, ignore_index=True).sort_values(['side', 'x'], ignore_index=True)
+        df_avg['y_normalized'] = df_avg['mean'] - df_avg.groupby('side')['mean'].transform('min')
+        return df_avg
+
+    def save(self, path):
+        """집계 상태를 npz 파일로 저장"""
+        arrays = {'pitch': np.array(self.pitch), 'sides': np.array(list(self.sides), dtype=str)}
+        for i, state in enumerate(self.sides.values()):
+            arrays[f'{i}_start'] = np.array(state['start'])
+            for field in self.FIELDS:
+                arrays[f'{i}_{field}'] = state[field]
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """save()로 저장한 집계 상태 읽기"""
+        with np.load(path) as data:
+            acc = cls(pitch=float(data['pitch']))
+            for i, side in enumerate(data['sides']):
+                state = {'start': int(data[f'{i}_start'])}
+                for field in cls.FIELDS:
+                    state[field] = data[f'{i}_{field}'].copy()
+                acc.sides[str(side)] = state
+        return acc
+
+
+def build_profile_stats(df, resample_pitch=None, keys=('side', 'Glass ID', 'cell')):
+    """처리된 long 형식 DataFrame에서 평균 프로파일 집계기 생성
+
+    resample_pitch를 지정하면 프로파일별로 공통 x 그리드에 리샘플링한 뒤 집계
+    """
+    if not resample_pitch:
+        return EdgeProfileAccumulator.from_frame(df)
+
+    profile_keys, grid, matrix = resample_by_key(df, list(keys), 'Avg Offset', pitch=resample_pitch)
+    acc = EdgeProfileAccumulator(pitch=resample_pitch)
+    sides = profile_keys['side'].to_numpy()
+    for side in np.unique(sides):
+        rows = matrix[sides == side]
+        acc.add(side, np.broadcast_to(grid, rows.shape).ravel(), rows.ravel())
+    return acc
+
+
+class ProfileQuantileSketch:
+    """(side, x)별 SIP 높이 분포를 누적하는 병합 가능한 분위수 스케치
+
+    값을 resolution 간격 버킷으로 나눈 희소 히스토그램으로, 분위수 오차는 버킷 폭 이내
+    모든 (side, x) 셀을 한 번에 갱신하고, lot별로 저장한 스케치를 merge()로 합쳐
+    장기간 P5/P50/P95 밴드를 원본 CSV 없이 계산
+    """
+
+    _VALUE_OFFSET = 2 ** 31
+
+    def __init__(self, pitch=PIXEL_PITCH, resolution=0.01, buffer_size=1_000_000):
+        self.pitch = pitch
+        self.resolution = resolution
+        self.buffer_size = buffer_size
+        # side -> (정렬된 (x 버킷, 값 버킷) 키 배열, 개수 배열)
+        self.sides = {}
+        self._pending = {}
+        self._pending_size = 0
+
+    def __len__(self):
+        stored = sum(int(counts.sum()) for _, counts in self.sides.values())
+        return stored + self._pending_size
+
+    def _keys(self, x, y):
+        x_bins = np.rint(x / self.pitch).astype(np.int64)
+        value_bins = np.floor(y / self.resolution).astype(np.int64) + self._VALUE_OFFSET
+        return (x_bins << 32) + value_bins
+
+    def add(self, side, x, y):
+        """한 side의 (x, y) 샘플 묶음을 누적 (버퍼에 모았다가 일정량마다 압축)"""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        keep = np.isfinite(x) & np.isfinite(y)
+        if not keep.any():
+            return self
+
+        keys = self._keys(x[keep], y[keep])
+        self._pending.setdefault(side, []).append((keys, np.ones(len(keys), dtype=np.int64)))
+        self._pending_size += len(keys)
+        if self._pending_size >= self.buffer_size:
+            self._compact()
+        return self
+
+    def add_frame(self, df, side_col='side', x_col='x', y_col='Avg Offset'):
+        """long 형식 DataFrame 전체를 side별로 누적"""
+        for side, group in df.groupby(side_col, sort=False):
+            self.add(side, group[x_col].to_numpy(), group[y_col].to_numpy())
+        return self
+
+    def _compact(self):
+        """버퍼에 쌓인 샘플을 (키, 개수) 희소 히스토그램으로 합침"""
+        for side, chunks in self._pending.items():
+            if side in self.sides:
+                chunks = [self.sides[side]] + chunks
+            keys = np.concatenate([k for k, _ in chunks])
+            counts = np.concatenate([c for _, c in chunks])
+            unique, inverse = np.unique(keys, return_inverse=True)
+            self.sides[side] = (unique, np.bincount(inverse, weights=counts).astype(np.int64))
+        self._pending = {}
+        self._pending_size = 0
+
+    def merge(self, other):
+        """다른 스케치(다른 lot/작업자)의 분포를 병합"""
+        if not (np.isclose(self.pitch, other.pitch) and np.isclose(self.resolution, other.resolution)):
+            raise ValueError("그리드 간격이나 버킷 폭이 다른 스케치는 병합할 수 없습니다.")
+        other._compact()
+        for side, state in other.sides.items():
+            self._pending.setdefault(side, []).append(state)
+        self._compact()
+        return self
+
+    def quantiles(self, qs=(0.05, 0.5, 0.95)):
+        """side, x별 샘플 수와 분위수 테이블 (컬럼: p5, p50, p95 ...)"""
+        self._compact()
+        frames = []
+        for side, (keys, counts) in self.sides.items():
+            if len(keys) == 0:
+                continue
+            x_bins = keys >> 32
+            value_bins = (keys & 0xFFFFFFFF) - self._VALUE_OFFSET
+
+            starts = np.flatnonzero(np.r_[True, x_bins[1:] != x_bins[:-1]])
+            totals = np.add.reduceat(counts, starts)
+            cum = np.cumsum(counts)
+            before = np.r_[0, cum][starts]
+
+            frame = {'side': side, 'x': x_bins[starts] * self.pitch, 'count': totals}
+            for q in qs:
+                target = before + q * totals
+                idx = np.searchsorted(cum, target, side='left')
+                idx = np.minimum(idx, np.r_[starts[1:], len(keys)] - 1)
+                # 버킷 안에서는 선형 보간
+                frac = np.clip((target - (cum[idx] - counts[idx])) / counts[idx], 0, 1)
+                frame[f"p{q * 100:g}"] = (value_bins[idx] + frac) * self.resolution
+            frames.append(pd.DataFrame(frame))
+
+        if not frames:
+            return pd.DataFrame(columns=['side', 'x', 'count'] + [f"p{q * 100:g}" for q in qs])
+        return pd.concat(frames, ignore_index=True).sort_values(['side', 'x'], ignore_index=True)
+
+    def save(self, path):
+        """스케치를 npz 파일로 저장 (lot 단위 보관용)"""
+        self._compact()
+        arrays = {
+            'pitch': np.array(self.pitch),
+            'resolution': np.array(self.resolution),
+            'sides': np.array(list(self.sides), dtype=str),
+        }
+        for i, (keys, counts) in enumerate(self.sides.values()):
+            arrays[f'{i}_keys'] = keys
+            arrays[f'{i}_counts'] = counts
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """save()로 저장한 스케치 읽기"""
+        with np.load(path) as data:
+            sketch = cls(pitch=float(data['pitch']), resolution=float(data['resolution']))
+            for i, side in enumerate(data['sides']):
+                sketch.sides[str(side)] = (data[f'{i}_keys'].copy(), data[f'{i}_counts'].copy())
+        return sketch
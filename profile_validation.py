@@ -0,0 +1,169 @@
+"""
+데이터 수집 단계 검증 모듈
+로더가 파일을 읽는 즉시 같은 DataFrame으로 스키마 / 길이 / no 순서 / NaN / 파일명 position을 검사해
+파일별 품질 리포트를 만듦 (원본을 다시 읽지 않음)
+"""
+
+import numpy as np
+import pandas as pd
+
+# analyze_data에서 허용하는 대안 컬럼명과 동일
+COLUMN_ALIASES = {
+    'no': ['no', 'No', 'NO', 'index', 'Index'],
+    'CELL ID': ['CELL ID', 'Cell ID', 'cell_id', 'cellid', 'Cell_ID', 'CellID'],
+    'Avg Offset': ['Avg Offset', 'avg_offset', 'AvgOffset', 'Average Offset', 'Offset'],
+    'Glass ID': ['Glass ID', 'Glass_ID', 'glass_id', 'glassid', 'GlassID', 'glass'],
+}
+VALID_POSITIONS = {'1', '2', '3', '4'}
+
+# 고정 기준점(456번째 행)을 쓰려면 Position 1-3 프로파일이 이 길이 이상이어야 함
+MIN_ROWS_FIXED_BASELINE = 456
+
+
+def _resolve(df, column):
+    for alias in COLUMN_ALIASES[column]:
+        if alias in df.columns:
+            return alias
+    return None
+
+
+def _max_run(mask):
+    """True가 연속되는 최대 길이"""
+    if not mask.any():
+        return 0
+    padded = np.concatenate([[False], mask, [False]]).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    return int((edges[1::2] - edges[::2]).max())
+
+
+def validate_profile_frame(filename, df, max_nan_ratio=0.05):
+    """파일 하나를 검사해 리포트 행(dict) 반환
+
+    issues: 발견된 문제 코드 목록, status: 'OK' / 'WARN' / 'ERROR'
+    """
+    errors, warnings = [], []
+    row = {'file': filename, 'rows': len(df)}
+
+    # 파일명 기반 position (extract_position_from_file과 같은 규칙: 끝에서 13번째 글자)
+    # 하위 폴더 경로가 붙은 이름(sub/a.csv)은 파일명 부분만 봄
+    basename = str(filename).replace('\\', '/').rsplit('/', 1)[-1]
+    if len(basename) < 13:
+        row['position'] = '1'
+        errors.append('filename_short')
+    else:
+        row['position'] = basename[-13]
+        if row['position'] not in VALID_POSITIONS:
+            errors.append('position_invalid')
+
+    # 스키마
+    resolved = {column: _resolve(df, column) for column in COLUMN_ALIASES}
+    missing = [column for column, alias in resolved.items() if alias is None and column != 'no']
+    if missing:
+        errors.append('missing_' + '_'.join(col.replace(' ', '').lower() for col in missing))
+    if resolved['no'] is None:
+        warnings.append('no_missing')
+    if len(df) == 0:
+        errors.append('empty')
+
+    # no 순번: 중복 / 단조 증가 / 빈 번호
+    no_col = resolved['no']
+    if no_col is not None and len(df):
+        no = pd.to_numeric(df[no_col], errors='coerce').to_numpy(dtype=float)
+        finite = no[np.isfinite(no)]
+        step = np.diff(finite)
+        row['no_min'] = finite.min() if len(finite) else np.nan
+        row['no_max'] = finite.max() if len(finite) else np.nan
+        row['no_duplicates'] = int(len(finite) - len(np.unique(finite)))
+        if row['no_duplicates']:
+            errors.append('no_duplicate')
+        if (step < 0).any():
+            warnings.append('no_not_monotonic')
+        if len(finite) and (step > 1).any() and (step[step > 0] == 1).mean() > 0.5:
+            warnings.append('no_gap')
+        if len(finite) < len(no):
+            warnings.append('no_nan')
+
+    # Avg Offset: NaN 비율 / 최대 연속 NaN / 숫자가 아닌 값
+    value_col = resolved['Avg Offset']
+    if value_col is not None and len(df):
+        raw = df[value_col]
+        values = pd.to_numeric(raw, errors='coerce').to_numpy(dtype=float)
+        nan_mask = ~np.isfinite(values)
+        row['nan_ratio'] = round(float(nan_mask.mean()), 4)
+        row['max_nan_run'] = _max_run(nan_mask)
+        if (nan_mask & raw.notna().to_numpy()).any():
+            errors.append('value_not_numeric')
+        if row['nan_ratio'] > max_nan_ratio:
+            errors.append('nan_ratio')
+        elif row['nan_ratio'] > 0:
+            warnings.append('nan_values')
+        # 마지막 행이 잘렸으면 끝 컬럼이 비어 있음
+        if pd.isna(df.iloc[-1, -1]) and df.iloc[:-1, -1].notna().any():
+            warnings.append('last_row_incomplete')
+
+    # 파일 하나에는 한 glass / 한 cell만 있어야 함
+    for column, key in (('Glass ID', 'glass_ids'), ('CELL ID', 'cell_ids')):
+        alias = resolved[column]
+        if alias is not None and len(df):
+            row[key] = int(df[alias].nunique())
+            if row[key] > 1:
+                warnings.append(f'multiple_{key}')
+    if resolved['Glass ID'] is not None and len(df):
+        row['glass'] = str(df[resolved['Glass ID']].iloc[0])
+    if resolved['CELL ID'] is not None and len(df):
+        row['cell'] = str(df[resolved['CELL ID']].iloc[0])[-3:]
+
+    if row['position'] in {'1', '2', '3'} and 0 < len(df) < MIN_ROWS_FIXED_BASELINE:
+        warnings.append('short_for_fixed_baseline')
+
+    row['issues'] = ', '.join(errors + warnings)
+    row['status'] = 'ERROR' if errors else ('WARN' if warnings else 'OK')
+    return row
+
+
+class IngestReport:
+    """로더에서 파일을 읽을 때마다 add()로 검사 결과를 누적하는 lot 품질 리포트"""
+
+    COLUMNS = [
+        'file', 'status', 'issues', 'rows', 'position', 'glass', 'cell', 'no_min', 'no_max',
+        'no_duplicates', 'nan_ratio', 'max_nan_run', 'glass_ids', 'cell_ids',
+    ]
+
+    def __init__(self, max_nan_ratio=0.05, truncation_ratio=0.9):
+        self.max_nan_ratio = max_nan_ratio
+        self.truncation_ratio = truncation_ratio
+        self.rows = []
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, filename, df):
+        row = validate_profile_frame(filename, df, max_nan_ratio=self.max_nan_ratio)
+        self.rows.append(row)
+        return row
+
+    def to_frame(self):
+        """파일별 리포트 + lot 단위 검사 (잘린 파일, 같은 프로파일의 중복 파일)"""
+        report = pd.DataFrame(self.rows).reindex(columns=self.COLUMNS)
+        if report.empty:
+            return report
+
+        extra = pd.Series('', index=report.index)
+        # 같은 side 파일들의 중앙값 길이보다 확연히 짧으면 잘린 파일로 판단
+        typical = report.groupby('position')['rows'].transform('median')
+        extra[report['rows'] < typical * self.truncation_ratio] += 'truncated, '
+        duplicated = report.duplicated(subset=['glass', 'cell', 'position'], keep=False) & report['glass'].notna()
+        extra[duplicated] += 'duplicate_profile, '
+        extra = extra.str.rstrip(', ')
+
+        has_extra = extra != ''
+        issues = report['issues'].fillna('')
+        report['issues'] = np.where(has_extra & (issues != ''), issues + ', ' + extra, issues + extra)
+        report.loc[has_extra & (report['status'] == 'OK'), 'status'] = 'WARN'
+        report.loc[duplicated, 'status'] = 'ERROR'
+        return report
+
+    def summary(self):
+        """상태별 파일 수"""
+        report = self.to_frame()
+        return {status: int((report['status'] == status).sum()) for status in ('OK', 'WARN', 'ERROR')}
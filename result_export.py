@@ -0,0 +1,248 @@
+"""
+분석 결과 내보내기 모듈
+XLSX: 시트 XML을 zip 항목으로 바로 흘려 쓰는 스트리밍 방식 (추가 패키지 없음, 공유 문자열 표 없이 inline 문자열 사용)
+      행 묶음 단위로 변환해 쓰므로 시트가 커도 메모리 사용량이 일정
+Parquet: pyarrow(설치된 경우) ParquetWriter로 row group 단위 기록
+"""
+
+import itertools
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+XLSX_MAX_ROWS = 1_048_576
+CHUNK_ROWS = 20_000
+_ILLEGAL_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_SHEET_NAME_CHARS = re.compile(r'[\[\]:*?/\\]')
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '{sheets}</Types>'
+)
+_SHEET_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{n}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>'
+)
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0">'
+    '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+    '</sheetView></sheetViews><sheetData>'
+)
+
+
+def _sheet_name(name, used):
+    """Excel 시트 이름 규칙 (31자, 금지 문자 제외, 중복 시 번호)"""
+    base = _SHEET_NAME_CHARS.sub('_', str(name)).strip("'")[:31] or 'Sheet'
+    candidate, n = base, 2
+    while candidate.lower() in used:
+        suffix = f"_{n}"
+        candidate, n = base[:31 - len(suffix)] + suffix, n + 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def _column_letter(index):
+    """0부터 시작하는 컬럼 번호 -> Excel 컬럼 문자 (0 -> A, 26 -> AA)"""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def _text_cells(values, refs):
+    """문자열 값 -> inline 문자열 셀 XML (결측은 셀 생략)"""
+    out = np.full(len(values), '', dtype=object)
+    present = values.notna().to_numpy()
+    escaped = (
+        values[present].astype(str)
+        .str.replace(_ILLEGAL_XML, '', regex=True)
+        .str.replace('&', '&amp;', regex=False)
+        .str.replace('<', '&lt;', regex=False)
+        .str.replace('>', '&gt;', regex=False)
+        .to_numpy(dtype=object)
+    )
+    out[present] = '<c r="' + refs[present] + '" t="inlineStr"><is><t xml:space="preserve">' + escaped + '</t></is></c>'
+    return out
+
+
+def _cells(values, refs):
+    """컬럼 하나(행 묶음) -> 행별 셀 XML 문자열 배열 (refs: 셀 주소 'A2' 등, 결측은 셀 생략)"""
+    if pd.api.types.is_bool_dtype(values):
+        present = values.notna().to_numpy()
+        out = np.full(len(values), '', dtype=object)
+        flags = values[present].astype(int).to_numpy().astype(str).astype(object)
+        out[present] = '<c r="' + refs[present] + '" t="b"><v>' + flags + '</v></c>'
+        return out
+    if pd.api.types.is_numeric_dtype(values):
+        numbers = values.to_numpy(dtype=float, na_value=np.nan)
+        finite = np.isfinite(numbers)
+        # 정수는 정수 그대로, 실수는 최단 왕복 표현 (값 손실 없음)
+        shown = values[finite].to_numpy(dtype=np.int64) if pd.api.types.is_integer_dtype(values) else numbers[finite]
+        out = np.full(len(values), '', dtype=object)
+        out[finite] = '<c r="' + refs[finite] + '"><v>' + shown.astype(str).astype(object) + '</v></c>'
+        return out
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return _text_cells(values.dt.strftime('%Y-%m-%d %H:%M:%S'), refs)
+    return _text_cells(values, refs)
+
+
+def _write_sheet(stream, frames, columns):
+    """시트 하나를 행 묶음 단위로 기록"""
+    stream.write(_SHEET_HEAD.encode('utf-8'))
+    header = ''.join(f'<c t="inlineStr"><is><t>{escape(str(column))}</t></is></c>' for column in columns)
+    stream.write(f'<row r="1">{header}</row>'.encode('utf-8'))
+    letters = [_column_letter(i) for i in range(len(columns))]
+    row = 2
+    for frame in frames:
+        if len(frame) == 0:
+            continue
+        numbers = np.arange(row, row + len(frame)).astype(str).astype(object)
+        xml = '<row r="' + numbers + '">'
+        for letter, column in zip(letters, columns):
+            xml = xml + _cells(frame[column], letter + numbers)
+        stream.write(('</row>'.join(xml.tolist()) + '</row>').encode('utf-8'))
+        row += len(frame)
+    stream.write(b'</sheetData></worksheet>')
+
+
+def _chunks(data, chunk_rows):
+    """DataFrame이면 chunk_rows 행씩 나누고, iterable이면 그대로"""
+    if isinstance(data, pd.DataFrame):
+        return (data.iloc[start:start + chunk_rows] for start in range(0, max(len(data), 1), chunk_rows))
+    return iter(data)
+
+
+def _split_rows(chunks, limit):
+    """행 묶음을 limit 행 단위 시트 번호와 함께 다시 나눔 (시트 경계를 넘는 묶음은 잘라서)"""
+    part, used = 0, 0
+    for frame in chunks:
+        while len(frame):
+            piece, frame = frame.iloc[:limit - used], frame.iloc[limit - used:]
+            yield part, piece
+            used += len(piece)
+            if used == limit:
+                part, used = part + 1, 0
+
+
+def write_xlsx(target, sheets, chunk_rows=CHUNK_ROWS):
+    """(시트 이름, DataFrame 또는 DataFrame iterable) 목록을 XLSX로 저장
+
+    target: 경로 또는 쓰기 가능한 파일 객체
+    DataFrame iterable을 주면 첫 묶음의 컬럼을 헤더로 사용 (원본 lot을 파일별로 흘려 쓰는 경우 등)
+    Excel 최대 행 수를 넘으면 같은 이름 + 번호 시트로 나눔
+    """
+    names = []
+    used = set()
+    with zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in sheets:
+            chunks = _chunks(data, chunk_rows)
+            first = next(chunks, None)
+            if first is None:
+                continue
+            columns = list(first.columns)
+            parts = itertools.groupby(
+                _split_rows(itertools.chain([first], chunks), XLSX_MAX_ROWS - 1), key=lambda item: item[0]
+            )
+            n_sheets = len(names)
+            for part, pieces in parts:
+                names.append(_sheet_name(name if part == 0 else f"{name}_{part + 1}", used))
+                with archive.open(f"xl/worksheets/sheet{len(names)}.xml", 'w', force_zip64=True) as stream:
+                    _write_sheet(stream, (piece for _, piece in pieces), columns)
+            if len(names) == n_sheets:
+                # 행이 없으면 헤더만 있는 시트
+                names.append(_sheet_name(name, used))
+                with archive.open(f"xl/worksheets/sheet{len(names)}.xml", 'w') as stream:
+                    _write_sheet(stream, [], columns)
+
+        if not names:
+            names.append('Sheet1')
+            with archive.open('xl/worksheets/sheet1.xml', 'w') as stream:
+                _write_sheet(stream, [], [])
+
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES.format(
+            sheets=''.join(_SHEET_TYPE.format(n=n) for n in range(1, len(names) + 1))
+        ))
+        archive.writestr('_rels/.rels', _ROOT_RELS)
+        archive.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+            + ''.join(f'<sheet name="{escape(sheet, {chr(34): "&quot;"})}" sheetId="{n}" r:id="rId{n}"/>'
+                      for n, sheet in enumerate(names, start=1))
+            + '</sheets></workbook>'
+        ))
+        archive.writestr('xl/_rels/workbook.xml.rels', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + ''.join(
+                f'<Relationship Id="rId{n}" '
+                'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+                f'Target="worksheets/sheet{n}.xml"/>'
+                for n in range(1, len(names) + 1)
+            )
+            + '</Relationships>'
+        ))
+    return target
+
+
+def result_sheets(result_df, split_by=None, processed_df=None):
+    """결과 워크북 시트 목록: 전체 결과 + split_by('split' / 'side') 값별 시트 + (선택) 처리된 프로파일"""
+    sheets = [('result', result_df)]
+    if split_by:
+        for value, group in result_df.groupby(split_by, sort=True):
+            sheets.append((f"{split_by}_{value}", group))
+    if processed_df is not None:
+        sheets.append(('profiles', processed_df))
+    return sheets
+
+
+def write_parquet(target, data, row_group_rows=100_000, compression='zstd'):
+    """DataFrame(또는 DataFrame iterable)을 row group 단위로 Parquet 저장
+
+    iterable이면 첫 묶음의 스키마로 나머지를 맞춤 (전체를 한 번에 메모리에 올리지 않음)
+    """
+    if pq is None:
+        raise ImportError("Parquet 저장에는 pyarrow 패키지가 필요합니다: pip install pyarrow")
+    writer = None
+    try:
+        if isinstance(data, pd.DataFrame):
+            schema = pa.Schema.from_pandas(data, preserve_index=False)
+        else:
+            schema = None
+        for frame in _chunks(data, row_group_rows):
+            if schema is None:
+                schema = pa.Schema.from_pandas(frame, preserve_index=False)
+            table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(target, table.schema, compression=compression)
+            writer.write_table(table, row_group_size=row_group_rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return target
@@ -0,0 +1,222 @@
+"""
+세션별 데이터 보관 모듈
+Streamlit은 브라우저 탭(세션)마다 원본 / 처리된 데이터 / 결과 / 그래프를 세션이 끝날 때까지 메모리에 들고 있어
+여러 명이 동시에 쓰면 서버 메모리가 금방 부족해짐
+- 모든 세션의 큰 값을 SessionStore 하나가 관리하며 세션별 크기(메모리 / 디스크)를 추적
+- 전체 메모리 예산을 넘으면 가장 오래 쓰지 않은 값부터 디스크로 내림 (DataFrame은 Arrow IPC, 그 외는 pickle)
+- 디스크로 내린 DataFrame은 다시 쓸 때 메모리 맵으로 읽어 컬럼이 복사 없이 파일 페이지를 그대로 사용
+- 일정 시간 쓰지 않은(idle) 세션은 값을 모두 디스크로 내리고, 세션이 끝나면 파일도 삭제
+"""
+
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from plotly.basedatatypes import BaseFigure
+
+from execution_plan import SpilledFrame, default_budget, format_size, parse_size
+from result_export import pa
+
+# 이보다 작은 값은 디스크로 내려도 얻는 게 없어 메모리에 둠
+MIN_SPILL_BYTES = 1 << 20
+IDLE_SECONDS = 600
+
+
+def object_size(value, _depth=0, _seen=None):
+    """값이 차지하는 메모리 추정 [byte] (DataFrame / numpy 배열 / Figure / 그 안을 담은 dict, list, 객체)"""
+    _seen = set() if _seen is None else _seen
+    if value is None or id(value) in _seen or _depth > 6:
+        return 0
+    _seen.add(id(value))
+    if isinstance(value, SpilledFrame):
+        return 0
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True).sum() if isinstance(value, pd.DataFrame)
+                   else value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, BaseFigure):
+        return object_size(value._data, _depth + 1, _seen)
+    if isinstance(value, dict):
+        return sum(object_size(item, _depth + 1, _seen) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(object_size(item, _depth + 1, _seen) for item in value)
+    if hasattr(value, '__dict__'):
+        return object_size(vars(value), _depth + 1, _seen)
+    return 0
+
+
+def _write_value(path, value):
+    """값 -> 파일 (DataFrame은 pyarrow가 있으면 압축 없는 Arrow IPC, 아니면 pickle)"""
+    if isinstance(value, pd.DataFrame) and pa is not None:
+        path += '.arrow'
+        table = pa.Table.from_pandas(value, preserve_index=None)
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        path += '.pkl'
+        with open(path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _read_value(path):
+    """파일 -> 값 (Arrow IPC는 메모리 맵 - 숫자 / 문자열 컬럼은 파일 페이지를 복사 없이 참조)"""
+    if path.endswith('.arrow'):
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+class SessionStore:
+    """여러 세션의 큰 값을 전체 메모리 예산 안에서 보관하는 저장소 (서버 프로세스에 하나)
+
+    budget: 모든 세션이 메모리에 둘 수 있는 총 크기 (byte 수 또는 '4GB',
+            없으면 환경 변수 HUMP_SESSION_BUDGET 또는 default_budget())
+    idle_seconds: 이 시간 동안 쓰지 않은 세션은 값을 모두 디스크로 내림
+    값은 put 이후 제자리에서 고치지 않는다고 가정 (고쳤다면 put으로 다시 넣기)
+    """
+
+    def __init__(self, budget=None, idle_seconds=IDLE_SECONDS, directory=None):
+        budget = budget if budget is not None else os.environ.get('HUMP_SESSION_BUDGET')
+        self.budget = parse_size(budget) if budget is not None else default_budget()
+        self.idle_seconds = idle_seconds
+        self.directory = tempfile.mkdtemp(prefix='hump_sessions_', dir=directory)
+        # (세션, 이름) -> {'value', 'size', 'path', 'disk'} (오래 쓰지 않은 순서)
+        self._entries = OrderedDict()
+        self._touched = {}
+        self._lock = threading.RLock()
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.directory, ignore_errors=True)
+
+    def session(self):
+        """새 세션의 SessionData (st.session_state에 보관, 세션이 끝나 사라지면 값과 파일도 삭제)"""
+        return SessionData(self, uuid.uuid4().hex)
+
+    def put(self, session, name, value):
+        key = (session, name)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = {'value': value, 'size': object_size(value), 'path': None, 'disk': 0}
+            self._touch(session)
+            self._enforce(keep=session)
+
+    def get(self, session, name, default=None):
+        key = (session, name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if entry['value'] is None and entry['path'] is not None:
+                    entry['value'] = _read_value(entry['path'])
+            self._touch(session)
+            self._enforce(keep=session)
+            return default if entry is None else entry['value']
+
+    def drop_session(self, session):
+        """세션의 값과 디스크 파일 모두 삭제"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == session]:
+                self._remove(key)
+            self._touched.pop(session, None)
+
+    def footprint(self, session=None):
+        """세션(없으면 전체)의 {'memory', 'disk', 'values'} [byte]"""
+        with self._lock:
+            entries = [entry for key, entry in self._entries.items() if session is None or key[0] == session]
+            return {
+                'memory': sum(entry['size'] for entry in entries if entry['value'] is not None),
+                'disk': sum(entry['disk'] for entry in entries),
+                'values': len(entries),
+            }
+
+    def stats(self):
+        """저장소 전체 상태 (세션 수, 메모리 / 디스크 사용량, 예산)"""
+        with self._lock:
+            stats = self.footprint()
+            stats.update(sessions=len(self._touched), budget=self.budget)
+            return stats
+
+    def describe(self, session=None):
+        """사람이 읽는 사용량 요약"""
+        mine, total = self.footprint(session), self.stats()
+        return (f"메모리 {format_size(mine['memory'])} / 디스크 {format_size(mine['disk'])} "
+                f"(서버 전체 {format_size(total['memory'])} / 예산 {format_size(total['budget'])}, "
+                f"세션 {total['sessions']}개)")
+
+    def _touch(self, session):
+        self._touched[session] = time.monotonic()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry['path'] is not None:
+            try:
+                os.remove(entry['path'])
+            except OSError:
+                pass
+
+    def _spill(self, key):
+        """값을 디스크로 내리고 메모리에서 놓음 (파일이 이미 있으면 다시 쓰지 않음)"""
+        entry = self._entries[key]
+        if entry['value'] is None or entry['size'] < MIN_SPILL_BYTES:
+            return False
+        if entry['path'] is None:
+            path = os.path.join(self.directory, f"{key[0]}_{key[1]}")
+            entry['path'] = _write_value(path, entry['value'])
+            entry['disk'] = os.path.getsize(entry['path'])
+        entry['value'] = None
+        return True
+
+    def _enforce(self, keep=None):
+        """idle 세션은 모두 디스크로, 그래도 예산을 넘으면 오래 쓰지 않은 값부터 디스크로
+
+        keep: 지금 값을 쓰고 있는 세션 - 한 번의 rerun 안에서 값을 번갈아 읽을 때마다
+              디스크로 내렸다 다시 읽지 않도록 다른 세션의 값만 내림 (idle이 되면 함께 내려감)
+        """
+        now = time.monotonic()
+        idle = {session for session, touched in self._touched.items() if now - touched > self.idle_seconds}
+        for key in list(self._entries):
+            if key[0] in idle:
+                self._spill(key)
+
+        memory = self.footprint()['memory']
+        for key in list(self._entries):
+            if memory <= self.budget:
+                break
+            if key[0] != keep and self._entries[key]['value'] is not None:
+                size = self._entries[key]['size']
+                if self._spill(key):
+                    memory -= size
+
+
+class SessionData:
+    """세션 하나의 큰 값 (원본 / 처리된 데이터 / 결과 / 그래프) - SessionStore에 보관
+
+    data.put('result_df', df) / data.get('result_df'): 디스크에 내려가 있으면 다시 읽어 옴
+    """
+
+    def __init__(self, store, session):
+        self.store = store
+        self.session = session
+        weakref.finalize(self, store.drop_session, session)
+
+    def get(self, name, default=None):
+        return self.store.get(self.session, name, default)
+
+    def put(self, name, value):
+        self.store.put(self.session, name, value)
+
+    def footprint(self):
+        return self.store.footprint(self.session)
+
+    def describe(self):
+        return self.store.describe(self.session)
@@ -0,0 +1,32 @@
+"""hump_pipeline 공통 그리드 기준점 테스트 (python -m pytest test_hump_pipeline.py)"""
+
+import io
+
+import pandas as pd
+import pytest
+
+from app_load_test import synthetic_lot
+from hump_pipeline import BACKENDS, analyze_lot
+from hump_polars import AVAILABLE as POLARS_AVAILABLE
+
+
+def _lot(pitch):
+    frames = []
+    for name, data in synthetic_lot(glasses=2):
+        df = pd.read_csv(io.BytesIO(data))
+        df['file'] = name
+        df['pitch'] = pitch
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+@pytest.mark.parametrize('backend', [b for b in BACKENDS if b == 'pandas' or POLARS_AVAILABLE])
+@pytest.mark.parametrize('pitch', [5.0, 10.96])
+def test_resampling_onto_native_pitch_keeps_hump(backend, pitch):
+    # 파일 pitch와 같은 간격의 공통 그리드 = 원래 x 위치 그대로이므로 고정 기준점(456번째 no)도 같아야 함
+    lot = _lot(pitch)
+    expected, _ = analyze_lot(lot.copy(), backend=backend)
+    result, _ = analyze_lot(lot.copy(), backend=backend, resample_pitch=pitch)
+
+    columns = ['glass', 'cell', 'side', 'hump_dy', 'hump_dx']
+    pd.testing.assert_frame_equal(result[columns], expected[columns])
@@ -0,0 +1,35 @@
+"""profile_sql 조회 결과 이름 테스트 (python -m pytest test_profile_sql.py)"""
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('duckdb')
+
+from app_load_test import synthetic_lot
+from hump_pipeline import analyze_lot
+from profile_sql import ProfileCatalog
+
+
+def test_sources_keep_same_basename_in_sibling_folders_apart(tmp_path):
+    # 날짜 폴더 두 곳에 같은 파일명 (Top side, glass만 다름)
+    name, data = next((name, data) for name, data in synthetic_lot(glasses=1) if name[-13] == '3')
+    for day, glass in (('2024-06-01', 'G000'), ('2024-06-02', 'G100')):
+        (tmp_path / day).mkdir()
+        (tmp_path / day / name).write_bytes(data.replace(b'G000', glass.encode()))
+
+    catalog = ProfileCatalog(tmp_path)
+    sources = list(catalog.sources(side='Top'))
+    catalog.close()
+
+    names = [filename for filename, _ in sources]
+    assert sorted(names) == [f'2024-06-01/{name}', f'2024-06-02/{name}']
+
+    frames = []
+    for filename, df in sources:
+        df['file'] = filename
+        frames.append(df)
+    result, processed = analyze_lot(pd.concat(frames, ignore_index=True))
+    # position은 파일명 부분에서 ('3' = Top), 두 파일이 한 결과 행으로 합쳐지지 않음
+    assert set(processed['side']) == {'Top'}
+    assert processed.groupby('file')['Glass ID'].nunique().eq(1).all()
+    assert len(result) == 2